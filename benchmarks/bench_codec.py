@@ -0,0 +1,118 @@
+import argparse
+import datetime
+import time
+from typing import Any, Callable
+from unittest import mock
+
+from dev_ext_downloader.common import codec
+from dev_ext_downloader.common.models import MetaFormat
+from dev_ext_downloader.jetbrains.codec import dumps_plugin, loads_plugin
+from dev_ext_downloader.jetbrains.data import JetbrainsDownloadPlugin, JetbrainsDownloadVersion
+from dev_ext_downloader.vscode.codec import dumps_extension, loads_extension
+from dev_ext_downloader.vscode.data import (
+    TargetPlatformType,
+    VSCodeExtension,
+    VSCodeExtensionFile,
+    VSCodeExtensionProperty,
+    VSCodeExtensionVersion,
+)
+
+
+# Metadata encode / decode time of the codec against dataclasses_json, run from the repo root:
+#   uv run python -m benchmarks.bench_codec --versions 600
+
+
+def _build_extension(versions: int) -> VSCodeExtension:
+    platforms = list(TargetPlatformType)
+    return VSCodeExtension(
+        extension_id="f1f59ae4-9318-4f3c-a9b5-81b2eaa5f8a5",
+        extension_name="python",
+        display_name="Python",
+        publisher_id="998b010b-e2af-44a5-a6cd-0b5fd3b9b6f8",
+        publisher_name="ms-python",
+        publisher_display_name="Microsoft",
+        short_description="Python language support",
+        categories=("Programming Languages", "Debuggers"),
+        versions=tuple(
+            VSCodeExtensionVersion(
+                version=f"2024.{i // len(platforms)}.0",
+                target_platform=platforms[i % len(platforms)],
+                last_updated=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(hours=i),
+                files=tuple(
+                    VSCodeExtensionFile(asset_type=f"Microsoft.VisualStudio.Services.Asset{j}", source=f"https://cdn/{i}/{j}")
+                    for j in range(6)
+                ),
+                properties=tuple(
+                    VSCodeExtensionProperty(key=f"Microsoft.VisualStudio.Code.Property{j}", value=f"value-{j}")
+                    for j in range(6)
+                ),
+                sha256=f"{i:064x}",
+            )
+            for i in range(versions)
+        ),
+    )
+
+
+def _build_plugin(versions: int) -> JetbrainsDownloadPlugin:
+    return JetbrainsDownloadPlugin(
+        id="org.rust.lang",
+        name="Rust",
+        description="<p>Rust support</p>" * 20,
+        vendor="JetBrains",
+        category="Languages",
+        tags=("Languages",),
+        versions=tuple(
+            JetbrainsDownloadVersion(
+                version=f"0.4.{i}",
+                change_notes="<ul><li>Fixes</li></ul>" * 10,
+                size=10_000_000 + i,
+                updated_date=datetime.datetime(2024, 1, 1) + datetime.timedelta(hours=i),
+                since_build="233.11799",
+                until_build="241.*",
+                download_url=f"https://plugins.jetbrains.com/files/{i}/rust.zip",
+                download_file_name=f"rust-0.4.{i}.zip",
+                depends=("com.intellij.modules.lang", "org.toml.lang"),
+                sha256=f"{i:064x}",
+            )
+            for i in range(versions)
+        ),
+    )
+
+
+def _measure(func: Callable[[], Any], rounds: int) -> float:
+    # Best of the rounds in milliseconds
+    best = float("inf")
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start_time)
+    return best * 1000
+
+
+def _bench(name: str, item: Any, dumps: Callable, loads: Callable, rounds: int) -> None:
+    content = item.to_json(indent=2, ensure_ascii=False)
+    compact = dumps(item, MetaFormat.COMPACT)
+    print(f"{name}: {len(item.versions)} versions, {len(content) / 1000:.0f} KB json, {len(compact) / 1000:.0f} KB compact")
+    print(f"  dataclasses_json: encode {_measure(lambda: item.to_json(indent=2, ensure_ascii=False), rounds):.1f} ms, "
+          f"decode {_measure(lambda: type(item).from_json(content), rounds):.1f} ms")
+    for label, orjson in (("orjson", codec.orjson), ("stdlib json", None)):
+        if label == "orjson" and orjson is None:
+            continue
+        with mock.patch.object(codec, "orjson", orjson):
+            print(f"  codec {label}: encode {_measure(lambda: dumps(item), rounds):.1f} ms, "
+                  f"compact {_measure(lambda: dumps(item, MetaFormat.COMPACT), rounds):.1f} ms, "
+                  f"decode {_measure(lambda: loads(content), rounds):.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Metadata codec throughput")
+    parser.add_argument("--versions", type=int, default=600)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    _bench("VSCode", _build_extension(args.versions), dumps_extension, loads_extension, args.rounds)
+    _bench("Jetbrains", _build_plugin(args.versions), dumps_plugin, loads_plugin, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
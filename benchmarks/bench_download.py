@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from aiofile.utils import BinaryFileWrapper
+
+from dev_ext_downloader.common import tools
+from dev_ext_downloader.common.models import Durability
+from dev_ext_downloader.common.tools import SyncBatch, download_file
+from dev_ext_downloader.server import MirrorServer
+
+
+# Download throughput against the bundled mirror server on a temp dir, run from the repo root:
+#   uv run python -m benchmarks.bench_download --files 4 --size-mb 256
+# --write-buffer 0 writes every httpx chunk on its own, like before writes were coalesced,
+# --temp-dir on another filesystem (e.g. /dev/shm) shows the staging of partial files
+
+
+def _count_writes(counter: list[int]) -> None:
+    write = BinaryFileWrapper.write
+
+    async def counted_write(self: BinaryFileWrapper, data: bytes) -> int:
+        # aiofile submits writes through io_uring or a thread pool, strace would not see them all
+        counter[0] += 1
+        return await write(self, data)
+
+    BinaryFileWrapper.write = counted_write
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Download throughput against a local mirror server")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=64, help="Size of each file in MiB")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--write-buffer", type=int, default=tools._WRITE_BUFFER_SIZE, help="Bytes per write")
+    parser.add_argument("--durability", type=Durability, default=Durability.FILE, choices=list(Durability))
+    parser.add_argument("--temp-dir", type=Path, default=None, help="Temp dir of partial downloads")
+    parser.add_argument("--port", type=int, default=18081)
+    args = parser.parse_args()
+
+    tools._WRITE_BUFFER_SIZE = args.write_buffer
+    writes = [0]
+    _count_writes(writes)
+
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory(dir=".") as target_dir:
+        names = [f"file-{i}.vsix" for i in range(args.files)]
+        for name in names:
+            with open(Path(source_dir) / name, "wb") as f:
+                for _ in range(args.size_mb):
+                    f.write(os.urandom(1024 * 1024))
+        server = await MirrorServer(mounts={"/": Path(source_dir)}).start("127.0.0.1", args.port)
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        sync_batch = SyncBatch()
+
+        async def download(client: httpx.AsyncClient, name: str) -> None:
+            async with semaphore:
+                await download_file(
+                    client=client,
+                    url=f"http://127.0.0.1:{args.port}/{name}",
+                    target_dir=Path(target_dir),
+                    file_name=name,
+                    temp_dir=args.temp_dir,
+                    durability=args.durability,
+                    sync_batch=sync_batch,
+                )
+
+        start_time = time.perf_counter()
+        async with httpx.AsyncClient(timeout=600) as client:
+            await asyncio.gather(*(download(client, i) for i in names))
+        await sync_batch.flush()
+        elapsed = time.perf_counter() - start_time
+
+        # Lets the server see the closed keep-alive connections before it stops
+        await asyncio.sleep(0.1)
+        server.close()
+        await server.wait_closed()
+
+    total_mb = args.files * args.size_mb * 1024 * 1024 / 1e6
+    print(
+        f"{args.files} x {args.size_mb} MiB in {elapsed:.2f}s, {total_mb / elapsed:.1f} MB/s, "
+        f"{writes[0]} write calls, durability {args.durability}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from dev_ext_downloader.server import MirrorServer
+
+
+# Load test of the mirror server on a temp dir, run from the repo root:
+#   uv run python -m benchmarks.bench_server --clients 64 --requests 20000
+# With --replace the file is rewritten with another size while it is served,
+# every response must still match its own Content-Length
+
+
+async def _replace_file(file_path: Path, sizes: tuple[int, int], stop: asyncio.Event) -> int:
+    replaced = 0
+    while not stop.is_set():
+        temp_path = file_path.with_name(f"{file_path.name}.tmp")
+        temp_path.write_bytes(os.urandom(sizes[replaced % 2]))
+        os.replace(temp_path, file_path)
+        replaced += 1
+        await asyncio.sleep(0.001)
+    return replaced
+
+
+async def _run_client(client: httpx.AsyncClient, url: str, counter: list[int], stats: dict[str, int]) -> None:
+    while counter[0] > 0:
+        counter[0] -= 1
+        response = await client.get(url)
+        if response.status_code != 200 or len(response.content) != int(response.headers["content-length"]):
+            stats["errors"] += 1
+        stats["requests"] += 1
+        stats["bytes"] += len(response.content)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of the mirror server")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="File size in bytes")
+    parser.add_argument("--replace", action="store_true", help="Replace the file while it is served")
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = Path(temp_dir) / "test.vsix"
+        file_path.write_bytes(os.urandom(args.size))
+        server = await MirrorServer(mounts={"/": Path(temp_dir)}).start("127.0.0.1", args.port)
+        stop = asyncio.Event()
+        replacer = asyncio.create_task(
+            _replace_file(file_path, (args.size, args.size // 2), stop)
+        ) if args.replace else None
+
+        stats = {"requests": 0, "bytes": 0, "errors": 0}
+        counter = [args.requests]
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        start_time = time.perf_counter()
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            await asyncio.gather(*(
+                _run_client(client, f"http://127.0.0.1:{args.port}/test.vsix", counter, stats)
+                for _ in range(args.clients)
+            ))
+        elapsed = time.perf_counter() - start_time
+
+        stop.set()
+        replaced = await replacer if replacer is not None else 0
+        # Lets the server see the closed keep-alive connections before it stops
+        await asyncio.sleep(0.1)
+        server.close()
+        await server.wait_closed()
+
+    print(
+        f"{stats['requests']} requests in {elapsed:.2f}s, {stats['requests'] / elapsed:.0f} req/s, "
+        f"{stats['bytes'] / elapsed / 1024 / 1024:.1f} MB/s, {stats['errors']} errors"
+        + (f", file replaced {replaced} times" if args.replace else "")
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import time
+
+from dev_ext_downloader.common.token_locker import TokenLock
+
+
+# Microbenchmark of TokenLock, run from the repo root:
+#   uv run python -m benchmarks.bench_token_locker --tokens 10000
+
+
+async def _bench_uncontended(lock: TokenLock, tokens: list[str], rounds: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            async with lock.lock(token):
+                pass
+    return time.perf_counter() - start_time
+
+
+async def _bench_reentrant(lock: TokenLock, tokens: list[str], rounds: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            async with lock.lock(token):
+                async with lock.lock(token):
+                    pass
+    return time.perf_counter() - start_time
+
+
+async def _bench_contended(lock: TokenLock, tokens: list[str], tasks_per_token: int) -> float:
+    async def work(token: str) -> None:
+        async with lock.lock(token):
+            await asyncio.sleep(0)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(work(token) for token in tokens for _ in range(tasks_per_token)))
+    return time.perf_counter() - start_time
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmark of TokenLock")
+    parser.add_argument("--tokens", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--tasks-per-token", type=int, default=4)
+    args = parser.parse_args()
+
+    tokens = [f"token-{i}" for i in range(args.tokens)]
+    lock = TokenLock()
+    operations = args.tokens * args.rounds
+    for name, elapsed, count in (
+            ("uncontended", await _bench_uncontended(lock, tokens, args.rounds), operations),
+            ("reentrant", await _bench_reentrant(lock, tokens, args.rounds), operations),
+            ("contended", await _bench_contended(lock, tokens, args.tasks_per_token),
+             args.tokens * args.tasks_per_token),
+    ):
+        print(f"{name}: {count} acquisitions in {elapsed:.3f}s, {count / elapsed:,.0f}/s, {elapsed / count * 1e6:.2f}us each")
+    print(f"Tokens left: {lock.known_token_count()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
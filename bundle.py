@@ -0,0 +1,77 @@
+import asyncio
+import datetime
+from pathlib import Path
+
+import jetbrains
+import vscode
+from dev_ext_downloader.common.bundle import export_bundle, import_bundle
+from dev_ext_downloader.common.models import BundleMode
+from dev_ext_downloader.common.tools import pretty_bytes
+
+# Bundle mode
+# BundleMode.EXPORT: Write the files changed since the last export into a tar bundle
+# BundleMode.IMPORT: Apply BUNDLE_IMPORT_PATH onto the download dirs
+BUNDLE_MODE: BundleMode = BundleMode.EXPORT
+
+# Download dirs in the bundle by name, both sides must use the same names
+BUNDLE_DIRS: dict[str, Path] = {
+    "vscode": vscode.DOWNLOAD_DIR,
+    "jetbrains": jetbrains.DOWNLOAD_DIR,
+}
+
+# Dir of exported bundles, named bundle-[time].tar
+BUNDLE_DIR: Path = Path("./bundles")
+
+# Manifest of the last exported or imported bundle
+# Export: Only files changed since this manifest are bundled, delete it to export a full bundle
+# Import: A delta bundle is only applied onto the mirror state of its base manifest
+BUNDLE_MANIFEST_PATH: Path = BUNDLE_DIR / "bundle-manifest.json"
+
+# Bundle to import
+BUNDLE_IMPORT_PATH: Path | None = None
+
+# Files never bundled
+BUNDLE_EXCLUDE: list[Path] = [
+    vscode.TASK_SPEC_PATH, vscode.PLAN_PATH, vscode.BACKFILL_CHECKPOINT_PATH, vscode.CRAWL_CHECKPOINT_PATH,
+    vscode.CRAWL_MANIFEST_PATH, vscode.JOURNAL_PATH,
+    jetbrains.TASK_SPEC_PATH, jetbrains.PLAN_PATH, jetbrains.BACKFILL_CHECKPOINT_PATH, jetbrains.JOURNAL_PATH,
+]
+
+# For local test
+# noinspection PyBroadException
+try:
+    from local_config.bundle import *
+except:
+    pass
+
+
+async def main() -> None:
+    if BUNDLE_MODE == BundleMode.EXPORT:
+        bundle_path = BUNDLE_DIR / f"bundle-{datetime.datetime.now():%Y%m%d-%H%M%S}.tar"
+        report = await export_bundle(
+            dirs=BUNDLE_DIRS,
+            bundle_path=bundle_path,
+            manifest_path=BUNDLE_MANIFEST_PATH,
+            exclude=BUNDLE_EXCLUDE,
+        )
+        print(
+            f"Bundle: {bundle_path} exported, {report.included_files} of {report.total_files} files "
+            f"({pretty_bytes(report.included_bytes)}), {report.removed_files} removed"
+            + (f", based on {report.base_id}" if report.base_id is not None else ", full bundle")
+        )
+    else:
+        if BUNDLE_IMPORT_PATH is None:
+            raise ValueError("BUNDLE_IMPORT_PATH is not set")
+        report = await import_bundle(
+            bundle_path=BUNDLE_IMPORT_PATH,
+            dirs=BUNDLE_DIRS,
+            manifest_path=BUNDLE_MANIFEST_PATH,
+        )
+        print(
+            f"Bundle: {report.bundle_id} imported, {report.included_files} files "
+            f"({pretty_bytes(report.included_bytes)}) updated, {report.removed_files} removed"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import asyncio
+import signal
+
+import httpx
+
+import jetbrains
+import vscode
+from dev_ext_downloader.common.budget import DownloadBudget
+from dev_ext_downloader.common.http_cache import ConditionalCacheTransport
+from dev_ext_downloader.common.scheduler import run_periodically
+from mirror import DOWNLOAD_CONCURRENCY, SOURCE_WEIGHTS
+
+# Poll interval of each source in seconds
+POLL_INTERVAL: float = 15 * 60
+
+# Random jitter added to each poll interval in seconds
+POLL_JITTER: float = 60
+
+# For local test
+# noinspection PyBroadException
+try:
+    from local_config.daemon import *
+except:
+    pass
+
+
+async def main() -> None:
+    stop_event = asyncio.Event()
+    budget = DownloadBudget(DOWNLOAD_CONCURRENCY, SOURCE_WEIGHTS)
+
+    def _shutdown() -> None:
+        if not stop_event.is_set():
+            print("Daemon: Shutting down, waiting for in-flight downloads.")
+            stop_event.set()
+            budget.close()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, _shutdown)
+        except NotImplementedError:
+            pass
+
+    # Keep one client and its connection pool warm across polls
+    async with httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0),
+            transport=ConditionalCacheTransport(),
+    ) as client:
+        await asyncio.gather(
+            run_periodically(
+                lambda: vscode.main(client=client, limiter=budget.limiter("vscode"), incremental=True),
+                interval=POLL_INTERVAL,
+                jitter=POLL_JITTER,
+                stop_event=stop_event,
+                name="vscode",
+            ),
+            run_periodically(
+                lambda: jetbrains.main(client=client, limiter=budget.limiter("jetbrains"), incremental=True),
+                interval=POLL_INTERVAL,
+                jitter=POLL_JITTER,
+                stop_event=stop_event,
+                name="jetbrains",
+            ),
+        )
+
+
+if __name__ == "__main__":
+    # The temp dirs are kept, a daemon only stops by shutdown and its partial downloads are resumed by the next poll
+    asyncio.run(main())
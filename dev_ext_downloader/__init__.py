@@ -1,2 +1,14 @@
-from . import jetbrains
-from . import vscode
+from typing import TYPE_CHECKING
+
+from .common.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from . import jetbrains
+    from . import vscode
+
+# Heavy dependencies are only imported by the commands that use them
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "jetbrains": ".jetbrains",
+    "vscode": ".vscode",
+})
+__all__ = ["jetbrains", "vscode"]
@@ -0,0 +1,87 @@
+import dataclasses
+from pathlib import Path
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from .checkpoint import load_json_state, save_json_state
+from .lazy import LazyJsonMixin
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass(frozen=True)
+class BackfillCheckpointData(LazyJsonMixin):
+    completed: tuple[str, ...] = ()
+    versions: tuple[str, ...] = ()
+
+
+class BackfillCheckpoint:
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._completed: set[str] = set()
+        self._versions: set[str] = set()
+        data = load_json_state(path, BackfillCheckpointData, "Backfill")
+        if data is not None:
+            self._completed = set(data.completed)
+            self._versions = set(data.versions)
+
+    def is_completed(self, item_id: str) -> bool:
+        return item_id in self._completed
+
+    def is_done(self, version_key: str) -> bool:
+        return version_key in self._versions
+
+    async def update(self, version_keys: list[str], completed_ids: list[str]) -> None:
+        self._versions.update(version_keys)
+        self._completed.update(completed_ids)
+        if self._path is None:
+            return
+        await save_json_state(
+            self._path,
+            BackfillCheckpointData(completed=tuple(sorted(self._completed)), versions=tuple(sorted(self._versions))),
+        )
+
+
+class BackfillBuffer(Generic[T]):
+    def __init__(
+            self,
+            # Returns the tasks it dropped, their versions are not checkpointed
+            flush: Callable[[list[T]], Awaitable[list[T]]],
+            checkpoint: BackfillCheckpoint,
+            max_size: int = 256,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError(f"Backfill buffer size must be positive: {max_size}")
+        self._flush = flush
+        self._checkpoint = checkpoint
+        self._max_size = max_size
+        self._tasks: list[T] = []
+        self._version_keys: list[str] = []
+        self._completed_ids: list[str] = []
+        self.flushed: int = 0
+        self.dropped: int = 0
+
+    async def add(self, version_key: str, task: T) -> None:
+        self._tasks.append(task)
+        self._version_keys.append(version_key)
+        if len(self._tasks) >= self._max_size:
+            await self.flush()
+
+    async def complete(self, item_id: str) -> None:
+        # Recorded with the next flush, after the buffered versions of the item are downloaded
+        self._completed_ids.append(item_id)
+        if len(self._tasks) == 0:
+            await self.flush()
+
+    async def flush(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        version_keys, self._version_keys = self._version_keys, []
+        completed_ids, self._completed_ids = self._completed_ids, []
+        dropped: list[T] = await self._flush(tasks) if len(tasks) > 0 else []
+        self.flushed += len(tasks) - len(dropped)
+        self.dropped += len(dropped)
+        if len(dropped) > 0:
+            # Shut down meanwhile, dropped versions and the items waiting for them are left to the next run
+            dropped_tasks = {id(i) for i in dropped}
+            version_keys = [k for k, t in zip(version_keys, tasks) if id(t) not in dropped_tasks]
+            completed_ids = []
+        await self._checkpoint.update(version_keys, completed_ids)
@@ -0,0 +1,132 @@
+import asyncio
+import collections
+import dataclasses
+from typing import Mapping
+
+
+class BudgetClosedError(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class BudgetStats:
+    weight: float
+    active: int
+    waiting: int
+    completed: int
+
+
+class BudgetLimiter:
+    __slots__ = ("_budget", "_source")
+
+    def __init__(self, budget: 'DownloadBudget', source: str) -> None:
+        self._budget = budget
+        self._source = source
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    async def __aenter__(self) -> 'BudgetLimiter':
+        await self._budget.acquire(self._source)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self._budget.release(self._source)
+        return False
+
+
+class DownloadBudget:
+    def __init__(self, total: int, weights: Mapping[str, float] | None = None) -> None:
+        if total < 1:
+            raise ValueError(f"Download budget must be positive: {total}")
+        self._total = total
+        self._weights: dict[str, float] = dict(weights or {})
+        self._active: dict[str, int] = collections.defaultdict(int)
+        self._completed: dict[str, int] = collections.defaultdict(int)
+        self._waiters: dict[str, collections.deque[asyncio.Future]] = collections.defaultdict(collections.deque)
+        self._in_use: int = 0
+        self._closed: bool = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        # In-flight holders finish normally, all waiting and later acquisitions fail
+        self._closed = True
+        for waiters in self._waiters.values():
+            while len(waiters) > 0:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_exception(BudgetClosedError("Download budget is closed"))
+
+    def limiter(self, source: str) -> BudgetLimiter:
+        self._weights.setdefault(source, 1.0)
+        return BudgetLimiter(self, source)
+
+    def _weight(self, source: str) -> float:
+        return max(self._weights.get(source, 1.0), 1e-6)
+
+    def _has_waiters(self) -> bool:
+        return any(len(i) > 0 for i in self._waiters.values())
+
+    def _grant(self, source: str) -> None:
+        self._in_use += 1
+        self._active[source] += 1
+
+    def _wake_up(self) -> None:
+        # Weighted fair share: the next free slot goes to the waiting source using the least of its share
+        while self._in_use < self._total:
+            candidates = [s for s, q in self._waiters.items() if len(q) > 0]
+            if len(candidates) == 0:
+                return
+            source = min(candidates, key=lambda s: (self._active[s] + 1) / self._weight(s))
+            future = self._waiters[source].popleft()
+            if not future.done():
+                self._grant(source)
+                future.set_result(None)
+
+    async def acquire(self, source: str) -> None:
+        if self._closed:
+            raise BudgetClosedError("Download budget is closed")
+        if self._in_use < self._total and not self._has_waiters():
+            self._grant(source)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[source].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A future failed by close() was never granted, there is nothing to release
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Slot was granted right before cancellation, hand it over
+                self.release(source, completed=False)
+            else:
+                try:
+                    self._waiters[source].remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, source: str, completed: bool = True) -> None:
+        if self._active[source] <= 0:
+            raise RuntimeError(f"Release without acquire for source: {source}")
+        self._in_use -= 1
+        self._active[source] -= 1
+        if completed:
+            self._completed[source] += 1
+        self._wake_up()
+
+    def stats(self) -> dict[str, BudgetStats]:
+        sources = set(self._weights) | set(self._active) | set(self._waiters)
+        return {
+            s: BudgetStats(
+                weight=self._weight(s),
+                active=self._active[s],
+                waiting=len(self._waiters[s]),
+                completed=self._completed[s],
+            )
+            for s in sorted(sources)
+        }
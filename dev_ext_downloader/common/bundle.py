@@ -0,0 +1,276 @@
+import asyncio
+import dataclasses
+import datetime
+import hashlib
+import io
+import os
+import shutil
+import stat
+import tarfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Collection, Mapping
+
+from .lazy import LazyJsonMixin, json_config
+from .models import BundleReport
+from .tools import file_sha256
+
+BUNDLE_MANIFEST_NAME: str = "bundle-manifest.json"
+_TEMP_DIR_NAME: str = ".temp"
+_COPY_BUFFER_SIZE: int = 1024 * 1024
+# Metadata and generated pages reference the other files, they are moved into place last
+_INDEX_SUFFIXES: frozenset[str] = frozenset((".json", ".html", ".xml"))
+
+
+@dataclasses.dataclass(frozen=True)
+class BundleFile(LazyJsonMixin):
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+@dataclasses.dataclass(frozen=True)
+class BundleManifest(LazyJsonMixin):
+    id: str
+    created_at: datetime.datetime = dataclasses.field(
+        metadata=json_config(
+            encoder=lambda dt: dt.isoformat(),
+            decoder=lambda s: datetime.datetime.fromisoformat(s),
+        )
+    )
+    # Manifest the bundle was built against, None for a full bundle
+    base_id: str | None = None
+    # Complete mirror state after applying the bundle, "<dir name>/<relative path>" -> file
+    files: dict[str, BundleFile] = dataclasses.field(default_factory=dict)
+    # Files carried in the bundle, the others must already be in the mirror
+    included: tuple[str, ...] = ()
+
+
+class _HashingReader:
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self._hasher = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self._hasher.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
+def load_bundle_manifest(manifest_path: Path | None) -> BundleManifest | None:
+    if manifest_path is None or not manifest_path.is_file():
+        return None
+    return BundleManifest.from_json(manifest_path.read_text(encoding="utf-8"))
+
+
+def save_bundle_manifest(manifest: BundleManifest, manifest_path: Path) -> None:
+    temp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    temp_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path.write_text(manifest.to_json(ensure_ascii=False), encoding="utf-8")
+    os.replace(temp_path, manifest_path)
+
+
+def _resolve_name(dirs: Mapping[str, Path], name: str) -> Path:
+    dir_name, _, relative_name = name.partition("/")
+    relative_path = PurePosixPath(relative_name)
+    if (
+            dir_name not in dirs
+            or relative_name == ""
+            or relative_path.is_absolute()
+            or any(i in ("", ".", "..") for i in relative_name.split("/"))
+    ):
+        raise ValueError(f"Invalid bundle file name: {name}")
+    return dirs[dir_name].joinpath(*relative_path.parts)
+
+
+def _is_index_file(name: str) -> bool:
+    return any(i in _INDEX_SUFFIXES for i in PurePosixPath(name).suffixes)
+
+
+def _scan_files(dirs: Mapping[str, Path], exclude: Collection[Path]) -> dict[str, tuple[Path, os.stat_result]]:
+    exclude_paths = {os.path.abspath(i) for i in exclude}
+    results: dict[str, tuple[Path, os.stat_result]] = {}
+    for dir_name, download_dir in dirs.items():
+        if not download_dir.is_dir():
+            continue
+        for root, dir_names, file_names in os.walk(download_dir):
+            root_path = Path(root)
+            if root_path == download_dir:
+                # Partial downloads live in the temp dir
+                dir_names[:] = [i for i in dir_names if i != _TEMP_DIR_NAME]
+            for file_name in file_names:
+                file_path = root_path / file_name
+                if file_name.endswith(".tmp") or os.path.abspath(file_path) in exclude_paths:
+                    continue
+                file_stat = os.stat(file_path, follow_symlinks=False)
+                if not stat.S_ISREG(file_stat.st_mode):
+                    continue
+                results[f"{dir_name}/{file_path.relative_to(download_dir).as_posix()}"] = (file_path, file_stat)
+    return results
+
+
+def _write_bundle(bundle_path: Path, manifest: BundleManifest, sources: Mapping[str, Path]) -> None:
+    temp_path = bundle_path.with_name(f"{bundle_path.name}.tmp")
+    temp_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # Stream mode, files are copied into the archive as they are read, nothing is staged
+        with open(temp_path, "wb") as f, tarfile.open(fileobj=f, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            manifest_content = manifest.to_json(ensure_ascii=False).encode("utf-8")
+            info = tarfile.TarInfo(BUNDLE_MANIFEST_NAME)
+            info.size = len(manifest_content)
+            info.mtime = int(manifest.created_at.timestamp())
+            tar.addfile(info, io.BytesIO(manifest_content))
+
+            for name in manifest.included:
+                bundle_file = manifest.files[name]
+                info = tarfile.TarInfo(name)
+                info.size = bundle_file.size
+                info.mtime = bundle_file.mtime_ns // 1_000_000_000
+                with open(sources[name], "rb") as src:
+                    reader = _HashingReader(src)
+                    tar.addfile(info, reader)
+                if reader.hexdigest() != bundle_file.sha256:
+                    raise ValueError(f"File changed during export: {sources[name]}")
+        os.replace(temp_path, bundle_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+async def export_bundle(
+        dirs: Mapping[str, Path],
+        bundle_path: Path,
+        manifest_path: Path | None = None,
+        exclude: Collection[Path] = (),
+        max_workers: int | None = None,
+) -> BundleReport:
+    from tqdm.asyncio import tqdm
+    # The previous manifest is the base, only files changed since then go into the bundle
+    base = load_bundle_manifest(manifest_path)
+    scanned = await asyncio.to_thread(_scan_files, dirs, exclude)
+
+    files: dict[str, BundleFile] = {}
+    to_hash: list[str] = []
+    for name, (file_path, file_stat) in scanned.items():
+        base_file = base.files.get(name) if base is not None else None
+        # Same size and mtime as in the base manifest, the stored digest is reused
+        if (
+                base_file is not None
+                and base_file.size == file_stat.st_size
+                and base_file.mtime_ns == file_stat.st_mtime_ns
+        ):
+            files[name] = base_file
+        else:
+            to_hash.append(name)
+
+    if len(to_hash) > 0:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            digests = await tqdm.gather(
+                *[loop.run_in_executor(executor, file_sha256, scanned[i][0]) for i in to_hash],
+                desc="Hashing",
+            )
+        for name, digest in zip(to_hash, digests):
+            file_stat = scanned[name][1]
+            files[name] = BundleFile(sha256=digest, size=file_stat.st_size, mtime_ns=file_stat.st_mtime_ns)
+
+    included = tuple(sorted(
+        name for name, bundle_file in files.items()
+        if base is None or name not in base.files or base.files[name].sha256 != bundle_file.sha256
+    ))
+    manifest = BundleManifest(
+        id=uuid.uuid4().hex,
+        created_at=datetime.datetime.now(datetime.timezone.utc),
+        base_id=base.id if base is not None else None,
+        files=dict(sorted(files.items())),
+        included=included,
+    )
+    await asyncio.to_thread(_write_bundle, bundle_path, manifest, {i: scanned[i][0] for i in included})
+    if manifest_path is not None:
+        save_bundle_manifest(manifest, manifest_path)
+
+    return BundleReport(
+        bundle_id=manifest.id,
+        base_id=manifest.base_id,
+        total_files=len(files),
+        included_files=len(included),
+        included_bytes=sum(files[i].size for i in included),
+        removed_files=len(base.files.keys() - files.keys()) if base is not None else 0,
+    )
+
+
+def _import_bundle(bundle_path: Path, dirs: Mapping[str, Path], manifest_path: Path) -> BundleReport:
+    current = load_bundle_manifest(manifest_path)
+    with tarfile.open(bundle_path, mode="r|") as tar:
+        member = tar.next()
+        if member is None or member.name != BUNDLE_MANIFEST_NAME:
+            raise ValueError(f"Bundle manifest not found in {bundle_path}")
+        manifest = BundleManifest.from_json(tar.extractfile(member).read())
+        if manifest.base_id is not None and (current is None or current.id != manifest.base_id):
+            raise ValueError(
+                f"Bundle {manifest.id} is based on {manifest.base_id}, "
+                f"mirror is at {current.id if current is not None else 'no bundle'}"
+            )
+
+        staging_dirs = {i: d / _TEMP_DIR_NAME / f"bundle-{manifest.id}" for i, d in dirs.items()}
+        try:
+            # Stage and verify everything before the mirror is touched
+            included = set(manifest.included)
+            staged: dict[str, Path] = {}
+            while (member := tar.next()) is not None:
+                if member.name not in included or member.name in staged or not member.isfile():
+                    raise ValueError(f"Unexpected bundle member: {member.name}")
+                _resolve_name(dirs, member.name)
+                dir_name, _, relative_name = member.name.partition("/")
+                staged_path = staging_dirs[dir_name].joinpath(*PurePosixPath(relative_name).parts)
+                staged_path.parent.mkdir(parents=True, exist_ok=True)
+                with tar.extractfile(member) as src, open(staged_path, "wb") as dst:
+                    reader = _HashingReader(src)
+                    shutil.copyfileobj(reader, dst, _COPY_BUFFER_SIZE)
+                if reader.hexdigest() != manifest.files[member.name].sha256:
+                    raise ValueError(f"Bundle file corrupted: {member.name}")
+                staged[member.name] = staged_path
+            if len(staged) != len(included):
+                raise ValueError(f"Bundle is incomplete, missing {len(included) - len(staged)} files")
+
+            for name, bundle_file in manifest.files.items():
+                if name in included:
+                    continue
+                file_path = _resolve_name(dirs, name)
+                if not file_path.is_file() or file_path.stat().st_size != bundle_file.size:
+                    raise ValueError(f"Mirror file missing or changed, bundle can't be applied: {file_path}")
+
+            # Only renames from here, an interrupted import is completed by importing the same bundle again
+            for name in sorted(staged.keys(), key=lambda i: (_is_index_file(i), i)):
+                file_path = _resolve_name(dirs, name)
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(staged[name], file_path)
+                mtime_ns = manifest.files[name].mtime_ns
+                os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+            removed = current.files.keys() - manifest.files.keys() if current is not None else set()
+            for name in removed:
+                _resolve_name(dirs, name).unlink(missing_ok=True)
+            save_bundle_manifest(manifest, manifest_path)
+        finally:
+            for staging_dir in staging_dirs.values():
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return BundleReport(
+        bundle_id=manifest.id,
+        base_id=manifest.base_id,
+        total_files=len(manifest.files),
+        included_files=len(staged),
+        included_bytes=sum(manifest.files[i].size for i in staged),
+        removed_files=len(removed),
+    )
+
+
+async def import_bundle(bundle_path: Path, dirs: Mapping[str, Path], manifest_path: Path) -> BundleReport:
+    if not bundle_path.is_file():
+        raise FileNotFoundError(bundle_path)
+    return await asyncio.to_thread(_import_bundle, bundle_path, dirs, manifest_path)
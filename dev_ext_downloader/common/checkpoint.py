@@ -0,0 +1,23 @@
+from pathlib import Path
+from typing import TypeVar
+
+from .lazy import LazyJsonMixin
+from .tools import write_file_atomic
+
+D = TypeVar("D", bound=LazyJsonMixin)
+
+
+def load_json_state(path: Path | None, data_type: type[D], name: str) -> D | None:
+    # State of an earlier run, a missing or unreadable file starts over
+    if path is None or not path.is_file():
+        return None
+    try:
+        return data_type.from_json(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"{name} warning: {path} could not be read, starting over.", e)
+        return None
+
+
+async def save_json_state(path: Path, data: LazyJsonMixin) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    await write_file_atomic(path, data.to_json(ensure_ascii=False))
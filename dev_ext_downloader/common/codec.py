@@ -0,0 +1,25 @@
+import json
+from typing import Any
+
+from .models import MetaFormat
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_meta_data(data: dict[str, Any], meta_format: MetaFormat = MetaFormat.JSON) -> str:
+    # Same text as dataclasses_json to_json(indent=2, ensure_ascii=False) for the json format
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if meta_format == MetaFormat.JSON else 0).decode("utf-8")
+    if meta_format == MetaFormat.JSON:
+        return json.dumps(data, indent=2, ensure_ascii=False)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_meta_data(content: str | bytes) -> dict[str, Any]:
+    # Both formats are plain JSON, files of either format and older files are read alike
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
@@ -0,0 +1,97 @@
+import asyncio
+import dataclasses
+import enum
+from pathlib import Path
+from typing import Any, AsyncGenerator, Awaitable, Callable
+
+
+class SkipReason(enum.StrEnum):
+    # File already in the download dir, or downloaded by an interrupted run of the same plan
+    EXISTS = "exists"
+    JOURNAL = "journal"
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class SyncEvent:
+    # Extension or plugin id, version is unknown for ids which could not be resolved
+    item_id: str
+    version: str | None = None
+    target_platform: str | None = None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class ResolvedEvent(SyncEvent):
+    size: int | None = None
+    is_unchanged: bool = False
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class SkippedEvent(SyncEvent):
+    reason: SkipReason
+    path: Path | None = None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class DownloadedEvent(SyncEvent):
+    path: Path
+    downloaded_bytes: int
+    elapsed_seconds: float
+    sha256: str | None = None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class FailedEvent(SyncEvent):
+    error: str
+    exception: BaseException | None = None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class CommittedEvent(SyncEvent):
+    path: Path
+    # None when metadata is disabled
+    meta_data_path: Path | None = None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class WarningEvent(SyncEvent):
+    message: str
+
+
+class EventSink:
+    # Events of one run, a sink without a queue drops them
+    def __init__(self, queue: asyncio.Queue | None = None) -> None:
+        self._queue = queue
+
+    def emit(self, event: SyncEvent) -> None:
+        if self._queue is not None:
+            # Never blocks a download, the consumer catches up at its own pace
+            self._queue.put_nowait(event)
+
+    def warn(self, event: WarningEvent, *text: Any) -> None:
+        # Warnings go to the consumer, printed only when nobody consumes the events
+        if self._queue is not None:
+            self.emit(event)
+        else:
+            print(*text)
+
+
+_DONE = object()
+
+
+async def stream_events(
+        func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any
+) -> AsyncGenerator[SyncEvent, None]:
+    # Runs func(*args, events=..., **kwargs) and yields its events as they happen,
+    # its exception is raised after the events before it
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(func(*args, events=EventSink(queue), **kwargs))
+    task.add_done_callback(lambda _: queue.put_nowait(_DONE))
+    try:
+        while (event := await queue.get()) is not _DONE:
+            yield event
+        task.result()
+    finally:
+        if not task.done():
+            # The consumer stopped early, the run is cancelled like any other interrupted run
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
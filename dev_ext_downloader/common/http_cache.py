@@ -0,0 +1,74 @@
+import collections
+import dataclasses
+
+import httpx
+
+_CACHEABLE_CONTENT_TYPES: tuple[str, ...] = ("text/", "application/xml", "application/json")
+
+
+@dataclasses.dataclass(frozen=True)
+class _CacheEntry:
+    headers: httpx.Headers
+    content: bytes
+
+
+class ConditionalCacheTransport(httpx.AsyncBaseTransport):
+    def __init__(
+            self,
+            transport: httpx.AsyncBaseTransport | None = None,
+            max_entry_size: int = 4 * 1024 * 1024,
+            max_entries: int = 4096,
+    ) -> None:
+        self._transport = transport if transport is not None else httpx.AsyncHTTPTransport()
+        self._max_entry_size = max_entry_size
+        self._max_entries = max_entries
+        self._entries: collections.OrderedDict[str, _CacheEntry] = collections.OrderedDict()
+
+    def _is_cacheable(self, response: httpx.Response) -> bool:
+        if response.status_code != 200:
+            return False
+        if "ETag" not in response.headers and "Last-Modified" not in response.headers:
+            return False
+        # File downloads are streamed to disk, only keep listings in memory
+        if "Content-Disposition" in response.headers:
+            return False
+        content_type = response.headers.get("Content-Type", "")
+        if not content_type.startswith(_CACHEABLE_CONTENT_TYPES):
+            return False
+        content_length = response.headers.get("Content-Length")
+        return content_length is not None and content_length.isdigit() and int(content_length) <= self._max_entry_size
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self._transport.handle_async_request(request)
+
+        key = str(request.url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if "ETag" in entry.headers:
+                request.headers["If-None-Match"] = entry.headers["ETag"]
+            if "Last-Modified" in entry.headers:
+                request.headers["If-Modified-Since"] = entry.headers["Last-Modified"]
+
+        response = await self._transport.handle_async_request(request)
+
+        if response.status_code == 304 and entry is not None:
+            await response.aclose()
+            self._entries.move_to_end(key)
+            return httpx.Response(200, headers=entry.headers, content=entry.content, request=request)
+
+        if self._is_cacheable(response):
+            # Keep raw bytes, the client decodes them with the original Content-Encoding header
+            content = b"".join([chunk async for chunk in response.stream])
+            await response.aclose()
+            self._entries[key] = _CacheEntry(headers=response.headers, content=content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            return httpx.Response(200, headers=response.headers, content=content, request=request)
+
+        return response
+
+    async def aclose(self) -> None:
+        self._entries.clear()
+        await self._transport.aclose()
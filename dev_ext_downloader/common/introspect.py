@@ -0,0 +1,107 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import os
+import zipfile
+from pathlib import Path
+from typing import Callable, Collection
+
+from .lazy import LazyJsonMixin
+
+ASSETS_DIR_NAME: str = ".assets"
+_ASSETS_INFO_NAME: str = "assets.json"
+_MAX_MEMBER_SIZE: int = 4 * 1024 * 1024
+
+# Member kind -> (file name in the assets dir, content)
+ArchiveMembers = dict[str, tuple[str, bytes]]
+ArchiveReader = Callable[[Path], ArchiveMembers]
+
+
+@dataclasses.dataclass(frozen=True)
+class ArchiveAssets(LazyJsonMixin):
+    manifest: str | None = None
+    icon: str | None = None
+    readme: str | None = None
+
+
+def get_assets_dir(download_dir: Path, sha256: str) -> Path:
+    return download_dir / ASSETS_DIR_NAME / sha256[:2] / sha256
+
+
+def load_archive_assets(download_dir: Path, sha256: str | None) -> ArchiveAssets | None:
+    if not sha256:
+        return None
+    info_path = get_assets_dir(download_dir, sha256) / _ASSETS_INFO_NAME
+    if not info_path.is_file():
+        return None
+    try:
+        return ArchiveAssets.from_json(info_path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"Introspect warning: assets info {info_path} could not be read.", e)
+        return None
+
+
+def get_asset_url(download_dir: Path, sha256: str, file_name: str) -> str:
+    return (get_assets_dir(download_dir, sha256) / file_name).relative_to(download_dir).as_posix()
+
+
+def read_zip_member(archive: zipfile.ZipFile, name: str, max_size: int = _MAX_MEMBER_SIZE) -> bytes | None:
+    # Size from the central directory, oversized members are never decompressed
+    info = archive.getinfo(name)
+    if info.file_size > max_size:
+        return None
+    return archive.read(info)
+
+
+def _introspect_archive(file_path: Path, assets_dir: Path, reader: ArchiveReader) -> ArchiveAssets:
+    try:
+        members = reader(file_path)
+    except (zipfile.BadZipFile, OSError, ValueError, KeyError) as e:
+        print(f"Introspect warning: archive {file_path} could not be read.", e)
+        members = {}
+
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    for file_name, content in members.values():
+        (assets_dir / file_name).write_bytes(content)
+    assets = ArchiveAssets(**{k: v[0] for k, v in members.items()})
+    # Info file is written last and atomically, it marks the digest as introspected
+    info_path = assets_dir / _ASSETS_INFO_NAME
+    temp_path = info_path.with_name(f"{_ASSETS_INFO_NAME}.tmp")
+    temp_path.write_text(assets.to_json(ensure_ascii=False), encoding="utf-8")
+    os.replace(temp_path, info_path)
+    return assets
+
+
+async def introspect_archives(
+        download_dir: Path,
+        files: Collection[tuple[Path, str]],
+        reader: ArchiveReader,
+        max_workers: int | None = None,
+) -> dict[str, ArchiveAssets]:
+    from tqdm.asyncio import tqdm
+    results: dict[str, ArchiveAssets] = {}
+    pending: dict[str, Path] = {}
+    for file_path, sha256 in files:
+        if sha256 in results or sha256 in pending:
+            continue
+        assets = load_archive_assets(download_dir, sha256)
+        if assets is not None:
+            results[sha256] = assets
+        elif file_path.is_file():
+            pending[sha256] = file_path
+
+    if len(pending) == 0:
+        return results
+
+    # zipfile only seeks to the central directory and the requested members, threads are enough
+    loop = asyncio.get_running_loop()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            sha256: loop.run_in_executor(
+                executor, _introspect_archive, file_path, get_assets_dir(download_dir, sha256), reader
+            )
+            for sha256, file_path in pending.items()
+        }
+        for sha256, assets in zip(futures.keys(), await tqdm.gather(*futures.values(), desc="Introspecting")):
+            results[sha256] = assets
+    return results
@@ -1,14 +1,15 @@
 from datetime import datetime
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
-import pytz
+if TYPE_CHECKING:
+    import pytz
 
 
 class ISO8601ParseError(Exception):
     pass
 
 
-def parse_iso8601(s: str, default_tz: Union[str, pytz.BaseTzInfo] = "UTC") -> datetime:
+def parse_iso8601(s: str, default_tz: Union[str, 'pytz.BaseTzInfo'] = "UTC") -> datetime:
     s = s.replace("Z", "+00:00")
     try:
         dt = datetime.fromisoformat(s)
@@ -28,7 +29,9 @@ def parse_iso8601(s: str, default_tz: Union[str, pytz.BaseTzInfo] = "UTC") -> da
     return dt
 
 
-def _get_tz(tz: Union[str, pytz.BaseTzInfo]) -> pytz.BaseTzInfo:
+def _get_tz(tz: Union[str, 'pytz.BaseTzInfo']) -> 'pytz.BaseTzInfo':
+    # pytz is imported by the first date parsed, not by importing the api
+    import pytz
     if isinstance(tz, str):
         return pytz.timezone(tz)
     elif isinstance(tz, pytz.BaseTzInfo):
@@ -39,7 +42,7 @@ def _get_tz(tz: Union[str, pytz.BaseTzInfo]) -> pytz.BaseTzInfo:
 
 def format_datetime(
         dt: datetime,
-        target_tz: Union[str, pytz.BaseTzInfo] = "UTC",
+        target_tz: Union[str, 'pytz.BaseTzInfo'] = "UTC",
         fmt: str = "%Y-%m-%d %H:%M:%S %Z%z",
 ) -> str:
     target = _get_tz(target_tz)
@@ -49,8 +52,8 @@ def format_datetime(
 
 def convert_tz(
         dt: datetime,
-        from_tz: Union[str, pytz.BaseTzInfo],
-        to_tz: Union[str, pytz.BaseTzInfo],
+        from_tz: Union[str, 'pytz.BaseTzInfo'],
+        to_tz: Union[str, 'pytz.BaseTzInfo'],
 ) -> datetime:
     from_tz_obj = _get_tz(from_tz)
     to_tz_obj = _get_tz(to_tz)
@@ -61,4 +64,5 @@ def convert_tz(
 
 
 def get_utcnow() -> datetime:
+    import pytz
     return datetime.now(pytz.utc)
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from .models import DownloadedFile
+
+
+def get_inputs_fingerprint(*inputs: Any) -> str:
+    # Inputs in their JSON form, a plan is only resumed by a run with the same fingerprint
+    content = json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class RunJournal:
+    # Append-only JSON lines, each record is synced before the work it describes goes on
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._plan: dict[str, Any] | None = None
+        self._fingerprint: str | None = None
+        self._downloaded: dict[str, tuple[str, str | None]] = {}
+        self._committed: set[str] = set()
+        # Records waiting for the running group write, and that write
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._writer: asyncio.Task | None = None
+        if path is not None and path.is_file():
+            try:
+                self._load(path)
+            except Exception as e:
+                print(f"Journal warning: journal {path} could not be read, starting over.", e)
+                self._reset()
+
+    def _reset(self) -> None:
+        self._plan = None
+        self._fingerprint = None
+        self._downloaded.clear()
+        self._committed.clear()
+
+    def _load(self, path: Path) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last record can be torn by a crash, it was never acted on
+                    break
+                match record["type"]:
+                    case "plan":
+                        self._reset()
+                        self._plan = record["plan"]
+                        self._fingerprint = record.get("fingerprint")
+                    case "downloaded":
+                        self._downloaded[record["key"]] = (record["path"], record["sha256"])
+                    case "committed":
+                        self._committed.add(record["key"])
+
+    def _write_lines(self, lines: list[str], truncate: bool = False) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._path, "w" if truncate else "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _write_pending(self) -> None:
+        # Records arriving during a write go into the next one, one fsync per group
+        while len(self._pending) > 0:
+            group, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write_lines, [i[0] for i in group])
+            except BaseException as e:
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+            else:
+                for _, future in group:
+                    if not future.done():
+                        future.set_result(None)
+
+    async def _append(self, record: dict[str, Any]) -> None:
+        if self._path is None:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((json.dumps(record, ensure_ascii=False) + "\n", future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+        # Returns once the record is on disk
+        await future
+
+    def get_plan(self, fingerprint: str) -> dict[str, Any] | None:
+        # Plan of the interrupted run, only when it was created from the same inputs
+        if self._plan is not None and self._fingerprint != fingerprint:
+            print("Journal warning: inputs changed since the interrupted run, its plan is discarded.")
+            self._reset()
+        return self._plan
+
+    def start(self, plan: dict[str, Any], fingerprint: str | None = None) -> None:
+        # Compared in its JSON form, as it is read back from the journal
+        plan = json.loads(json.dumps(plan, ensure_ascii=False))
+        if self._plan == plan and (fingerprint is None or self._fingerprint == fingerprint):
+            # Same plan as the interrupted run, its completed work is kept
+            return
+        self._reset()
+        self._plan = plan
+        self._fingerprint = fingerprint
+        if self._path is not None:
+            # Once per run before any download, written directly
+            self._write_lines([json.dumps(
+                {"type": "plan", "plan": plan, "fingerprint": fingerprint}, ensure_ascii=False
+            ) + "\n"], truncate=True)
+
+    def get_downloaded(self, key: str) -> DownloadedFile | None:
+        item = self._downloaded.get(key)
+        if item is None:
+            return None
+        path = Path(item[0])
+        return DownloadedFile(path=path, sha256=item[1]) if path.is_file() else None
+
+    async def record_downloaded(self, key: str, downloaded_file: DownloadedFile) -> None:
+        self._downloaded[key] = (str(downloaded_file.path), downloaded_file.sha256)
+        await self._append({
+            "type": "downloaded",
+            "key": key,
+            "path": str(downloaded_file.path),
+            "sha256": downloaded_file.sha256,
+        })
+
+    def is_committed(self, key: str) -> bool:
+        return key in self._committed
+
+    async def record_committed(self, key: str) -> None:
+        self._committed.add(key)
+        await self._append({"type": "committed", "key": key})
+
+    def finish(self) -> None:
+        self._reset()
+        if self._path is not None:
+            self._path.unlink(missing_ok=True)
@@ -0,0 +1,139 @@
+import asyncio
+import dataclasses
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Any, Generator
+
+from .lazy import LazyJsonMixin
+from .models import LayoutReport
+
+LAYOUT_FILE_NAME: str = ".layout.json"
+_SHARD_WIDTH: int = 2
+_SHARD_NAME_PATTERN = re.compile(r"[0-9a-f]{2}")
+
+# Layout per download dir with the mtime it was read at, the file is only re-read when it changes
+_layouts: dict[str, tuple[int, 'DirLayout']] = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class DirLayout(LazyJsonMixin):
+    # Hash dir levels above each extension dir, 0 is one dir per extension at the top level
+    shard_levels: int = 0
+    # Levels of an unfinished migration, extension dirs not moved yet are still found there
+    migrating_from: tuple[int, ...] = ()
+
+    @property
+    def all_levels(self) -> tuple[int, ...]:
+        return (self.shard_levels,) + tuple(i for i in self.migrating_from if i != self.shard_levels)
+
+
+def load_dir_layout(download_dir: Path) -> DirLayout:
+    layout_path = download_dir / LAYOUT_FILE_NAME
+    try:
+        mtime_ns = layout_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return DirLayout()
+    key = os.path.abspath(layout_path)
+    cached = _layouts.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    layout = DirLayout.from_json(layout_path.read_text(encoding="utf-8"))
+    _layouts[key] = (mtime_ns, layout)
+    return layout
+
+
+def save_dir_layout(download_dir: Path, layout: DirLayout) -> None:
+    layout_path = download_dir / LAYOUT_FILE_NAME
+    temp_path = layout_path.with_name(f"{layout_path.name}.tmp")
+    download_dir.mkdir(parents=True, exist_ok=True)
+    temp_path.write_text(layout.to_json(ensure_ascii=False), encoding="utf-8")
+    os.replace(temp_path, layout_path)
+    _layouts.pop(os.path.abspath(layout_path), None)
+
+
+def get_shard_names(item_id: str, shard_levels: int) -> list[str]:
+    # Ids differing only in case share their shard dirs
+    digest = hashlib.sha1(item_id.lower().encode("utf-8")).hexdigest()
+    return [digest[i * _SHARD_WIDTH:(i + 1) * _SHARD_WIDTH] for i in range(shard_levels)]
+
+
+def get_item_dir(download_dir: Path, item_id: str, layout: DirLayout | None = None) -> Path:
+    layout = layout if layout is not None else load_dir_layout(download_dir)
+    # Until a migration is done, an extension dir not moved yet is still used where it is
+    for shard_levels in layout.migrating_from:
+        item_dir = download_dir.joinpath(*get_shard_names(item_id, shard_levels), item_id)
+        if item_dir.is_dir():
+            return item_dir
+    return download_dir.joinpath(*get_shard_names(item_id, layout.shard_levels), item_id)
+
+
+def _iter_shard_dirs(dir_path: str, levels: int) -> Generator[str, Any, None]:
+    if levels == 0:
+        yield dir_path
+        return
+    with os.scandir(dir_path) as it:
+        entries = [i.path for i in it if _SHARD_NAME_PATTERN.fullmatch(i.name) and i.is_dir(follow_symlinks=False)]
+    for entry in sorted(entries):
+        yield from _iter_shard_dirs(entry, levels - 1)
+
+
+def iter_item_meta_paths(download_dir: Path, shard_levels: int) -> Generator[Path, Any, None]:
+    # Only the shard dirs of one level are listed, never one huge top-level dir
+    if not download_dir.is_dir():
+        return
+    for shard_dir in _iter_shard_dirs(os.path.abspath(download_dir), shard_levels):
+        with os.scandir(shard_dir) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False) or entry.name.startswith("."):
+                    continue
+                meta_path = Path(entry.path) / f"{entry.name}.json"
+                if meta_path.is_file():
+                    yield meta_path
+
+
+def _remove_empty_shard_dirs(download_dir: Path, shard_levels: int) -> None:
+    for level in range(shard_levels, 0, -1):
+        for shard_dir in list(_iter_shard_dirs(os.path.abspath(download_dir), level)):
+            try:
+                os.rmdir(shard_dir)
+            except OSError:
+                pass
+
+
+def _migrate_dir_layout(download_dir: Path, layout: DirLayout) -> LayoutReport:
+    current = load_dir_layout(download_dir)
+    source_levels = [i for i in current.all_levels if i != layout.shard_levels]
+    if len(source_levels) == 0:
+        return LayoutReport(shard_levels=layout.shard_levels)
+
+    # Written first, new extension dirs go to the new layout and an interrupted migration is continued
+    save_dir_layout(download_dir, DirLayout(shard_levels=layout.shard_levels, migrating_from=tuple(source_levels)))
+    moved_dirs = 0
+    skipped_dirs = 0
+    for level in source_levels:
+        for meta_path in list(iter_item_meta_paths(download_dir, level)):
+            item_dir = meta_path.parent
+            target_dir = get_item_dir(download_dir, item_dir.name, layout)
+            if item_dir == target_dir:
+                continue
+            if target_dir.exists():
+                print(f"Layout warning: {target_dir} already exists, {item_dir} is not moved.")
+                skipped_dirs += 1
+                continue
+            target_dir.parent.mkdir(parents=True, exist_ok=True)
+            # A rename of the whole dir on one filesystem, no file is copied
+            os.rename(item_dir, target_dir)
+            moved_dirs += 1
+        _remove_empty_shard_dirs(download_dir, level)
+
+    if skipped_dirs == 0:
+        save_dir_layout(download_dir, layout)
+    return LayoutReport(shard_levels=layout.shard_levels, moved_dirs=moved_dirs, skipped_dirs=skipped_dirs)
+
+
+async def migrate_dir_layout(download_dir: Path, shard_levels: int) -> LayoutReport:
+    if shard_levels < 0:
+        raise ValueError(f"Shard levels can't be negative: {shard_levels}")
+    return await asyncio.to_thread(_migrate_dir_layout, download_dir, DirLayout(shard_levels=shard_levels))
@@ -0,0 +1,61 @@
+import importlib
+from typing import Any, Callable, Mapping
+
+
+def lazy_exports(package: str, exports: Mapping[str, str]) -> tuple[Callable[[str], Any], Callable[[], list[str]]]:
+    # Module __getattr__ and __dir__ of a package, re-exported names import their module on first access
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        module = importlib.import_module(module_name, package)
+        # Re-exported submodules are the module itself
+        value = module if module.__name__ == f"{package}.{name}" else getattr(module, name)
+        setattr(importlib.import_module(package), name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(importlib.import_module(package))) | set(exports))
+
+    return __getattr__, __dir__
+
+
+def json_config(encoder: Callable[[Any], Any] | None = None, decoder: Callable[[Any], Any] | None = None) -> dict:
+    # Field metadata read by dataclasses_json, same as its config() without importing it
+    options: dict[str, Callable[[Any], Any]] = {}
+    if encoder is not None:
+        options["encoder"] = encoder
+    if decoder is not None:
+        options["decoder"] = decoder
+    return {"dataclasses_json": options}
+
+
+def _json_mixin() -> Any:
+    from dataclasses_json import DataClassJsonMixin
+    # Nested schemas are only built for subclasses of the real mixin
+    if not issubclass(LazyJsonMixin, DataClassJsonMixin):
+        DataClassJsonMixin.register(LazyJsonMixin)
+    return DataClassJsonMixin
+
+
+class LazyJsonMixin:
+    # API of dataclasses_json DataClassJsonMixin, dataclasses_json and marshmallow are imported on first use
+    dataclass_json_config: dict | None = None
+
+    def to_json(self, **kwargs: Any) -> str:
+        return _json_mixin().to_json(self, **kwargs)
+
+    def to_dict(self, encode_json: bool = False) -> dict[str, Any]:
+        return _json_mixin().to_dict(self, encode_json=encode_json)
+
+    @classmethod
+    def from_json(cls, s: str | bytes, **kwargs: Any) -> Any:
+        return _json_mixin().from_json.__func__(cls, s, **kwargs)
+
+    @classmethod
+    def from_dict(cls, kvs: Any, **kwargs: Any) -> Any:
+        return _json_mixin().from_dict.__func__(cls, kvs, **kwargs)
+
+    @classmethod
+    def schema(cls, **kwargs: Any) -> Any:
+        return _json_mixin().schema.__func__(cls, **kwargs)
@@ -1,11 +1,116 @@
 import dataclasses
+import enum
+from pathlib import Path
 
-from dataclasses_json import DataClassJsonMixin
+from .lazy import LazyJsonMixin
+
+
+class SyncMode(enum.StrEnum):
+    SYNC = "sync"
+    PLAN = "plan"
+    APPLY = "apply"
+    BACKFILL = "backfill"
+    CRAWL = "crawl"
+
+
+class DownloadOrder(enum.StrEnum):
+    # Plan order, smallest files first for fast visible progress, largest first for the shortest total time
+    PLAN = "plan"
+    SMALLEST_FIRST = "smallest_first"
+    LARGEST_FIRST = "largest_first"
+
+
+class BundleMode(enum.StrEnum):
+    EXPORT = "export"
+    IMPORT = "import"
+
+
+class CompressFormat(enum.StrEnum):
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+class MetaFormat(enum.StrEnum):
+    # Indented JSON for people reading the metadata, compact JSON for the smallest and fastest files
+    JSON = "json"
+    COMPACT = "compact"
+
+
+class Durability(enum.StrEnum):
+    # When downloaded files are flushed to disk: each before its rename, all once after the run, or never
+    FILE = "file"
+    BATCH = "batch"
+    NONE = "none"
+
+
+@dataclasses.dataclass(frozen=True)
+class RetentionPolicy(LazyJsonMixin):
+    # A version is kept when any of the rules keeps it, no rules means keeping everything
+    keep_last: int | None = None
+    keep_days: int | None = None
+    keep_compatible_builds: tuple[str, ...] = ()
+
+    @property
+    def is_empty(self) -> bool:
+        return self.keep_last is None and self.keep_days is None and len(self.keep_compatible_builds) == 0
 
 
 @dataclasses.dataclass(frozen=True)
-class DownloadOptions(DataClassJsonMixin):
+class DownloadOptions(LazyJsonMixin):
     skip_if_exists: bool = False
     no_metadata: bool = False
     flatten_dir: bool = False
     keep_only_latest: bool = False
+    retention: RetentionPolicy | None = None
+    durability: Durability = Durability.FILE
+    meta_format: MetaFormat = MetaFormat.JSON
+
+    @property
+    def retention_policy(self) -> RetentionPolicy | None:
+        if self.retention is not None and not self.retention.is_empty:
+            return self.retention
+        if self.keep_only_latest:
+            return RetentionPolicy(keep_last=1)
+        return None
+
+
+@dataclasses.dataclass(frozen=True)
+class CleanReport(LazyJsonMixin):
+    removed_files: int = 0
+    removed_dirs: int = 0
+    reclaimed_bytes: int = 0
+    dry_run: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class VerifyReport(LazyJsonMixin):
+    verified_files: int = 0
+    unverified_files: int = 0
+    missing_files: tuple[str, ...] = ()
+    corrupted_files: tuple[str, ...] = ()
+    removed_corrupted: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class BundleReport(LazyJsonMixin):
+    bundle_id: str
+    base_id: str | None = None
+    total_files: int = 0
+    included_files: int = 0
+    included_bytes: int = 0
+    removed_files: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class LayoutReport(LazyJsonMixin):
+    shard_levels: int
+    moved_dirs: int = 0
+    skipped_dirs: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class DownloadedFile:
+    path: Path
+    sha256: str | None = None
+    # Bytes received by this run, a resumed file only counts its missing part
+    downloaded_bytes: int = 0
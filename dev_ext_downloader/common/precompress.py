@@ -0,0 +1,187 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import zlib
+from pathlib import Path
+from typing import AsyncIterable, Collection, Protocol
+
+import aiofile
+
+from .models import CompressFormat
+from .tools import file_sha256, iter_meta_data_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PRECOMPRESSED_SUFFIXES: dict[CompressFormat, str] = {
+    CompressFormat.GZIP: ".gz",
+    CompressFormat.ZSTD: ".zst",
+}
+_GZIP_LEVEL: int = 9
+_ZSTD_LEVEL: int = 19
+_WRITE_BUFFER_SIZE: int = 256 * 1024
+
+
+class _Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def get_precompressed_path(file_path: Path, compress_format: CompressFormat) -> Path:
+    return file_path.with_name(f"{file_path.name}{PRECOMPRESSED_SUFFIXES[compress_format]}")
+
+
+def get_precompressed_paths(file_path: Path) -> list[Path]:
+    return [get_precompressed_path(file_path, i) for i in CompressFormat]
+
+
+def _get_available_formats(formats: Collection[CompressFormat]) -> list[CompressFormat]:
+    results: list[CompressFormat] = []
+    for compress_format in dict.fromkeys(formats):
+        if compress_format == CompressFormat.ZSTD and zstandard is None:
+            print("Precompress warning: zstandard is not installed, skip zstd outputs.")
+            continue
+        results.append(compress_format)
+    return results
+
+
+def _create_compressor(compress_format: CompressFormat) -> _Compressor:
+    if compress_format == CompressFormat.GZIP:
+        # zlib writes a gzip header without name and mtime, the same content always gives the same bytes
+        return zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compressobj()
+
+
+def _remove_unused_variants(file_path: Path, formats: Collection[CompressFormat]) -> None:
+    # Left over variants would be served with outdated content
+    for compress_format in CompressFormat:
+        if compress_format not in formats:
+            get_precompressed_path(file_path, compress_format).unlink(missing_ok=True)
+
+
+def _sync_variant_mtime(file_path: Path, variant_paths: Collection[Path]) -> None:
+    # Variants carry the mtime of their source, a variant with another mtime is stale
+    stat = os.stat(file_path)
+    for variant_path in variant_paths:
+        os.utime(variant_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def _is_unchanged(file_path: Path, variant_paths: Collection[Path], size: int, sha256: str) -> bool:
+    try:
+        if os.stat(file_path).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    if not all(i.is_file() for i in variant_paths):
+        return False
+    return file_sha256(file_path) == sha256
+
+
+async def write_output(
+        file_path: Path,
+        chunks: AsyncIterable[str],
+        formats: Collection[CompressFormat] = (),
+) -> bool:
+    formats = _get_available_formats(formats)
+    variant_paths = [get_precompressed_path(file_path, i) for i in formats]
+    target_paths = [file_path, *variant_paths]
+    temp_paths = [i.with_name(f"{i.name}.tmp") for i in target_paths]
+    compressors = [_create_compressor(i) for i in formats]
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        async with contextlib.AsyncExitStack() as stack:
+            files = [await stack.enter_async_context(aiofile.async_open(i, "wb")) for i in temp_paths]
+
+            async def write(data: bytes) -> None:
+                hasher.update(data)
+                await files[0].write(data)
+                for compressor, f in zip(compressors, files[1:]):
+                    compressed = compressor.compress(data)
+                    if compressed:
+                        await f.write(compressed)
+
+            # The rendered output is streamed, only the write buffer is held in memory
+            buffer = bytearray()
+            async for chunk in chunks:
+                buffer += chunk.encode("utf-8")
+                if len(buffer) >= _WRITE_BUFFER_SIZE:
+                    size += len(buffer)
+                    await write(bytes(buffer))
+                    buffer.clear()
+            size += len(buffer)
+            await write(bytes(buffer))
+            for compressor, f in zip(compressors, files[1:]):
+                await f.write(compressor.flush())
+
+        # Unchanged outputs keep their mtime, so ETags and caches stay valid
+        if await asyncio.to_thread(_is_unchanged, file_path, variant_paths, size, hasher.hexdigest()):
+            for temp_path in temp_paths:
+                temp_path.unlink(missing_ok=True)
+            changed = False
+        else:
+            for temp_path, target_path in zip(temp_paths, target_paths):
+                os.replace(temp_path, target_path)
+            _sync_variant_mtime(file_path, variant_paths)
+            changed = True
+    except BaseException:
+        for temp_path in temp_paths:
+            temp_path.unlink(missing_ok=True)
+        raise
+
+    _remove_unused_variants(file_path, formats)
+    return changed
+
+
+def _precompress_file(file_path: Path, formats: Collection[CompressFormat]) -> bool:
+    source_mtime = os.stat(file_path).st_mtime_ns
+    stale_formats: list[CompressFormat] = []
+    for compress_format in formats:
+        try:
+            if os.stat(get_precompressed_path(file_path, compress_format)).st_mtime_ns == source_mtime:
+                continue
+        except FileNotFoundError:
+            pass
+        stale_formats.append(compress_format)
+
+    _remove_unused_variants(file_path, formats)
+    if len(stale_formats) == 0:
+        return False
+
+    content = file_path.read_bytes()
+    variant_paths: list[Path] = []
+    for compress_format in stale_formats:
+        compressor = _create_compressor(compress_format)
+        variant_path = get_precompressed_path(file_path, compress_format)
+        temp_path = variant_path.with_name(f"{variant_path.name}.tmp")
+        temp_path.write_bytes(compressor.compress(content) + compressor.flush())
+        os.replace(temp_path, variant_path)
+        variant_paths.append(variant_path)
+    _sync_variant_mtime(file_path, variant_paths)
+    return True
+
+
+async def precompress_meta_data(
+        download_dir: Path,
+        is_flatten: bool = False,
+        formats: Collection[CompressFormat] = (CompressFormat.GZIP,),
+) -> int:
+    from tqdm.asyncio import tqdm
+    if not download_dir.is_dir():
+        raise NotADirectoryError(download_dir)
+
+    formats = _get_available_formats(formats)
+    loop = asyncio.get_running_loop()
+    results = await tqdm.gather(
+        *[
+            loop.run_in_executor(None, _precompress_file, meta_path, formats)
+            for meta_path in iter_meta_data_json(download_dir, is_flatten)
+        ],
+        desc="Precompressing",
+    )
+    return sum(results)
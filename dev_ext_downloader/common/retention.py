@@ -0,0 +1,48 @@
+import datetime
+from typing import Any, Callable, Collection, Hashable, Sequence, TypeVar
+
+from .models import RetentionPolicy
+
+T = TypeVar("T")
+
+
+def select_retained_versions(
+        versions: Sequence[T],
+        policy: RetentionPolicy,
+        sort_key: Callable[[T], Any],
+        updated_at: Callable[[T], datetime.datetime | None],
+        is_compatible: Callable[[T, str], bool],
+        group_key: Callable[[T], Hashable] = lambda v: None,
+        pinned: Collection[int] = (),
+        now: datetime.datetime | None = None,
+) -> list[T]:
+    # Positions in versions are used as identity, versions of different groups may compare equal
+    groups: dict[Hashable, list[int]] = {}
+    for i, version in enumerate(versions):
+        groups.setdefault(group_key(version), []).append(i)
+    for positions in groups.values():
+        positions.sort(key=lambda i: sort_key(versions[i]), reverse=True)
+
+    retained: set[int] = set(pinned)
+    if policy.keep_last is not None:
+        for positions in groups.values():
+            retained.update(positions[:max(policy.keep_last, 0)])
+    if policy.keep_days is not None:
+        now = now if now is not None else datetime.datetime.now(datetime.timezone.utc)
+        threshold = now - datetime.timedelta(days=policy.keep_days)
+        for i, version in enumerate(versions):
+            version_updated_at = updated_at(version)
+            if version_updated_at is None:
+                # Unknown age is never a reason to delete
+                retained.add(i)
+            else:
+                if version_updated_at.tzinfo is None:
+                    version_updated_at = version_updated_at.astimezone()
+                if version_updated_at >= threshold:
+                    retained.add(i)
+    for build in policy.keep_compatible_builds:
+        for positions in groups.values():
+            newest = next((i for i in positions if is_compatible(versions[i], build)), None)
+            if newest is not None:
+                retained.add(newest)
+    return [v for i, v in enumerate(versions) if i in retained]
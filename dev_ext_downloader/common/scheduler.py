@@ -0,0 +1,24 @@
+import asyncio
+import random
+from typing import Any, Awaitable, Callable
+
+
+async def run_periodically(
+        job: Callable[[], Awaitable[Any]],
+        interval: float,
+        jitter: float = 0.0,
+        stop_event: asyncio.Event | None = None,
+        name: str = "job",
+) -> None:
+    stop_event = stop_event if stop_event is not None else asyncio.Event()
+    while not stop_event.is_set():
+        try:
+            await job()
+        except Exception as e:
+            print(f"Scheduler warning: {name} failed.", e)
+        # Jitter spreads the polls of different sources and daemons over time
+        delay = max(0.0, interval + random.uniform(-jitter, jitter))
+        try:
+            await asyncio.wait_for(stop_event.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
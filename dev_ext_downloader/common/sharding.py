@@ -0,0 +1,149 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.synchronize import Semaphore
+from typing import Any, Awaitable, Callable, Collection, Hashable, Protocol, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_MIN_POLL_DELAY: float = 0.001
+_MAX_POLL_DELAY: float = 0.05
+
+# Download budget shared by all shard processes, set by the pool initializer
+_shared_semaphore: Semaphore | None = None
+_shared_concurrency: int = 1
+
+
+class SyncPlan(Protocol):
+    to_download: tuple[Any, ...]
+    unchanged: tuple[Any, ...]
+    to_delete: tuple[str, ...]
+
+
+P = TypeVar("P", bound=SyncPlan)
+
+
+def get_shard(key: str, shards: int) -> int:
+    # hash() of str is salted per process, crc32 gives every process the same shard
+    return zlib.crc32(key.lower().encode("utf-8")) % shards
+
+
+def partition(items: Collection[T], shards: int, key: Callable[[T], str]) -> list[list[T]]:
+    results: list[list[T]] = [[] for _ in range(shards)]
+    for item in items:
+        results[get_shard(key(item), shards)].append(item)
+    return results
+
+
+def merge_sync_plans(plans: Collection[P], task_key: Callable[[Any], Hashable]) -> P:
+    # Dependencies resolved by several shards show up in several plans
+    to_download: dict[Hashable, Any] = {}
+    unchanged: dict[Hashable, Any] = {}
+    to_delete: dict[str, None] = {}
+    for plan in plans:
+        to_download.update((task_key(i), i) for i in plan.to_download)
+        unchanged.update((task_key(i), i) for i in plan.unchanged)
+        to_delete.update((i, None) for i in plan.to_delete)
+    for key in to_download.keys():
+        unchanged.pop(key, None)
+
+    download_tasks = tuple(to_download.values())
+    download_bytes = sum(i.size for i in download_tasks if i.size is not None)
+    return dataclasses.replace(
+        next(iter(plans)),
+        to_download=download_tasks,
+        unchanged=tuple(unchanged.values()),
+        to_delete=tuple(to_delete.keys()),
+        download_bytes=download_bytes,
+        unknown_size_files=sum(1 for i in download_tasks if i.size is None),
+        estimated_seconds=None,
+    )
+
+
+def split_sync_plan(plan: P, shards: int, task_owner: Callable[[Any], str]) -> list[P]:
+    # All versions of one extension go to one shard, it owns the metadata file and its retention
+    to_download = partition(plan.to_download, shards, task_owner)
+    unchanged = partition(plan.unchanged, shards, task_owner)
+    return [
+        dataclasses.replace(
+            plan,
+            to_download=tuple(to_download[i]),
+            unchanged=tuple(unchanged[i]),
+            to_delete=(),
+            download_bytes=sum(t.size for t in to_download[i] if t.size is not None),
+            unknown_size_files=sum(1 for t in to_download[i] if t.size is None),
+            estimated_seconds=None,
+        )
+        for i in range(shards)
+        if len(to_download[i]) > 0 or len(unchanged[i]) > 0
+    ]
+
+
+class SharedLimiter:
+    def __init__(self, semaphore: Semaphore, concurrency: int) -> None:
+        self._semaphore = semaphore
+        # Only as many tasks as could ever run here poll the shared semaphore
+        self._local = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self) -> None:
+        await self._local.acquire()
+        try:
+            delay = _MIN_POLL_DELAY
+            while not self._semaphore.acquire(False):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _MAX_POLL_DELAY)
+        except BaseException:
+            self._local.release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self._semaphore.release()
+        self._local.release()
+        return False
+
+
+def get_shared_limiter() -> SharedLimiter:
+    if _shared_semaphore is None:
+        raise RuntimeError("Shared limiter is only available in shard processes")
+    return SharedLimiter(_shared_semaphore, _shared_concurrency)
+
+
+def _init_shard(semaphore: Semaphore, concurrency: int) -> None:
+    global _shared_semaphore, _shared_concurrency
+    _shared_semaphore = semaphore
+    _shared_concurrency = concurrency
+
+
+def _run_shard(func: Callable[..., Awaitable[R]], args: tuple) -> R:
+    # Each shard process runs its own event loop and HTTP client
+    return asyncio.run(func(*args))
+
+
+class ShardPool:
+    def __init__(self, shards: int, concurrency: int) -> None:
+        if shards < 1:
+            raise ValueError(f"Shard count must be positive: {shards}")
+        # Spawned processes don't inherit the coordinator's event loop and threads
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=shards,
+            mp_context=context,
+            initializer=_init_shard,
+            initargs=(context.BoundedSemaphore(concurrency), concurrency),
+        )
+
+    async def run(self, func: Callable[..., Awaitable[R]], shard_args: Collection[tuple]) -> list[R]:
+        loop = asyncio.get_running_loop()
+        return list(await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _run_shard, func, args) for args in shard_args
+        ]))
+
+    async def __aenter__(self) -> 'ShardPool':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        return False
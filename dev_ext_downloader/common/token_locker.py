@@ -2,13 +2,14 @@ import asyncio
 
 
 class TokenLockEntry:
-    __slots__ = ("lock", "owner", "recursion", "waiters")
+    __slots__ = ("lock", "owner", "recursion", "refs")
 
     def __init__(self) -> None:
         self.lock: asyncio.Lock = asyncio.Lock()
         self.owner: asyncio.Task | None = None
         self.recursion: int = 0
-        self.waiters: int = 0
+        # Waiting and owning tasks, the entry is dropped when it reaches zero
+        self.refs: int = 0
 
 
 class TokenLockContext:
@@ -27,89 +28,64 @@ class TokenLockContext:
 
 
 class TokenLock:
+    # Entries are only touched between awaits, the event loop never interleaves two tasks there,
+    # so no manager lock is needed and tokens never contend with each other
     def __init__(self) -> None:
         self._locks: dict[str, TokenLockEntry] = {}
-        self._mgr_lock: asyncio.Lock = asyncio.Lock()
 
     def lock(self, token: str, timeout: float | None = None) -> TokenLockContext:
         return TokenLockContext(self, token, timeout)
 
-    async def acquire(self, token: str, timeout: float | None = None) -> TokenLockEntry:
-        return await self._acquire_internal(token, timeout)
-
-    async def release(self, token: str) -> None:
-        await self._release_internal(token)
+    def _unref(self, token: str, entry: TokenLockEntry) -> None:
+        entry.refs -= 1
+        if entry.refs == 0 and self._locks.get(token) is entry:
+            del self._locks[token]
 
-    async def _acquire_internal(self, token: str, timeout: float | None) -> TokenLockEntry:
-        async with self._mgr_lock:
-            entry = self._locks.get(token)
-            if entry is None:
-                entry = TokenLockEntry()
-                self._locks[token] = entry
-            entry.waiters += 1
+    async def acquire(self, token: str, timeout: float | None = None) -> TokenLockEntry:
+        entry = self._locks.get(token)
+        if entry is None:
+            entry = TokenLockEntry()
+            self._locks[token] = entry
+
+        current = asyncio.current_task()
+        if current is not None and entry.owner is current:
+            entry.recursion += 1
+            return entry
 
-        got_it = False
+        entry.refs += 1
         try:
-            current = asyncio.current_task()
-            if entry.owner is current:
-                entry.recursion += 1
-                got_it = True
-                return entry
-
             if timeout is None:
                 await entry.lock.acquire()
             else:
-                await asyncio.wait_for(entry.lock.acquire(), timeout)
+                # asyncio.Lock hands a lock granted during cancellation on to the next waiter
+                async with asyncio.timeout(timeout):
+                    await entry.lock.acquire()
+        except BaseException:
+            self._unref(token, entry)
+            raise
 
-            entry.owner = current
-            entry.recursion = 1
-            got_it = True
-            return entry
+        entry.owner = current
+        entry.recursion = 1
+        return entry
 
-        except asyncio.CancelledError:
-            raise
-        except asyncio.TimeoutError:
-            raise
-        finally:
-            async with self._mgr_lock:
-                entry.waiters -= 1
-                if not got_it and entry.waiters == 0 and entry.owner is None and not entry.lock.locked():
-                    existing = self._locks.get(token)
-                    if existing is entry:
-                        del self._locks[token]
-
-    async def _release_internal(self, token: str) -> None:
-        async with self._mgr_lock:
-            entry = self._locks.get(token)
-            if entry is None:
-                raise RuntimeError("release on unknown token")
-
-            current = asyncio.current_task()
-            if entry.owner is not current:
-                raise RuntimeError("current task does not own the lock for token")
-
-            entry.recursion -= 1
-            if entry.recursion > 0:
-                return
-
-            entry.owner = None
-            try:
-                entry.lock.release()
-            except RuntimeError as exc:
-                raise RuntimeError("internal lock release error") from exc
-
-            if entry.waiters == 0 and not entry.lock.locked() and entry.owner is None:
-                existing = self._locks.get(token)
-                if existing is entry:
-                    del self._locks[token]
-
-    async def is_locked(self, token: str) -> bool:
-        async with self._mgr_lock:
-            entry = self._locks.get(token)
-            if not entry:
-                return False
-            return entry.owner is not None or entry.lock.locked()
-
-    async def known_token_count(self) -> int:
-        async with self._mgr_lock:
-            return len(self._locks)
+    async def release(self, token: str) -> None:
+        entry = self._locks.get(token)
+        if entry is None:
+            raise RuntimeError("release on unknown token")
+        if entry.owner is not asyncio.current_task():
+            raise RuntimeError("current task does not own the lock for token")
+
+        entry.recursion -= 1
+        if entry.recursion > 0:
+            return
+
+        entry.owner = None
+        entry.lock.release()
+        self._unref(token, entry)
+
+    def is_locked(self, token: str) -> bool:
+        entry = self._locks.get(token)
+        return entry is not None and entry.lock.locked()
+
+    def known_token_count(self) -> int:
+        return len(self._locks)
@@ -1,15 +1,84 @@
+import asyncio
+import contextlib
+import functools
 import hashlib
 import os
 import re
 from collections.abc import Callable
 from pathlib import Path
-from typing import Any, Generator, Mapping
+from typing import Any, AsyncGenerator, Collection, Generator, Mapping
 from urllib.parse import urljoin, urlparse, urlunparse, quote, urlencode
 
-import aiofile
-import aioshutil
 import httpx
-from tenacity import retry, stop_after_attempt, wait_incrementing, retry_if_exception_type
+
+from .layout import LAYOUT_FILE_NAME, iter_item_meta_paths, load_dir_layout
+from .models import CleanReport, DownloadedFile, Durability
+
+_HASH_BUFFER_SIZE: int = 4 * 1024 * 1024
+# Response chunks are coalesced to at least this size before they are written
+_WRITE_BUFFER_SIZE: int = 1024 * 1024
+# Smaller files are not worth a fallocate call
+_PREALLOCATE_MIN_SIZE: int = 4 * 1024 * 1024
+
+
+class SyncBatch:
+    # Files written with batch durability, flushed to disk together after the run
+    def __init__(self) -> None:
+        self._files: set[Path] = set()
+
+    def add(self, file_path: Path) -> None:
+        self._files.add(file_path)
+
+    def _sync(self, files: Collection[Path]) -> None:
+        # Most pages are written back by now, the late fsync calls are cheap
+        for file_path in files:
+            with contextlib.suppress(FileNotFoundError):
+                fsync_path(file_path)
+        for dir_path in {i.parent for i in files}:
+            fsync_dir(dir_path)
+
+    async def flush(self) -> None:
+        files, self._files = self._files, set()
+        if len(files) > 0:
+            await asyncio.to_thread(self._sync, files)
+
+
+def fsync_path(file_path: Path) -> None:
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(dir_path: Path) -> None:
+    # Makes renames in the dir durable, directories can't be opened on Windows
+    if os.name == "nt":
+        return
+    fsync_path(dir_path)
+
+
+def get_staging_dir(temp_dir: Path, target_dir: Path) -> Path:
+    # os.replace can't rename across filesystems, the file is staged next to its target instead of copied
+    if os.stat(temp_dir).st_dev == os.stat(target_dir).st_dev:
+        return temp_dir
+    return target_dir
+
+
+def _preallocate(fd: int, size: int) -> None:
+    if not hasattr(os, "posix_fallocate"):
+        return
+    with contextlib.suppress(OSError):
+        os.posix_fallocate(fd, 0, size)
+
+
+@contextlib.asynccontextmanager
+async def open_client(client: httpx.AsyncClient | None = None) -> AsyncGenerator[httpx.AsyncClient, Any]:
+    if client is not None:
+        yield client
+    else:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as new_client:
+            yield new_client
 
 
 def get_file_name_from_header(headers: httpx.Headers) -> str | None:
@@ -32,12 +101,27 @@ def get_file_name_from_response(response: httpx.Response) -> str | None:
     return result.strip()
 
 
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_incrementing(start=0, increment=2, max=30),
-    retry=retry_if_exception_type(httpx.HTTPError),
-    reraise=True
-)
+def retry_http_errors(func: Callable[..., Any]) -> Callable[..., Any]:
+    # Retries a coroutine function on HTTP errors, tenacity is imported by the first call
+    retrying: Callable[..., Any] | None = None
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        nonlocal retrying
+        if retrying is None:
+            from tenacity import retry, stop_after_attempt, wait_incrementing, retry_if_exception_type
+            retrying = retry(
+                stop=stop_after_attempt(5),
+                wait=wait_incrementing(start=0, increment=2, max=30),
+                retry=retry_if_exception_type(httpx.HTTPError),
+                reraise=True
+            )(func)
+        return await retrying(*args, **kwargs)
+
+    return wrapper
+
+
+@retry_http_errors
 async def download_file(
         client: httpx.AsyncClient,
         url: str | httpx.URL,
@@ -45,19 +129,30 @@ async def download_file(
         file_name: str | Callable[[str | None], str | None] | None = None,
         temp_dir: Path | None = None,
         skip_if_exists: bool = False,
-) -> Path:
+        resume: bool = False,
+        durability: Durability = Durability.FILE,
+        sync_batch: SyncBatch | None = None,
+) -> DownloadedFile:
     temp_dir = target_dir if temp_dir is None else temp_dir
     temp_dir.mkdir(parents=True, exist_ok=True)
     target_dir.mkdir(parents=True, exist_ok=True)
 
-    target_tmp_path = temp_dir / hashlib.sha1(str(url).encode("utf-8")).hexdigest()
+    staging_dir = get_staging_dir(temp_dir, target_dir)
+    target_tmp_path = staging_dir / f".{hashlib.sha1(str(url).encode('utf-8')).hexdigest()}.tmp"
 
     if file_name and isinstance(file_name, str):
         target_final_path = target_dir / file_name.strip()
         if skip_if_exists and target_final_path.is_file():
-            return target_final_path
+            return DownloadedFile(path=target_final_path)
+
+    # Partial file of an interrupted run, only the missing part is requested
+    resume_offset = target_tmp_path.stat().st_size if resume and target_tmp_path.is_file() else 0
+    headers = {"Range": f"bytes={resume_offset}-"} if resume_offset > 0 else None
 
-    async with client.stream("GET", url, follow_redirects=True) as response:
+    async with client.stream("GET", url, headers=headers, follow_redirects=True) as response:
+        if response.status_code == 416 and resume_offset > 0:
+            # Partial file is not shorter than the remote one, download it again
+            target_tmp_path.unlink(missing_ok=True)
         response.raise_for_status()
 
         if file_name is None:
@@ -72,38 +167,160 @@ async def download_file(
 
         target_final_path = target_dir / file_name
         if skip_if_exists and target_final_path.is_file():
-            return target_final_path
+            return DownloadedFile(path=target_final_path)
+
+        hasher = hashlib.sha256()
+        is_resumed = resume_offset > 0 and response.status_code == 206
+        if is_resumed:
+            await asyncio.to_thread(_update_hasher, hasher, target_tmp_path)
+        # Content-Length is the encoded size, only identity responses know their file size
+        content_length = response.headers.get("Content-Length")
+        file_size = (
+            int(content_length)
+            if content_length and content_length.isdigit() and not is_resumed
+               and response.headers.get("Content-Encoding", "identity") == "identity"
+            else None
+        )
+        import aiofile
+        async with aiofile.async_open(target_tmp_path, mode="ab" if is_resumed else "wb") as f:
+            is_preallocated = file_size is not None and file_size >= _PREALLOCATE_MIN_SIZE
+            if is_preallocated:
+                # One extent for the whole file, less fragmentation and no growing on every write
+                await asyncio.to_thread(_preallocate, f.file.fileno(), file_size)
+            written = 0
+            try:
+                buffer: list[bytes] = []
+                buffer_size = 0
+                async for chunk in response.aiter_bytes():
+                    hasher.update(chunk)
+                    buffer.append(chunk)
+                    buffer_size += len(chunk)
+                    if buffer_size >= _WRITE_BUFFER_SIZE:
+                        await f.write(b"".join(buffer))
+                        written += buffer_size
+                        buffer.clear()
+                        buffer_size = 0
+                if buffer_size > 0:
+                    await f.write(b"".join(buffer))
+                    written += buffer_size
+            finally:
+                if is_preallocated and written < file_size:
+                    # Preallocated space past the written body would be kept as zeros,
+                    # a failed download is resumed from the bytes it really wrote
+                    os.ftruncate(f.file.fileno(), written)
+            if durability == Durability.FILE or (durability == Durability.BATCH and sync_batch is None):
+                await f.flush(sync_metadata=True)
+
+        os.replace(target_tmp_path, target_final_path)
+        if durability == Durability.BATCH and sync_batch is not None:
+            sync_batch.add(target_final_path)
+        return DownloadedFile(path=target_final_path, sha256=hasher.hexdigest(), downloaded_bytes=written)
+
+
+@retry_http_errors
+async def get_content_length(client: httpx.AsyncClient, url: str | httpx.URL) -> int | None:
+    response = await client.head(url, follow_redirects=True)
+    response.raise_for_status()
+    content_length = response.headers.get("Content-Length")
+    return int(content_length) if content_length and content_length.isdigit() else None
+
+
+def estimate_transfer_seconds(num_bytes: int, bandwidth: float | None) -> float | None:
+    if bandwidth is None or bandwidth <= 0:
+        return None
+    return num_bytes / bandwidth
+
 
-        async with aiofile.async_open(target_tmp_path, mode="wb") as f:
-            async for chunk in response.aiter_bytes():
-                await f.write(chunk)
-            await f.flush(sync_metadata=True)
+def _update_hasher(hasher: Any, file_path: Path) -> None:
+    buffer = bytearray(_HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            hasher.update(view[:size])
 
-        await aioshutil.move(target_tmp_path, target_final_path)
-        return target_final_path
 
+def file_sha256(file_path: Path) -> str:
+    hasher = hashlib.sha256()
+    _update_hasher(hasher, file_path)
+    return hasher.hexdigest()
 
-def clean_dir(target_dir: Path, keep: set[Path]) -> None:
-    for file_path in target_dir.rglob("*"):
-        file_path: Path
-        if file_path.is_file() and file_path not in keep:
+
+async def write_file_atomic(file_path: Path, content: str) -> None:
+    # Readers and a crash only ever see the old or the new content, never a half-written file
+    import aiofile
+    temp_path = file_path.with_name(f"{file_path.name}.tmp")
+    async with aiofile.async_open(temp_path, "w", encoding="utf-8") as f:
+        await f.write(content)
+        await f.flush(sync_metadata=True)
+    os.replace(temp_path, file_path)
+
+
+def clean_dir(
+        target_dir: Path,
+        keep: Collection[str | os.PathLike],
+        keep_dirs: Collection[str | os.PathLike] = (),
+        dry_run: bool = False,
+) -> CleanReport:
+    keep_files = {os.path.abspath(p) for p in keep}
+    keep_dir_set = {os.path.abspath(p) for p in keep_dirs}
+    removed_files = 0
+    removed_dirs = 0
+    reclaimed_bytes = 0
+
+    # Single scandir pass, returns True if the dir is (or would be) empty afterward
+    def _clean(dir_path: str) -> bool:
+        nonlocal removed_files, removed_dirs, reclaimed_bytes
+        remaining = 0
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path in keep_dir_set or not _clean(entry.path):
+                        remaining += 1
+                    else:
+                        if not dry_run:
+                            os.rmdir(entry.path)
+                        removed_dirs += 1
+                elif entry.path in keep_files:
+                    remaining += 1
+                else:
+                    reclaimed_bytes += entry.stat(follow_symlinks=False).st_size
+                    if not dry_run:
+                        os.unlink(entry.path)
+                    removed_files += 1
+        return remaining == 0
+
+    if target_dir.is_dir():
+        _clean(os.path.abspath(target_dir))
+
+    return CleanReport(
+        removed_files=removed_files,
+        removed_dirs=removed_dirs,
+        reclaimed_bytes=reclaimed_bytes,
+        dry_run=dry_run,
+    )
+
+
+def remove_files(file_paths: Collection[Path]) -> list[Path]:
+    removed: list[Path] = []
+    for file_path in file_paths:
+        try:
             file_path.unlink()
-    for dir_path in target_dir.rglob("*"):
-        dir_path: Path
-        if dir_path.is_dir() and not any(dir_path.iterdir()):
-            dir_path.rmdir()
+        except FileNotFoundError:
+            continue
+        removed.append(file_path)
+    return removed
 
 
 def iter_meta_data_json(
         download_dir: Path, is_flatten: bool
 ) -> Generator[Path, Any, None]:
-    for p in download_dir.iterdir():
-        if is_flatten:
-            if p.is_file() and p.suffix == ".json":
+    if is_flatten:
+        for p in download_dir.iterdir():
+            if p.is_file() and p.suffix == ".json" and p.name != LAYOUT_FILE_NAME:
                 yield p
-        else:
-            if p.is_dir() and (p / f"{p.name}.json").is_file():
-                yield p / f"{p.name}.json"
+    else:
+        for shard_levels in load_dir_layout(download_dir).all_levels:
+            yield from iter_item_meta_paths(download_dir, shard_levels)
 
 
 def pretty_bytes(num_bytes: int, precision: int = 2) -> str:
@@ -0,0 +1,53 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Collection
+
+from .models import VerifyReport
+from .tools import file_sha256
+
+
+async def verify_files(
+        files: Collection[tuple[Path, str | None]],
+        remove_corrupted: bool = False,
+        max_workers: int | None = None,
+) -> VerifyReport:
+    from tqdm.asyncio import tqdm
+    missing_files: list[str] = []
+    unverified_files = 0
+    check_files: list[tuple[Path, str, int]] = []
+    for file_path, sha256 in files:
+        try:
+            file_size = os.stat(file_path).st_size
+        except FileNotFoundError:
+            missing_files.append(str(file_path))
+            continue
+        if sha256 is None:
+            unverified_files += 1
+        else:
+            check_files.append((file_path, sha256, file_size))
+
+    corrupted_files: list[str] = []
+    if len(check_files) > 0:
+        # Largest files first, so no worker is left hashing a huge file alone at the end
+        check_files.sort(key=lambda i: i[2], reverse=True)
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            digests = await tqdm.gather(
+                *[loop.run_in_executor(executor, file_sha256, i[0]) for i in check_files],
+                desc="Verifying",
+            )
+        for (file_path, sha256, _), digest in zip(check_files, digests):
+            if digest != sha256:
+                corrupted_files.append(str(file_path))
+                if remove_corrupted:
+                    file_path.unlink(missing_ok=True)
+
+    return VerifyReport(
+        verified_files=len(check_files) - len(corrupted_files),
+        unverified_files=unverified_files,
+        missing_files=tuple(missing_files),
+        corrupted_files=tuple(corrupted_files),
+        removed_corrupted=remove_corrupted,
+    )
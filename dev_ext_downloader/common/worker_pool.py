@@ -0,0 +1,53 @@
+import asyncio
+from typing import Awaitable, Callable, Collection, Iterable, TypeVar
+
+from .models import DownloadOrder
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+def order_by_size(items: Collection[T], order: DownloadOrder, size: Callable[[T], int | None]) -> Iterable[T]:
+    if order == DownloadOrder.PLAN:
+        return items
+    # Unknown sizes go last in both orders, sorting is stable for equal sizes
+    if order == DownloadOrder.SMALLEST_FIRST:
+        return sorted(items, key=lambda i: (size(i) is None, size(i) or 0))
+    return sorted(items, key=lambda i: (size(i) is None, -(size(i) or 0)))
+
+
+async def run_worker_pool(
+        items: Iterable[T],
+        handler: Callable[[T], Awaitable[None]],
+        workers: int,
+        backlog: int | None = None,
+        total: int | None = None,
+        desc: str | None = None,
+) -> None:
+    from tqdm.asyncio import tqdm
+    if workers < 1:
+        raise ValueError(f"Worker count must be positive: {workers}")
+    # Only the workers and the bounded backlog are alive, not one coroutine per item
+    queue: asyncio.Queue = asyncio.Queue(maxsize=backlog if backlog is not None else workers * 2)
+
+    async def produce() -> None:
+        for item in items:
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(_STOP)
+
+    with tqdm(total=total, desc=desc) as progress:
+        async def work() -> None:
+            while (item := await queue.get()) is not _STOP:
+                await handler(item)
+                progress.update(1)
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # A failed item stops the pool, like a failed task in gather
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,4 +1,45 @@
-from .data import JetbrainsDef
-from .downloader import download_latest_extensions
-from .html import generate_index_html
-from .xml import generate_update_plugins_xml
+from typing import TYPE_CHECKING
+
+from dev_ext_downloader.common.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .backfill import backfill_plugins
+    from .cleaner import clean_orphan_files
+    from .data import JetbrainsDef, JetbrainsSyncPlan
+    from .downloader import download_latest_extensions, apply_sync_plan
+    from .html import generate_index_html
+    from .introspect import introspect_downloaded_files
+    from .planner import plan_latest_extensions
+    from .sharded import download_latest_extensions_sharded
+    from .verifier import verify_downloaded_files
+    from .xml import generate_update_plugins_xml
+
+# Heavy dependencies are only imported by the commands that use them
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "backfill_plugins": ".backfill",
+    "clean_orphan_files": ".cleaner",
+    "JetbrainsDef": ".data",
+    "JetbrainsSyncPlan": ".data",
+    "download_latest_extensions": ".downloader",
+    "apply_sync_plan": ".downloader",
+    "generate_index_html": ".html",
+    "introspect_downloaded_files": ".introspect",
+    "plan_latest_extensions": ".planner",
+    "download_latest_extensions_sharded": ".sharded",
+    "verify_downloaded_files": ".verifier",
+    "generate_update_plugins_xml": ".xml",
+})
+__all__ = [
+    "backfill_plugins",
+    "clean_orphan_files",
+    "JetbrainsDef",
+    "JetbrainsSyncPlan",
+    "download_latest_extensions",
+    "apply_sync_plan",
+    "generate_index_html",
+    "introspect_downloaded_files",
+    "plan_latest_extensions",
+    "download_latest_extensions_sharded",
+    "verify_downloaded_files",
+    "generate_update_plugins_xml",
+]
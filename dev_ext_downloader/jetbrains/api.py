@@ -1,8 +1,11 @@
 import datetime
 import urllib.parse as urlparser
+from typing import TYPE_CHECKING
 
 import httpx
-from lxml import etree
+
+if TYPE_CHECKING:
+    from lxml import etree
 
 from .data import JetbrainsPlugin, JetbrainsPluginVersion
 
@@ -11,6 +14,7 @@ class JetbrainsPluginAPI:
     _SERVER: str = "https://plugins.jetbrains.com"
     _PLUGIN_LIST_URL: str = f"{_SERVER}/plugins/list"
     _PLUGIN_DOWNLOAD_URL: str = f"{_SERVER}/plugin/download"
+    _PLUGIN_UPDATES_URL: str = f"{_SERVER}/api/plugins/{{plugin_id}}/updates"
 
     def __init__(self, client: httpx.AsyncClient) -> None:
         self._client = client
@@ -19,7 +23,7 @@ class JetbrainsPluginAPI:
         download_params = {"pluginId": plugin_id, "version": plugin_version}
         return f"{self._PLUGIN_DOWNLOAD_URL}?{urlparser.urlencode(download_params)}"
 
-    def _parse_plugins_xml(self, plugins_xml: etree._Element) -> list[JetbrainsPlugin]:
+    def _parse_plugins_xml(self, plugins_xml: 'etree._Element') -> list[JetbrainsPlugin]:
         plugins: list[JetbrainsPlugin] = []
         for category in plugins_xml.findall("category"):
             category_name = category.get("name", "")
@@ -73,5 +77,38 @@ class JetbrainsPluginAPI:
         response = await self._client.get(url=self._PLUGIN_LIST_URL, params=params)
         response.raise_for_status()
 
+        # lxml is imported by the first plugin list, not by importing the api
+        from lxml import etree
         root = etree.fromstring(response.content)
         return self._parse_plugins_xml(root)
+
+    async def list_plugin_updates(
+            self, plugin_id: str, page: int = 1, size: int = 100
+    ) -> list[JetbrainsPluginVersion]:
+        # Version history, newest first, only numeric plugin ids are supported
+        response = await self._client.get(
+            url=self._PLUGIN_UPDATES_URL.format(plugin_id=urlparser.quote(plugin_id)),
+            params={"page": page, "size": size},
+        )
+        response.raise_for_status()
+
+        versions: list[JetbrainsPluginVersion] = []
+        for update in response.json():
+            if "id" not in update or not update.get("version"):
+                continue
+            update_date = update.get("cdate")
+            versions.append(
+                JetbrainsPluginVersion(
+                    version=update["version"],
+                    change_notes=(update.get("notes") or "").strip(),
+                    size=int(update["size"]) if update.get("size") else None,
+                    updated_date=datetime.datetime.fromtimestamp(
+                        int(update_date) / 1000.0
+                    ) if update_date else None,
+                    since_build=update.get("since") or None,
+                    until_build=update.get("until") or None,
+                    download_url=f"{self._PLUGIN_DOWNLOAD_URL}?{urlparser.urlencode({'updateId': update['id']})}",
+                    depends=(),
+                )
+            )
+        return versions
@@ -0,0 +1,110 @@
+import asyncio
+import dataclasses
+import datetime
+from contextlib import AbstractAsyncContextManager
+from pathlib import Path
+from typing import Collection
+
+import httpx
+
+from dev_ext_downloader.common.backfill import BackfillBuffer, BackfillCheckpoint
+from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.tools import open_client
+from .api import JetbrainsPluginAPI
+from .data import JetbrainsDef, JetbrainsDownloadTask, JetbrainsPluginVersion, JetbrainsSyncPlan
+from .downloader import _apply_sync_plan
+from .planner import build_plugins_spec_dict
+from .utils import is_compatible_build
+
+
+def _is_backfill_version(
+        version: JetbrainsPluginVersion,
+        builds: Collection[str],
+        since: datetime.datetime | None,
+) -> bool:
+    if since is not None and version.updated_date is not None and version.updated_date < since:
+        return False
+    if len(builds) == 0:
+        return True
+    return any(is_compatible_build(version.since_build, version.until_build, build) for build in builds)
+
+
+async def backfill_plugins(
+        plugins_def: Collection[str | JetbrainsDef],
+        target_dir: Path = Path("./downloads/jetbrains/"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
+        checkpoint_path: Path | None = None,
+        max_buffered_versions: int = 256,
+        since: datetime.datetime | None = None,
+        builds: Collection[str] = (),
+        default_target_build_version: str | None = None,
+        default_download_options: DownloadOptions = DownloadOptions(),
+) -> int:
+    if len(plugins_def) == 0:
+        return 0
+
+    plugins_spec_dict = build_plugins_spec_dict(
+        plugins_def, default_target_build_version, default_download_options
+    )
+    # Update dates are parsed as local time
+    since = since.astimezone().replace(tzinfo=None) if since is not None and since.tzinfo is not None else since
+    checkpoint = BackfillCheckpoint(checkpoint_path)
+    page_size = min(max_buffered_versions, 100)
+
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    async with open_client(client) as client:
+        async def flush(tasks: list[JetbrainsDownloadTask]) -> list[JetbrainsDownloadTask]:
+            return await _apply_sync_plan(
+                client, JetbrainsSyncPlan(to_download=tuple(tasks)), target_dir, temp_dir, limiter, concurrency
+            )
+
+        api = JetbrainsPluginAPI(client)
+        buffer: BackfillBuffer[JetbrainsDownloadTask] = BackfillBuffer(flush, checkpoint, max_buffered_versions)
+        for plugin_id, plugin_def in plugins_spec_dict.items():
+            if buffer.dropped > 0:
+                # The download budget is closed, the rest is left to the next run
+                break
+            if checkpoint.is_completed(plugin_id):
+                continue
+            if not plugin_id.isdigit():
+                print(f"Backfill warning: version history needs a numeric plugin id, skip '{plugin_id}'")
+                continue
+            plugins = await api.list_plugins(plugin_id)
+            if len(plugins) == 0:
+                print(f"Backfill warning: No plugin '{plugin_id}' found")
+                continue
+
+            # Older versions are what backfill is for, retention would remove them again
+            download_options = dataclasses.replace(plugin_def.download_options, keep_only_latest=False, retention=None)
+            target_builds = builds if len(builds) > 0 else (
+                (plugin_def.target_build_version,) if plugin_def.target_build_version else ()
+            )
+            page = 1
+            # Version history is paged, only one page and the buffered tasks stay in memory
+            while True:
+                versions = await api.list_plugin_updates(plugin_id, page, page_size)
+                for version in versions:
+                    version_key = f"{plugins[0].id}@{version.version}"
+                    if checkpoint.is_done(version_key) or not _is_backfill_version(version, target_builds, since):
+                        continue
+                    await buffer.add(
+                        version_key,
+                        JetbrainsDownloadTask(
+                            plugin=dataclasses.replace(plugins[0], version=version),
+                            download_options=download_options,
+                            size=version.size,
+                        ),
+                    )
+                if len(versions) < page_size:
+                    break
+                page += 1
+            await buffer.complete(plugin_id)
+        await buffer.flush()
+    return buffer.flushed
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Collection
+
+import aiofile
+
+from dev_ext_downloader.common.introspect import get_assets_dir
+from dev_ext_downloader.common.layout import LAYOUT_FILE_NAME
+from dev_ext_downloader.common.models import CleanReport
+from dev_ext_downloader.common.precompress import get_precompressed_paths
+from dev_ext_downloader.common.tools import clean_dir, iter_meta_data_json
+from .codec import loads_plugin
+from .utils import get_download_file_path
+
+_GENERATED_FILE_NAMES: tuple[str, ...] = ("index.html", "favicon.ico", "updatePlugins.xml")
+
+
+async def _load_referenced_files(
+        download_dir: Path,
+        is_flatten: bool,
+        keep_ids: set[str] | None,
+) -> tuple[set[Path], set[Path]]:
+    keep: set[Path] = set()
+    keep_dirs: set[Path] = set()
+    for meta_path in iter_meta_data_json(download_dir, is_flatten):
+        async with aiofile.async_open(meta_path, "r", encoding="utf-8") as f:
+            try:
+                plugin = loads_plugin(await f.read())
+            except Exception as e:
+                print(f"Cleaner warning: meta file {meta_path} could not be read, keep it.", e)
+                keep.add(meta_path)
+                keep.update(get_precompressed_paths(meta_path))
+                if not is_flatten:
+                    keep_dirs.add(meta_path.parent)
+                continue
+        if keep_ids is not None and plugin.id not in keep_ids:
+            continue
+        keep.add(meta_path)
+        keep.update(get_precompressed_paths(meta_path))
+        keep.update(get_download_file_path(download_dir, is_flatten, plugin, v) for v in plugin.versions)
+        keep_dirs.update(get_assets_dir(download_dir, v.sha256) for v in plugin.versions if v.sha256)
+    return keep, keep_dirs
+
+
+async def clean_orphan_files(
+        download_dir: Path,
+        is_flatten: bool = False,
+        keep_ids: Collection[str] | None = None,
+        keep_files: Collection[Path] = (),
+        dry_run: bool = False,
+) -> CleanReport:
+    if not download_dir.is_dir():
+        raise NotADirectoryError(download_dir)
+
+    keep, keep_dirs = await _load_referenced_files(
+        download_dir=download_dir,
+        is_flatten=is_flatten,
+        keep_ids=set(keep_ids) if keep_ids is not None else None,
+    )
+    keep.update(download_dir / i for i in _GENERATED_FILE_NAMES)
+    keep.update(p for i in _GENERATED_FILE_NAMES for p in get_precompressed_paths(download_dir / i))
+    keep.add(download_dir / LAYOUT_FILE_NAME)
+    keep.update(keep_files)
+    return clean_dir(download_dir, keep, keep_dirs, dry_run)
@@ -0,0 +1,72 @@
+import datetime
+from typing import Any
+
+from dev_ext_downloader.common.codec import dumps_meta_data, loads_meta_data
+from dev_ext_downloader.common.models import MetaFormat
+from .data import JetbrainsDownloadPlugin, JetbrainsDownloadVersion
+
+
+# Written out per field instead of dataclasses_json reflection, the output matches its to_dict
+
+
+def _encode_version(version: JetbrainsDownloadVersion) -> dict[str, Any]:
+    return {
+        "version": version.version,
+        "change_notes": version.change_notes,
+        "size": version.size,
+        "updated_date": version.updated_date.isoformat() if version.updated_date else None,
+        "since_build": version.since_build,
+        "until_build": version.until_build,
+        "download_url": version.download_url,
+        "download_file_name": version.download_file_name,
+        "depends": list(version.depends),
+        "sha256": version.sha256,
+    }
+
+
+def _decode_version(data: dict[str, Any]) -> JetbrainsDownloadVersion:
+    updated_date = data.get("updated_date")
+    return JetbrainsDownloadVersion(
+        version=data["version"],
+        change_notes=data["change_notes"],
+        size=data["size"],
+        updated_date=datetime.datetime.fromisoformat(updated_date) if updated_date else None,
+        since_build=data["since_build"],
+        until_build=data["until_build"],
+        download_url=data["download_url"],
+        download_file_name=data["download_file_name"],
+        depends=tuple(data["depends"]),
+        sha256=data.get("sha256"),
+    )
+
+
+def encode_plugin(plugin: JetbrainsDownloadPlugin) -> dict[str, Any]:
+    return {
+        "id": plugin.id,
+        "name": plugin.name,
+        "description": plugin.description,
+        "vendor": plugin.vendor,
+        "category": plugin.category,
+        "tags": list(plugin.tags),
+        "versions": [_encode_version(i) for i in plugin.versions],
+    }
+
+
+def decode_plugin(data: dict[str, Any]) -> JetbrainsDownloadPlugin:
+    return JetbrainsDownloadPlugin(
+        id=data["id"],
+        name=data["name"],
+        description=data["description"],
+        vendor=data["vendor"],
+        category=data["category"],
+        tags=tuple(data["tags"]),
+        versions=tuple(_decode_version(i) for i in data["versions"]),
+    )
+
+
+def dumps_plugin(plugin: JetbrainsDownloadPlugin, meta_format: MetaFormat = MetaFormat.JSON) -> str:
+    return dumps_meta_data(encode_plugin(plugin), meta_format)
+
+
+def loads_plugin(content: str | bytes) -> JetbrainsDownloadPlugin:
+    return decode_plugin(loads_meta_data(content))
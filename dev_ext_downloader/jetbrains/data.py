@@ -1,18 +1,17 @@
 import dataclasses
 import datetime
 
-from dataclasses_json import DataClassJsonMixin, config
-
+from dev_ext_downloader.common.lazy import LazyJsonMixin, json_config
 from dev_ext_downloader.common.models import DownloadOptions
 
 
 @dataclasses.dataclass(frozen=True)
-class JetbrainsPluginVersion(DataClassJsonMixin):
+class JetbrainsPluginVersion(LazyJsonMixin):
     version: str
     change_notes: str
     size: int | None
     updated_date: datetime.datetime | None = dataclasses.field(
-        metadata=config(
+        metadata=json_config(
             encoder=lambda dt: dt.isoformat() if dt else None,
             decoder=lambda s: datetime.datetime.fromisoformat(s) if s else None,
         )
@@ -24,7 +23,7 @@ class JetbrainsPluginVersion(DataClassJsonMixin):
 
 
 @dataclasses.dataclass(frozen=True)
-class JetbrainsPlugin(DataClassJsonMixin):
+class JetbrainsPlugin(LazyJsonMixin):
     id: str
     name: str
     description: str
@@ -35,12 +34,12 @@ class JetbrainsPlugin(DataClassJsonMixin):
 
 
 @dataclasses.dataclass(frozen=True)
-class JetbrainsDownloadVersion(DataClassJsonMixin):
+class JetbrainsDownloadVersion(LazyJsonMixin):
     version: str
     change_notes: str
     size: int | None
     updated_date: datetime.datetime | None = dataclasses.field(
-        metadata=config(
+        metadata=json_config(
             encoder=lambda dt: dt.isoformat() if dt else None,
             decoder=lambda s: datetime.datetime.fromisoformat(s) if s else None,
         )
@@ -50,10 +49,11 @@ class JetbrainsDownloadVersion(DataClassJsonMixin):
     download_url: str | None
     download_file_name: str
     depends: tuple[str, ...]
+    sha256: str | None = None
 
 
 @dataclasses.dataclass(frozen=True)
-class JetbrainsDownloadPlugin(DataClassJsonMixin):
+class JetbrainsDownloadPlugin(LazyJsonMixin):
     id: str
     name: str
     description: str
@@ -64,7 +64,25 @@ class JetbrainsDownloadPlugin(DataClassJsonMixin):
 
 
 @dataclasses.dataclass(frozen=True)
-class JetbrainsDef(DataClassJsonMixin):
+class JetbrainsDef(LazyJsonMixin):
     plugin_id: str
     target_build_version: str | None
     download_options: DownloadOptions | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class JetbrainsDownloadTask(LazyJsonMixin):
+    plugin: JetbrainsPlugin
+    download_options: DownloadOptions
+    file_path: str | None = None
+    size: int | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class JetbrainsSyncPlan(LazyJsonMixin):
+    to_download: tuple[JetbrainsDownloadTask, ...] = ()
+    unchanged: tuple[JetbrainsDownloadTask, ...] = ()
+    to_delete: tuple[str, ...] = ()
+    download_bytes: int = 0
+    unknown_size_files: int = 0
+    estimated_seconds: float | None = None
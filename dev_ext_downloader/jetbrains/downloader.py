@@ -1,21 +1,48 @@
 import asyncio
+import dataclasses
+import time
+from contextlib import AbstractAsyncContextManager
 from pathlib import Path
 from typing import Collection
 
 import aiofile
 import httpx
-from tenacity import retry, stop_after_attempt, wait_incrementing, retry_if_exception_type
-from tqdm.asyncio import tqdm
 
-from dev_ext_downloader.common.models import DownloadOptions
-from dev_ext_downloader.common.tools import download_file, get_file_name_last_extension
+from dev_ext_downloader.common.budget import BudgetClosedError
+from dev_ext_downloader.common.events import (
+    CommittedEvent,
+    DownloadedEvent,
+    EventSink,
+    FailedEvent,
+    ResolvedEvent,
+    SkippedEvent,
+    SkipReason,
+    WarningEvent,
+)
+from dev_ext_downloader.common.journal import RunJournal, get_inputs_fingerprint
+from dev_ext_downloader.common.models import DownloadOptions, DownloadOrder
+from dev_ext_downloader.common.token_locker import TokenLock
+from dev_ext_downloader.common.tools import (
+    SyncBatch,
+    open_client,
+    download_file,
+    file_sha256,
+    get_file_name_last_extension,
+    write_file_atomic,
+)
+from dev_ext_downloader.common.worker_pool import order_by_size, run_worker_pool
 from .api import JetbrainsPluginAPI
+from .codec import dumps_plugin, loads_plugin
 from .data import (
     JetbrainsDef,
     JetbrainsPlugin,
     JetbrainsDownloadPlugin,
     JetbrainsDownloadVersion,
+    JetbrainsDownloadTask,
+    JetbrainsSyncPlan,
 )
+from .planner import build_plugins_spec_dict, resolve_plugins, create_sync_plan
+from .retention import apply_plan_deletions
 from .utils import get_download_file_name, get_download_file_dir
 
 
@@ -27,32 +54,87 @@ def _merge_versions(
     return [new_version] + old_versions
 
 
+def _find_version_sha256(
+        new_version: JetbrainsDownloadVersion,
+        old_versions: tuple[JetbrainsDownloadVersion, ...]
+) -> str | None:
+    return next(
+        (i.sha256 for i in old_versions if i.download_file_name == new_version.download_file_name),
+        None
+    )
+
+
+def _journal_key(plugin: JetbrainsPlugin) -> str:
+    return f"{plugin.id}@{plugin.version.version}"
+
+
+def _emit_resolved(events: EventSink, plan: JetbrainsSyncPlan, missing_ids: Collection[str]) -> None:
+    for is_unchanged, tasks in ((False, plan.to_download), (True, plan.unchanged)):
+        for task in tasks:
+            events.emit(ResolvedEvent(
+                item_id=task.plugin.id, version=task.plugin.version.version, size=task.size, is_unchanged=is_unchanged
+            ))
+    for plugin_id in missing_ids:
+        events.emit(FailedEvent(item_id=plugin_id, error="No plugin found for the target build"))
+
+
 async def _run_download_task(
         client: httpx.AsyncClient,
         target_dir: Path,
         temp_dir: Path,
         plugin: JetbrainsPlugin,
         download_options: DownloadOptions,
+        meta_lock: TokenLock,
+        journal: RunJournal,
+        sync_batch: SyncBatch,
+        events: EventSink,
+        file_name: str | None = None,
 ) -> None:
     plugin_dir = get_download_file_dir(target_dir, download_options.flatten_dir, plugin.id)
     plugin_dir.mkdir(parents=True, exist_ok=True)
 
-    download_file_path = await download_file(
-        client=client,
-        url=plugin.version.download_url,
-        target_dir=plugin_dir,
-        file_name=lambda n: get_download_file_name(plugin, get_file_name_last_extension(n)),
-        temp_dir=temp_dir,
-        skip_if_exists=download_options.skip_if_exists,
-    )
+    journal_key = _journal_key(plugin)
+    downloaded_file = journal.get_downloaded(journal_key)
+    if downloaded_file is not None:
+        events.emit(SkippedEvent(
+            item_id=plugin.id, version=plugin.version.version, reason=SkipReason.JOURNAL, path=downloaded_file.path
+        ))
+    else:
+        start_time = time.monotonic()
+        downloaded_file = await download_file(
+            client=client,
+            url=plugin.version.download_url,
+            target_dir=plugin_dir,
+            file_name=file_name or (lambda n: get_download_file_name(plugin, get_file_name_last_extension(n))),
+            temp_dir=temp_dir,
+            skip_if_exists=download_options.skip_if_exists,
+            resume=True,
+            durability=download_options.durability,
+            sync_batch=sync_batch,
+        )
+        await journal.record_downloaded(journal_key, downloaded_file)
+        if downloaded_file.sha256 is None:
+            # Only a file which is already there comes back without a digest
+            events.emit(SkippedEvent(
+                item_id=plugin.id, version=plugin.version.version, reason=SkipReason.EXISTS, path=downloaded_file.path
+            ))
+        else:
+            events.emit(DownloadedEvent(
+                item_id=plugin.id,
+                version=plugin.version.version,
+                path=downloaded_file.path,
+                downloaded_bytes=downloaded_file.downloaded_bytes,
+                elapsed_seconds=time.monotonic() - start_time,
+                sha256=downloaded_file.sha256,
+            ))
+    download_file_path = downloaded_file.path
 
     meta_data_path = plugin_dir / f"{plugin.id}.json"
     if download_options.no_metadata:
         if meta_data_path.is_file():
             meta_data_path.unlink(missing_ok=True)
     else:
-        has_old_meta_data = meta_data_path.is_file()
-        async with (aiofile.async_open(meta_data_path, "a+", encoding="utf-8") as f):
+        async with meta_lock.lock(str(meta_data_path)):
             version = JetbrainsDownloadVersion(
                 version=plugin.version.version,
                 change_notes=plugin.version.change_notes,
@@ -63,24 +145,29 @@ async def _run_download_task(
                 download_url=plugin.version.download_url,
                 download_file_name=download_file_path.name,
                 depends=plugin.version.depends,
+                sha256=downloaded_file.sha256,
             )
-            if not has_old_meta_data:
-                version_list = [version]
-            else:
+            exists_versions = None
+            if meta_data_path.is_file():
                 try:
-                    f.seek(0)
-                    exists_versions = JetbrainsDownloadPlugin.from_json(await f.read()).versions
-                    version_list = _merge_versions(version, exists_versions)
+                    async with aiofile.async_open(meta_data_path, "r", encoding="utf-8") as f:
+                        exists_versions = loads_plugin(await f.read()).versions
                 except Exception as e:
-                    print(f"Downloader warning: Can't load old meta data from {plugin.id}.", e)
-                    exists_versions = None
-                    version_list = [version]
-                if exists_versions and download_options.keep_only_latest:
-                    for v in exists_versions:
-                        old_file_path = plugin_dir / v.download_file_name
-                        if old_file_path != download_file_path:
-                            old_file_path.unlink(missing_ok=True)
-                    version_list = [version]
+                    events.warn(
+                        WarningEvent(
+                            item_id=plugin.id, version=plugin.version.version,
+                            message=f"Can't load old meta data: {e}",
+                        ),
+                        f"Downloader warning: Can't load old meta data from {plugin.id}.", e,
+                    )
+            if version.sha256 is None and exists_versions:
+                version = dataclasses.replace(version, sha256=_find_version_sha256(version, exists_versions))
+            if version.sha256 is None:
+                version = dataclasses.replace(version, sha256=await asyncio.to_thread(file_sha256, download_file_path))
+            if exists_versions is None:
+                version_list = [version]
+            else:
+                version_list = _merge_versions(version, exists_versions)
             version_list.sort(key=lambda i: i.updated_date, reverse=True)
             download_meta = JetbrainsDownloadPlugin(
                 id=plugin.id,
@@ -91,43 +178,138 @@ async def _run_download_task(
                 tags=plugin.tags,
                 versions=tuple(version_list),
             )
-            await f.file.truncate(0)
-            f.seek(0)
-            await f.write(download_meta.to_json(indent=2, ensure_ascii=False))
-            await f.flush(sync_metadata=True)
+            # Replaced as a whole, a crash leaves the old or the new metadata, never a torn file
+            await write_file_atomic(meta_data_path, dumps_plugin(download_meta, download_options.meta_format))
+    await journal.record_committed(journal_key)
+    events.emit(CommittedEvent(
+        item_id=plugin.id,
+        version=plugin.version.version,
+        path=download_file_path,
+        meta_data_path=None if download_options.no_metadata else meta_data_path,
+    ))
 
 
 async def _download_task(
-        semaphore: asyncio.Semaphore,
+        limiter: AbstractAsyncContextManager,
         client: httpx.AsyncClient,
         target_dir: Path,
         temp_dir: Path,
         plugin: JetbrainsPlugin,
         download_options: DownloadOptions,
-) -> None:
-    async with semaphore:
-        await _run_download_task(client, target_dir, temp_dir, plugin, download_options)
+        meta_lock: TokenLock,
+        journal: RunJournal,
+        sync_batch: SyncBatch,
+        events: EventSink,
+        file_name: str | None = None,
+) -> bool:
+    # False when the task was dropped by a closed download budget
+    try:
+        async with limiter:
+            await _run_download_task(
+                client, target_dir, temp_dir, plugin, download_options,
+                meta_lock, journal, sync_batch, events, file_name,
+            )
+    except BudgetClosedError:
+        # Shutting down, only in-flight downloads are finished
+        return False
+    except Exception as e:
+        # Still stops the run, the event tells which item it was
+        events.emit(FailedEvent(
+            item_id=plugin.id, version=plugin.version.version, error=str(e) or type(e).__name__, exception=e
+        ))
+        raise
+    return True
 
 
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_incrementing(start=0, increment=2, max=30),
-    retry=retry_if_exception_type(httpx.HTTPError),
-    reraise=True
-)
-async def _load_data_task(
-        semaphore: asyncio.Semaphore, api: JetbrainsPluginAPI, plugin_def: JetbrainsDef
-) -> tuple[str, JetbrainsPlugin] | None:
-    async with semaphore:
-        plugins = await api.list_plugins(
-            plugin_def.plugin_id, plugin_def.target_build_version
-        )
-    if len(plugins) == 0:
-        print(
-            f"No plugin '{plugin_def.plugin_id}' found for build '{plugin_def.target_build_version}'"
+async def _apply_sync_plan(
+        client: httpx.AsyncClient,
+        plan: JetbrainsSyncPlan,
+        target_dir: Path,
+        temp_dir: Path,
+        limiter: AbstractAsyncContextManager,
+        concurrency: int = 4,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        journal: RunJournal | None = None,
+        events: EventSink | None = None,
+) -> list[JetbrainsDownloadTask]:
+    # Returns the tasks dropped by a closed download budget, they are neither downloaded nor committed
+    journal = journal if journal is not None else RunJournal()
+    events = events if events is not None else EventSink()
+    # Versions of one plugin share the metadata file, writes to it are serialized per plan run
+    meta_lock = TokenLock()
+    sync_batch = SyncBatch()
+    # Tasks committed by an interrupted run are skipped, retention still sees every task
+    tasks: list[JetbrainsDownloadTask] = []
+    for task in plan.to_download + plan.unchanged:
+        if journal.is_committed(_journal_key(task.plugin)):
+            events.emit(SkippedEvent(
+                item_id=task.plugin.id, version=task.plugin.version.version, reason=SkipReason.JOURNAL
+            ))
+        else:
+            tasks.append(task)
+    dropped: list[JetbrainsDownloadTask] = []
+
+    async def handle(task: JetbrainsDownloadTask) -> None:
+        if not await _download_task(
+            limiter=limiter,
+            client=client,
+            target_dir=target_dir,
+            temp_dir=temp_dir,
+            plugin=task.plugin,
+            download_options=task.download_options,
+            meta_lock=meta_lock,
+            journal=journal,
+            sync_batch=sync_batch,
+            events=events,
+            file_name=Path(task.file_path).name if task.file_path else None,
+        ):
+            dropped.append(task)
+
+    if len(tasks) > 0:
+        try:
+            await run_worker_pool(
+                items=order_by_size(tasks, download_order, lambda i: i.size),
+                handler=handle,
+                workers=concurrency,
+                total=len(tasks),
+                desc="Downloading",
+            )
+        finally:
+            # Downloads with batch durability are flushed to disk together
+            await sync_batch.flush()
+    if len(dropped) > 0:
+        # Shut down before the plan was done, the journal resumes it and retention waits for the whole plan
+        return dropped
+    # Old versions are removed in one batch after all downloads, exactly as planned by the retention policy
+    await apply_plan_deletions(target_dir, plan.to_download + plan.unchanged, plan.to_delete)
+    journal.finish()
+    return dropped
+
+
+async def apply_sync_plan(
+        plan: JetbrainsSyncPlan,
+        target_dir: Path = Path("./downloads/jetbrains/"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        journal_path: Path | None = None,
+        events: EventSink | None = None,
+) -> None:
+    events = events if events is not None else EventSink()
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    journal = RunJournal(journal_path)
+    journal.start(plan.to_dict(encode_json=True))
+    _emit_resolved(events, plan, ())
+    async with open_client(client) as client:
+        await _apply_sync_plan(
+            client, plan, target_dir, temp_dir, limiter, concurrency, download_order, journal, events
         )
-        return None
-    return plugin_def.plugin_id, plugins[0]
 
 
 async def download_latest_extensions(
@@ -135,66 +317,51 @@ async def download_latest_extensions(
         target_dir: Path = Path("./downloads/jetbrains/"),
         temp_dir: Path | None = None,
         concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
         task_spec_path: Path | None = None,
+        resolve_depends: bool = False,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        journal_path: Path | None = None,
+        events: EventSink | None = None,
         default_target_build_version: str | None = None,
         default_download_options: DownloadOptions = DownloadOptions(),
-) -> None:
+) -> JetbrainsSyncPlan:
     if len(plugins_def) == 0:
-        return
-
-    plugins_spec_dict: dict[str, JetbrainsDef] = {}
-    for d in plugins_def:
-        plugins_spec_dict[d.plugin_id if isinstance(d, JetbrainsDef) else str(d)] = (
-            JetbrainsDef(
-                plugin_id=d.plugin_id,
-                target_build_version=d.target_build_version
-                                     or default_target_build_version,
-                download_options=d.download_options or default_download_options,
-            )
-            if isinstance(d, JetbrainsDef)
-            else JetbrainsDef(
-                plugin_id=d,
-                target_build_version=default_target_build_version,
-                download_options=default_download_options,
-            )
-        )
+        return JetbrainsSyncPlan()
+
+    events = events if events is not None else EventSink()
 
+    plugins_spec_dict = build_plugins_spec_dict(
+        plugins_def, default_target_build_version, default_download_options
+    )
+
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
     temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
     target_dir.mkdir(parents=True, exist_ok=True)
     temp_dir.mkdir(parents=True, exist_ok=True)
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
-        api = JetbrainsPluginAPI(client)
-        semaphore = asyncio.Semaphore(concurrency)
-
-        load_data_tasks = [
-            asyncio.create_task(
-                _load_data_task(semaphore=semaphore, api=api, plugin_def=plugin_def)
-            )
-            for plugin_def in plugins_spec_dict.values()
-        ]
-
-        loaded_data: dict[str, JetbrainsPlugin] = {
-            i[0]: i[1]
-            for i in await tqdm.gather(*load_data_tasks, desc="Loading data")
-            if i is not None
-        }
-
-        download_tasks = [
-            asyncio.create_task(
-                _download_task(
-                    semaphore=semaphore,
-                    client=client,
-                    target_dir=target_dir,
-                    temp_dir=temp_dir,
-                    plugin=v,
-                    download_options=plugins_spec_dict[k].download_options,
-                )
+    journal = RunJournal(journal_path)
+    # Plugin list, build versions and download options as resolved, any change makes a new plan
+    fingerprint = get_inputs_fingerprint(
+        [i.to_dict(encode_json=True) for i in plugins_spec_dict.values()], resolve_depends
+    )
+    async with open_client(client) as client:
+        if (journal_plan := journal.get_plan(fingerprint)) is not None:
+            # Resume the interrupted run with its resolved plan instead of querying the marketplace again
+            plan = JetbrainsSyncPlan.from_dict(journal_plan)
+            loaded_data = {i.plugin.id for i in plan.to_download + plan.unchanged}
+            _emit_resolved(events, plan, ())
+        else:
+            loaded_data = await resolve_plugins(
+                JetbrainsPluginAPI(client), plugins_spec_dict, concurrency, resolve_depends, events
             )
-            for k, v in loaded_data.items()
-        ]
-        if len(download_tasks) > 0:
-            await tqdm.gather(*download_tasks, desc="Downloading")
+            plan = await create_sync_plan(target_dir, plugins_spec_dict, loaded_data)
+            journal.start(plan.to_dict(encode_json=True), fingerprint)
+            _emit_resolved(events, plan, [i for i in plugins_spec_dict.keys() if i not in loaded_data])
+        await _apply_sync_plan(
+            client, plan, target_dir, temp_dir, limiter, concurrency, download_order, journal, events
+        )
 
     if task_spec_path:
         task_spec_path.parent.mkdir(parents=True, exist_ok=True)
@@ -207,3 +374,4 @@ async def download_latest_extensions(
                     ensure_ascii=False,
                 )
             )
+    return plan
@@ -1,10 +1,13 @@
 from pathlib import Path
-from typing import Any
+from typing import Any, Collection
 
 import aiofile
 import aioshutil
 from jinja2 import Template
 
+from dev_ext_downloader.common.introspect import load_archive_assets, get_asset_url
+from dev_ext_downloader.common.models import CompressFormat
+from dev_ext_downloader.common.precompress import write_output
 from dev_ext_downloader.common.tools import build_url, is_valid_http_url, pretty_bytes
 from .utils import iter_meta_data, get_download_file_path
 
@@ -36,9 +39,17 @@ async def load_plugin_render_params(
                 )
             else:
                 print(f"HTML generator warning: file {file_path} not found.")
+        # Icon of the newest introspected version
+        icon_url: str | None = None
+        for plugin_version in plugin_meta_data.versions:
+            assets = load_archive_assets(download_dir, plugin_version.sha256)
+            if assets is not None:
+                icon_url = get_asset_url(download_dir, plugin_version.sha256, assets.icon) if assets.icon else None
+                break
         results.append(
             {
                 "id": plugin_meta_data.id,
+                "icon_url": icon_url,
                 "name": plugin_meta_data.name,
                 "description": plugin_meta_data.description,
                 "vendor": plugin_meta_data.vendor,
@@ -51,7 +62,12 @@ async def load_plugin_render_params(
     return results
 
 
-async def generate_index_html(base_url: str | None, download_dir: Path, is_flatten: bool = False) -> Path:
+async def generate_index_html(
+        base_url: str | None,
+        download_dir: Path,
+        is_flatten: bool = False,
+        precompress: Collection[CompressFormat] = (),
+) -> Path:
     if base_url is not None and not is_valid_http_url(base_url):
         raise ValueError(f"Invalid http base url: {base_url}")
     if not download_dir.is_dir():
@@ -61,7 +77,7 @@ async def generate_index_html(base_url: str | None, download_dir: Path, is_flatt
         template = Template(await f.read(), autoescape=True, enable_async=True)
 
     render_params = await load_plugin_render_params(download_dir, is_flatten)
-    xml_content = await template.render_async(
+    html_chunks = template.generate_async(
         items=render_params,
         update_plugins_xml_url=build_url(
             base=base_url if base_url.endswith("/") else f"{base_url}/",
@@ -70,8 +86,7 @@ async def generate_index_html(base_url: str | None, download_dir: Path, is_flatt
     )
 
     index_html_path = download_dir / "index.html"
-    async with aiofile.async_open(index_html_path, "w", encoding="utf-8") as f:
-        await f.write(xml_content)
+    await write_output(index_html_path, html_chunks, precompress)
 
     await aioshutil.copyfile(_TEMPLATE_FAVICON_PATH, index_html_path.with_name(_TEMPLATE_FAVICON_PATH.name))
 
@@ -0,0 +1,57 @@
+import zipfile
+from pathlib import Path
+
+from dev_ext_downloader.common.introspect import ArchiveAssets, ArchiveMembers, introspect_archives, read_zip_member
+from .utils import iter_meta_data, get_download_file_path
+
+_PLUGIN_XML_NAME: str = "META-INF/plugin.xml"
+_PLUGIN_ICON_NAME: str = "META-INF/pluginIcon.svg"
+
+
+def _read_jar_members(jar: zipfile.ZipFile) -> ArchiveMembers:
+    members: ArchiveMembers = {}
+    plugin_xml_content = read_zip_member(jar, _PLUGIN_XML_NAME)
+    if plugin_xml_content is not None:
+        members["manifest"] = ("plugin.xml", plugin_xml_content)
+    if _PLUGIN_ICON_NAME in jar.NameToInfo:
+        icon_content = read_zip_member(jar, _PLUGIN_ICON_NAME)
+        if icon_content is not None:
+            members["icon"] = ("pluginIcon.svg", icon_content)
+    return members
+
+
+def read_plugin_members(file_path: Path) -> ArchiveMembers:
+    with zipfile.ZipFile(file_path) as archive:
+        if _PLUGIN_XML_NAME in archive.NameToInfo:
+            return _read_jar_members(archive)
+
+        # Zip distribution: <plugin>/lib/*.jar, the jar named like the plugin dir usually holds plugin.xml
+        jar_names = [
+            i for i in archive.namelist()
+            if i.endswith(".jar") and len(i.split("/")) == 3 and i.split("/")[1] == "lib"
+        ]
+        jar_names.sort(key=lambda i: not i.split("/")[2].startswith(i.split("/")[0]))
+        for jar_name in jar_names:
+            # Nested jar is opened through the seekable member stream, without extracting it
+            with archive.open(jar_name) as jar_file, zipfile.ZipFile(jar_file) as jar:
+                if _PLUGIN_XML_NAME in jar.NameToInfo:
+                    return _read_jar_members(jar)
+    return {}
+
+
+async def introspect_downloaded_files(
+        download_dir: Path,
+        is_flatten: bool = False,
+        max_workers: int | None = None,
+) -> dict[str, ArchiveAssets]:
+    if not download_dir.is_dir():
+        raise NotADirectoryError(download_dir)
+
+    files: list[tuple[Path, str]] = []
+    async for plugin in iter_meta_data(download_dir, is_flatten):
+        files.extend(
+            (get_download_file_path(download_dir, is_flatten, plugin, v), v.sha256)
+            for v in plugin.versions
+            if v.sha256 is not None
+        )
+    return await introspect_archives(download_dir, files, read_plugin_members, max_workers)
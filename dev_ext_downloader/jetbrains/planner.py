@@ -0,0 +1,267 @@
+import asyncio
+from pathlib import Path
+from typing import Collection
+
+import httpx
+
+from dev_ext_downloader.common.events import EventSink, WarningEvent
+from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.tools import estimate_transfer_seconds, open_client, retry_http_errors
+from .api import JetbrainsPluginAPI
+from .codec import loads_plugin
+from .data import (
+    JetbrainsDef,
+    JetbrainsPlugin,
+    JetbrainsDownloadPlugin,
+    JetbrainsDownloadTask,
+    JetbrainsSyncPlan,
+)
+from .retention import select_retained_plugin_versions
+from .utils import get_download_file_name, get_download_file_dir
+
+_PLUGIN_FILE_EXTENSIONS: tuple[str, ...] = (".zip", ".jar")
+
+# Platform modules are provided by the IDE itself, not by the plugin repository
+_PLATFORM_MODULE_PREFIX: str = "com.intellij.modules."
+
+
+def build_plugins_spec_dict(
+        plugins_def: Collection[str | JetbrainsDef],
+        default_target_build_version: str | None,
+        default_download_options: DownloadOptions,
+) -> dict[str, JetbrainsDef]:
+    plugins_spec_dict: dict[str, JetbrainsDef] = {}
+    for d in plugins_def:
+        plugins_spec_dict[d.plugin_id if isinstance(d, JetbrainsDef) else str(d)] = (
+            JetbrainsDef(
+                plugin_id=d.plugin_id,
+                target_build_version=d.target_build_version
+                                     or default_target_build_version,
+                download_options=d.download_options or default_download_options,
+            )
+            if isinstance(d, JetbrainsDef)
+            else JetbrainsDef(
+                plugin_id=d,
+                target_build_version=default_target_build_version,
+                download_options=default_download_options,
+            )
+        )
+    return plugins_spec_dict
+
+
+@retry_http_errors
+async def _load_data_task(
+        semaphore: asyncio.Semaphore, api: JetbrainsPluginAPI, plugin_def: JetbrainsDef, events: EventSink
+) -> tuple[str, JetbrainsPlugin] | None:
+    async with semaphore:
+        plugins = await api.list_plugins(
+            plugin_def.plugin_id, plugin_def.target_build_version
+        )
+    if len(plugins) == 0:
+        events.warn(
+            WarningEvent(
+                item_id=plugin_def.plugin_id, message=f"No plugin found for build '{plugin_def.target_build_version}'"
+            ),
+            f"No plugin '{plugin_def.plugin_id}' found for build '{plugin_def.target_build_version}'",
+        )
+        return None
+    return plugin_def.plugin_id, plugins[0]
+
+
+async def _resolve_depends(
+        semaphore: asyncio.Semaphore,
+        api: JetbrainsPluginAPI,
+        plugins_spec_dict: dict[str, JetbrainsDef],
+        loaded_data: dict[str, JetbrainsPlugin],
+        events: EventSink,
+) -> None:
+    from tqdm.asyncio import tqdm
+    # Plugin defs may use numeric ids while depends always use xml ids, so track both
+    known_ids: set[str] = set(plugins_spec_dict) | {i.id for i in loaded_data.values()}
+    pending: dict[asyncio.Task, str] = {}
+
+    def schedule_depends(plugin: JetbrainsPlugin, parent_def: JetbrainsDef) -> None:
+        for depends_id in plugin.version.depends:
+            if depends_id.startswith(_PLATFORM_MODULE_PREFIX) or depends_id in known_ids:
+                continue
+            known_ids.add(depends_id)
+            # Dependencies are resolved for the same build as the plugin requiring them
+            depends_def = JetbrainsDef(
+                plugin_id=depends_id,
+                target_build_version=parent_def.target_build_version,
+                download_options=parent_def.download_options,
+            )
+            plugins_spec_dict[depends_id] = depends_def
+            task = asyncio.create_task(
+                _load_data_task(semaphore=semaphore, api=api, plugin_def=depends_def, events=events)
+            )
+            pending[task] = depends_id
+            progress.total += 1
+            progress.refresh()
+
+    with tqdm(total=0, desc="Loading depends") as progress:
+        for k, v in list(loaded_data.items()):
+            schedule_depends(v, plugins_spec_dict[k])
+        while len(pending) > 0:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                depends_id = pending.pop(task)
+                progress.update(1)
+                try:
+                    result = task.result()
+                except httpx.HTTPError as e:
+                    events.warn(
+                        WarningEvent(item_id=depends_id, message=f"Dependency could not be loaded: {e}"),
+                        f"Dependency warning: plugin '{depends_id}' could not be loaded.", e,
+                    )
+                    continue
+                if result is not None:
+                    loaded_data[depends_id] = result[1]
+                    schedule_depends(result[1], plugins_spec_dict[depends_id])
+
+
+async def resolve_plugins(
+        api: JetbrainsPluginAPI,
+        plugins_spec_dict: dict[str, JetbrainsDef],
+        concurrency: int = 4,
+        resolve_depends: bool = False,
+        events: EventSink | None = None,
+) -> dict[str, JetbrainsPlugin]:
+    from tqdm.asyncio import tqdm
+    events = events if events is not None else EventSink()
+    semaphore = asyncio.Semaphore(concurrency)
+    load_data_tasks = [
+        asyncio.create_task(
+            _load_data_task(semaphore=semaphore, api=api, plugin_def=plugin_def, events=events)
+        )
+        for plugin_def in plugins_spec_dict.values()
+    ]
+    loaded_data = {
+        i[0]: i[1]
+        for i in await tqdm.gather(*load_data_tasks, desc="Loading data")
+        if i is not None
+    }
+    if resolve_depends:
+        # Defs of the resolved dependencies are added to plugins_spec_dict
+        await _resolve_depends(semaphore, api, plugins_spec_dict, loaded_data, events)
+    return loaded_data
+
+
+async def _load_meta_data(meta_data_path: Path) -> JetbrainsDownloadPlugin | None:
+    if not meta_data_path.is_file():
+        return None
+    import aiofile
+    async with aiofile.async_open(meta_data_path, "r", encoding="utf-8") as f:
+        try:
+            return loads_plugin(await f.read())
+        except Exception as e:
+            print(f"Planner warning: meta file {meta_data_path} could not be read.", e)
+            return None
+
+
+def _find_exists_file(
+        plugin_dir: Path,
+        file_stem: str,
+        exists_plugin: JetbrainsDownloadPlugin | None,
+) -> Path | None:
+    # The file extension is only known from the download response, so look it up from metadata or disk
+    if exists_plugin is not None:
+        for v in exists_plugin.versions:
+            if Path(v.download_file_name).stem == file_stem and (plugin_dir / v.download_file_name).is_file():
+                return plugin_dir / v.download_file_name
+    for extension in _PLUGIN_FILE_EXTENSIONS:
+        if (plugin_dir / f"{file_stem}{extension}").is_file():
+            return plugin_dir / f"{file_stem}{extension}"
+    return None
+
+
+async def _plan_plugin(
+        target_dir: Path,
+        plugin: JetbrainsPlugin,
+        download_options: DownloadOptions,
+) -> tuple[JetbrainsDownloadTask, bool, list[Path]]:
+    plugin_dir = get_download_file_dir(target_dir, download_options.flatten_dir, plugin.id)
+    meta_data_path = plugin_dir / f"{plugin.id}.json"
+    file_stem = get_download_file_name(plugin, "")
+
+    exists_plugin = await _load_meta_data(meta_data_path) if not download_options.no_metadata else None
+    exists_file_path = _find_exists_file(plugin_dir, file_stem, exists_plugin)
+
+    task = JetbrainsDownloadTask(
+        plugin=plugin,
+        download_options=download_options,
+        file_path=exists_file_path.relative_to(target_dir).as_posix() if exists_file_path else None,
+        size=plugin.version.size,
+    )
+    is_unchanged = download_options.skip_if_exists and exists_file_path is not None
+
+    to_delete: list[Path] = []
+    if download_options.no_metadata:
+        if meta_data_path.is_file():
+            to_delete.append(meta_data_path)
+    elif download_options.retention_policy is not None and exists_plugin is not None:
+        # Same merged version list as the metadata after download
+        old_versions = [v for v in exists_plugin.versions if v.version != plugin.version.version]
+        retained = select_retained_plugin_versions(
+            [plugin.version] + old_versions,
+            download_options.retention_policy,
+            pinned_versions={plugin.version.version},
+        )
+        for v in old_versions:
+            old_file_path = plugin_dir / v.download_file_name
+            if v not in retained and Path(v.download_file_name).stem != file_stem and old_file_path.is_file():
+                to_delete.append(old_file_path)
+    return task, is_unchanged, to_delete
+
+
+async def create_sync_plan(
+        target_dir: Path,
+        plugins_spec_dict: dict[str, JetbrainsDef],
+        loaded_data: dict[str, JetbrainsPlugin],
+        bandwidth: float | None = None,
+) -> JetbrainsSyncPlan:
+    to_download: list[JetbrainsDownloadTask] = []
+    unchanged: list[JetbrainsDownloadTask] = []
+    to_delete: list[Path] = []
+    for k, v in loaded_data.items():
+        task, is_unchanged, plugin_to_delete = await _plan_plugin(
+            target_dir, v, plugins_spec_dict[k].download_options
+        )
+        if is_unchanged:
+            unchanged.append(task)
+        else:
+            to_download.append(task)
+        to_delete.extend(plugin_to_delete)
+
+    download_bytes = sum(i.size for i in to_download if i.size is not None)
+    return JetbrainsSyncPlan(
+        to_download=tuple(to_download),
+        unchanged=tuple(unchanged),
+        to_delete=tuple(i.relative_to(target_dir).as_posix() for i in to_delete),
+        download_bytes=download_bytes,
+        unknown_size_files=sum(1 for i in to_download if i.size is None),
+        estimated_seconds=estimate_transfer_seconds(download_bytes, bandwidth),
+    )
+
+
+async def plan_latest_extensions(
+        plugins_def: Collection[str | JetbrainsDef],
+        target_dir: Path = Path("./downloads/jetbrains/"),
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        bandwidth: float | None = None,
+        resolve_depends: bool = False,
+        default_target_build_version: str | None = None,
+        default_download_options: DownloadOptions = DownloadOptions(),
+) -> JetbrainsSyncPlan:
+    if len(plugins_def) == 0:
+        return JetbrainsSyncPlan()
+
+    plugins_spec_dict = build_plugins_spec_dict(
+        plugins_def, default_target_build_version, default_download_options
+    )
+    async with open_client(client) as client:
+        loaded_data = await resolve_plugins(
+            JetbrainsPluginAPI(client), plugins_spec_dict, concurrency, resolve_depends
+        )
+    return await create_sync_plan(target_dir, plugins_spec_dict, loaded_data, bandwidth)
@@ -0,0 +1,68 @@
+import asyncio
+import dataclasses
+import datetime
+from pathlib import Path
+from typing import Collection
+
+from dev_ext_downloader.common.models import RetentionPolicy
+from dev_ext_downloader.common.retention import select_retained_versions
+from dev_ext_downloader.common.tools import remove_files, write_file_atomic
+from .codec import dumps_plugin, loads_plugin
+from .data import JetbrainsDownloadTask, JetbrainsDownloadVersion, JetbrainsPluginVersion
+from .utils import get_download_file_dir, is_compatible_build
+
+
+def select_retained_plugin_versions(
+        versions: list[JetbrainsDownloadVersion | JetbrainsPluginVersion],
+        policy: RetentionPolicy,
+        pinned_versions: Collection[str] = (),
+        now: datetime.datetime | None = None,
+) -> list[JetbrainsDownloadVersion | JetbrainsPluginVersion]:
+    return select_retained_versions(
+        versions,
+        policy,
+        sort_key=lambda v: v.updated_date.timestamp() if v.updated_date else 0.0,
+        updated_at=lambda v: v.updated_date,
+        is_compatible=lambda v, build: is_compatible_build(v.since_build, v.until_build, build),
+        pinned=[i for i, v in enumerate(versions) if v.version in pinned_versions],
+        now=now,
+    )
+
+
+async def apply_plan_deletions(
+        target_dir: Path,
+        tasks: Collection[JetbrainsDownloadTask],
+        to_delete: Collection[str],
+) -> list[Path]:
+    import aiofile
+    # Exactly the files the plan lists, never a file one of its tasks downloads
+    task_paths = {i.file_path for i in tasks if i.file_path is not None}
+    delete_paths = {target_dir / i for i in to_delete if i not in task_paths}
+    if len(delete_paths) == 0:
+        return []
+    plugin_tasks: dict[Path, JetbrainsDownloadTask] = {}
+    for task in tasks:
+        if task.download_options.no_metadata:
+            continue
+        plugin_dir = get_download_file_dir(target_dir, task.download_options.flatten_dir, task.plugin.id)
+        plugin_tasks.setdefault(plugin_dir / f"{task.plugin.id}.json", task)
+
+    for meta_data_path, task in plugin_tasks.items():
+        if not meta_data_path.is_file():
+            continue
+        async with aiofile.async_open(meta_data_path, "r", encoding="utf-8") as f:
+            try:
+                exists_plugin = loads_plugin(await f.read())
+            except Exception as e:
+                print(f"Retention warning: Can't load meta data {meta_data_path}.", e)
+                continue
+        versions = tuple(
+            v for v in exists_plugin.versions if meta_data_path.parent / v.download_file_name not in delete_paths
+        )
+        if len(versions) == len(exists_plugin.versions):
+            continue
+        exists_plugin = dataclasses.replace(exists_plugin, versions=versions)
+        await write_file_atomic(meta_data_path, dumps_plugin(exists_plugin, task.download_options.meta_format))
+
+    # Files are only removed after all metadata no longer references them
+    return await asyncio.to_thread(remove_files, sorted(delete_paths))
@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Collection, Hashable
+
+from dev_ext_downloader.common.models import DownloadOptions, DownloadOrder
+from dev_ext_downloader.common.sharding import (
+    ShardPool,
+    get_shared_limiter,
+    merge_sync_plans,
+    partition,
+    split_sync_plan,
+)
+from .data import JetbrainsDef, JetbrainsDownloadTask, JetbrainsSyncPlan
+from .downloader import apply_sync_plan
+from .planner import plan_latest_extensions
+
+
+def _task_owner(task: JetbrainsDownloadTask) -> str:
+    return task.plugin.id
+
+
+def _task_key(task: JetbrainsDownloadTask) -> Hashable:
+    return task.plugin.id, task.plugin.version.version
+
+
+async def _plan_shard(
+        plugins_def: list[str | JetbrainsDef],
+        target_dir: Path,
+        concurrency: int,
+        resolve_depends: bool,
+        default_target_build_version: str | None,
+        default_download_options: DownloadOptions,
+) -> JetbrainsSyncPlan:
+    return await plan_latest_extensions(
+        plugins_def=plugins_def,
+        target_dir=target_dir,
+        concurrency=concurrency,
+        resolve_depends=resolve_depends,
+        default_target_build_version=default_target_build_version,
+        default_download_options=default_download_options,
+    )
+
+
+async def _apply_shard(
+        plan: JetbrainsSyncPlan,
+        target_dir: Path,
+        temp_dir: Path,
+        concurrency: int,
+        download_order: DownloadOrder,
+) -> None:
+    await apply_sync_plan(
+        plan=plan,
+        target_dir=target_dir,
+        temp_dir=temp_dir,
+        concurrency=concurrency,
+        limiter=get_shared_limiter(),
+        download_order=download_order,
+    )
+
+
+async def download_latest_extensions_sharded(
+        plugins_def: Collection[str | JetbrainsDef],
+        target_dir: Path = Path("./downloads/jetbrains/"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        shards: int = 2,
+        resolve_depends: bool = False,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        default_target_build_version: str | None = None,
+        default_download_options: DownloadOptions = DownloadOptions(),
+) -> JetbrainsSyncPlan:
+    if len(plugins_def) == 0:
+        return JetbrainsSyncPlan()
+
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    plugins_shards = [
+        i for i in partition(plugins_def, shards, lambda i: i.plugin_id if isinstance(i, JetbrainsDef) else i)
+        if len(i) > 0
+    ]
+    async with ShardPool(shards, concurrency) as pool:
+        plans = await pool.run(_plan_shard, [
+            (i, target_dir, concurrency, resolve_depends, default_target_build_version, default_download_options)
+            for i in plugins_shards
+        ])
+        # Plans are merged and split again by plugin, so each metadata file has one writer process
+        plan = merge_sync_plans(plans, _task_key)
+        await pool.run(_apply_shard, [
+            (i, target_dir, temp_dir, concurrency, download_order)
+            for i in split_sync_plan(plan, shards, _task_owner)
+        ])
+    return plan
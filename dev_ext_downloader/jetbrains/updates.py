@@ -0,0 +1,146 @@
+import bisect
+import collections
+import dataclasses
+from pathlib import Path
+from typing import Any, Iterable
+
+from dev_ext_downloader.server.protocol import HttpRequest, HttpResponse, HttpError
+from dev_ext_downloader.server.refresh import DirRefresher
+from .utils import BuildKey, MIN_BUILD, MAX_BUILD, iter_meta_data, get_download_file_path, parse_build_number, \
+    parse_build_bound
+from .xml import get_version_render_params, get_plugin_render_params, load_update_plugins_template
+
+# Boundaries are (build, side) pairs, a since-build opens a segment at side 0 and an
+# until-build closes it right after itself at side 1, so a build b lies in [since, until]
+# exactly when (since, 0) <= (b, 0) < (until, 1)
+_Boundary = tuple[BuildKey, int]
+
+
+@dataclasses.dataclass(frozen=True)
+class _PluginSegments:
+    plugin_index: int
+    boundaries: tuple[_Boundary, ...]
+    # Render params of the newest compatible version, one more entry than boundaries
+    versions: tuple[dict[str, Any] | None, ...]
+
+    def find(self, build: BuildKey) -> dict[str, Any] | None:
+        return self.versions[bisect.bisect_right(self.boundaries, (build, 0))]
+
+
+def _build_plugin_segments(plugin_index: int, intervals: list[tuple[BuildKey, BuildKey, dict[str, Any]]]) -> _PluginSegments:
+    boundaries = sorted({(since, 0) for since, _, _ in intervals} | {(until, 1) for _, until, _ in intervals})
+    versions: list[dict[str, Any] | None] = []
+    # Segment i covers points between boundaries[i - 1] and boundaries[i]
+    for segment in range(len(boundaries) + 1):
+        point = boundaries[segment - 1] if segment > 0 else None
+        version = None
+        if point is not None:
+            # Intervals are ordered newest first
+            version = next(
+                (v for since, until, v in intervals if (since, 0) <= point < (until, 1)),
+                None,
+            )
+        versions.append(version)
+    return _PluginSegments(plugin_index=plugin_index, boundaries=tuple(boundaries), versions=tuple(versions))
+
+
+class UpdatePluginsIndex:
+    def __init__(
+            self,
+            plugins: Iterable[tuple[dict[str, Any], list[tuple[BuildKey, BuildKey, dict[str, Any]]]]],
+    ) -> None:
+        plugins = sorted(plugins, key=lambda i: i[0]["name"])
+        self._plugins: list[dict[str, Any]] = [p for p, _ in plugins]
+        self._segments: list[_PluginSegments] = [
+            _build_plugin_segments(i, intervals) for i, (_, intervals) in enumerate(plugins)
+        ]
+        # All plugin boundaries together split builds into ranges with identical results
+        self._boundaries: list[_Boundary] = sorted({b for s in self._segments for b in s.boundaries})
+
+    @classmethod
+    async def load(cls, base_url: str, download_dir: Path, is_flatten: bool = False) -> 'UpdatePluginsIndex':
+        plugins: list[tuple[dict[str, Any], list[tuple[BuildKey, BuildKey, dict[str, Any]]]]] = []
+        async for plugin_meta_data in iter_meta_data(download_dir, is_flatten):
+            intervals: list[tuple[BuildKey, BuildKey, dict[str, Any]]] = []
+            for plugin_version in plugin_meta_data.versions:
+                file_path = get_download_file_path(download_dir, is_flatten, plugin_meta_data, plugin_version)
+                if not file_path.is_file():
+                    continue
+                intervals.append(
+                    (
+                        parse_build_bound(plugin_version.since_build, MIN_BUILD),
+                        parse_build_bound(plugin_version.until_build, MAX_BUILD),
+                        get_version_render_params(base_url, download_dir, file_path, plugin_version),
+                    )
+                )
+            if len(intervals) > 0:
+                plugins.append((get_plugin_render_params(plugin_meta_data, {}), intervals))
+        return cls(plugins)
+
+    def segment_of(self, build: BuildKey) -> int:
+        return bisect.bisect_right(self._boundaries, (build, 0))
+
+    def find(self, build: BuildKey) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for segments in self._segments:
+            version = segments.find(build)
+            if version is not None:
+                results.append({**self._plugins[segments.plugin_index], "version": version})
+        return results
+
+
+class UpdatePluginsHandler:
+    def __init__(
+            self,
+            base_url: str,
+            download_dir: Path,
+            is_flatten: bool = False,
+            path: str = "/updatePlugins.xml",
+            refresh_interval: float = 300.0,
+            max_cached_results: int = 256,
+    ) -> None:
+        self._base_url = base_url
+        self._download_dir = download_dir
+        self._is_flatten = is_flatten
+        self._path = path
+        self._max_cached_results = max_cached_results
+        self._template = load_update_plugins_template()
+        self._index = UpdatePluginsIndex(())
+        self._results: collections.OrderedDict[int, bytes] = collections.OrderedDict()
+        self._refresher = DirRefresher(download_dir, self._load_index, refresh_interval)
+
+    async def _load_index(self) -> None:
+        index = await UpdatePluginsIndex.load(self._base_url, self._download_dir, self._is_flatten)
+        self._index, self._results = index, collections.OrderedDict()
+
+    async def load(self) -> None:
+        await self._refresher.load()
+
+    def render(self, build: BuildKey) -> bytes:
+        # Results are cached per build range, every build inside a range gets the same plugins
+        segment = self._index.segment_of(build)
+        content = self._results.get(segment)
+        if content is None:
+            content = self._template.render(plugins=self._index.find(build)).encode("utf-8")
+            self._results[segment] = content
+            while len(self._results) > self._max_cached_results:
+                self._results.popitem(last=False)
+        self._results.move_to_end(segment)
+        return content
+
+    async def __call__(self, request: HttpRequest) -> HttpResponse | None:
+        if request.path != self._path or request.method not in ("GET", "HEAD"):
+            return None
+        build = request.get_query("build")
+        if build is None:
+            # Static updatePlugins.xml is served for clients without a build
+            return None
+        try:
+            build_key = parse_build_number(build)
+        except ValueError:
+            raise HttpError(400, f"Invalid build number: {build}")
+        self._refresher.refresh_if_stale()
+        return HttpResponse(
+            headers={"Content-Type": "application/xml; charset=utf-8", "Cache-Control": "no-cache"},
+            body=self.render(build_key),
+        )
@@ -1,21 +1,30 @@
 import hashlib
 import re
+import sys
 from pathlib import Path
 from typing import AsyncGenerator, Any
 
-import aiofile
-
+from dev_ext_downloader.common.layout import get_item_dir
 from dev_ext_downloader.common.tools import iter_meta_data_json
+from .codec import loads_plugin
 from .data import JetbrainsDownloadPlugin, JetbrainsDownloadVersion, JetbrainsPlugin
 
+BuildKey = tuple[int, ...]
+
+# Same as IntelliJ BuildNumber: wildcard and SNAPSHOT components compare as the largest value
+_MAX_COMPONENT: int = sys.maxsize
+MIN_BUILD: BuildKey = ()
+MAX_BUILD: BuildKey = (_MAX_COMPONENT,)
+
 
 async def iter_meta_data(
         download_dir: Path, is_flatten: bool
 ) -> AsyncGenerator[JetbrainsDownloadPlugin, Any]:
+    import aiofile
     for meta_path in iter_meta_data_json(download_dir, is_flatten):
         async with aiofile.async_open(meta_path, "r", encoding="utf-8") as f:
             try:
-                yield JetbrainsDownloadPlugin.from_json(await f.read())
+                yield loads_plugin(await f.read())
             except Exception as e:
                 print(f"Metadata read warning: meta file {meta_path} could not be read.", e)
 
@@ -36,7 +45,7 @@ def get_download_file_dir(
     if is_flatten:
         return download_dir
     else:
-        return download_dir / plugin_id
+        return get_item_dir(download_dir, plugin_id)
 
 
 def get_download_file_path(
@@ -46,3 +55,36 @@ def get_download_file_path(
         plugin_version: JetbrainsDownloadVersion
 ) -> Path:
     return get_download_file_dir(download_dir, is_flatten, plugin_meta_data.id) / plugin_version.download_file_name
+
+
+def parse_build_number(build: str) -> BuildKey:
+    # Product code prefix is optional: "IC-243.21565.193", "243.21565", "243.*"
+    code, sep, number = build.strip().partition("-")
+    if sep and not code[:1].isdigit():
+        build = number
+    components: list[int] = []
+    for component in build.split("."):
+        if component.isdigit():
+            components.append(int(component))
+        elif component in ("*", "SNAPSHOT"):
+            components.append(_MAX_COMPONENT)
+        else:
+            raise ValueError(f"Invalid build number: {build}")
+    if len(components) == 0:
+        raise ValueError(f"Invalid build number: {build}")
+    return tuple(components)
+
+
+def parse_build_bound(build: str | None, default: BuildKey) -> BuildKey:
+    if not build:
+        return default
+    try:
+        return parse_build_number(build)
+    except ValueError:
+        print(f"Build warning: build bound {build} could not be parsed.")
+        return default
+
+
+def is_compatible_build(since_build: str | None, until_build: str | None, build: str) -> bool:
+    build_key = parse_build_number(build)
+    return parse_build_bound(since_build, MIN_BUILD) <= build_key <= parse_build_bound(until_build, MAX_BUILD)
@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from dev_ext_downloader.common.models import VerifyReport
+from dev_ext_downloader.common.verifier import verify_files
+from .utils import iter_meta_data, get_download_file_path
+
+
+async def verify_downloaded_files(
+        download_dir: Path,
+        is_flatten: bool = False,
+        remove_corrupted: bool = False,
+        max_workers: int | None = None,
+) -> VerifyReport:
+    if not download_dir.is_dir():
+        raise NotADirectoryError(download_dir)
+
+    files: list[tuple[Path, str | None]] = []
+    async for plugin in iter_meta_data(download_dir, is_flatten):
+        files.extend(
+            (get_download_file_path(download_dir, is_flatten, plugin, v), v.sha256)
+            for v in plugin.versions
+        )
+    return await verify_files(files, remove_corrupted, max_workers)
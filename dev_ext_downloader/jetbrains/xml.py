@@ -1,15 +1,52 @@
 from pathlib import Path
-from typing import Any
+from typing import Any, Collection
 
 import aiofile
 from jinja2 import Template
 
+from dev_ext_downloader.common.models import CompressFormat
+from dev_ext_downloader.common.precompress import write_output
 from dev_ext_downloader.common.tools import build_url, is_valid_http_url
+from .data import JetbrainsDownloadPlugin, JetbrainsDownloadVersion
 from .utils import iter_meta_data, get_download_file_path
 
 _TEMPLATE_XML_PATH: Path = Path(__file__).parent / "assets" / "updatePlugins.xml.j2"
 
 
+def load_update_plugins_template() -> Template:
+    # For rendering per request, generate_update_plugins_xml renders the file asynchronously
+    return Template(_TEMPLATE_XML_PATH.read_text(encoding="utf-8"), autoescape=True)
+
+
+def get_version_render_params(
+        base_url: str,
+        download_dir: Path,
+        file_path: Path,
+        plugin_version: JetbrainsDownloadVersion,
+) -> dict[str, Any]:
+    file_url = build_url(
+        base=base_url if base_url.endswith("/") else f"{base_url}/",
+        path=str(file_path.relative_to(download_dir).as_posix()).lstrip("/")
+    )
+    return {
+        "version": plugin_version.version,
+        "notes": plugin_version.change_notes,
+        "since": plugin_version.since_build,
+        "until": plugin_version.until_build,
+        "depends": plugin_version.depends,
+        "url": file_url,
+    }
+
+
+def get_plugin_render_params(plugin: JetbrainsDownloadPlugin, version_params: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": plugin.id,
+        "name": plugin.name,
+        "description": plugin.description,
+        "version": version_params,
+    }
+
+
 async def _load_plugin_render_params(
         base_url: str,
         download_dir: Path,
@@ -21,39 +58,24 @@ async def _load_plugin_render_params(
         for plugin_version in plugin_meta_data.versions:
             file_path = get_download_file_path(download_dir, is_flatten, plugin_meta_data, plugin_version)
             if file_path.is_file():
-                file_url = build_url(
-                    base=base_url if base_url.endswith("/") else f"{base_url}/",
-                    path=str(file_path.relative_to(download_dir).as_posix()).lstrip("/")
-                )
-                latest_version = {
-                    "version": plugin_version.version,
-                    "notes": plugin_version.change_notes,
-                    "since": plugin_version.since_build,
-                    "until": plugin_version.until_build,
-                    "depends": plugin_version.depends,
-                    "url": file_url,
-                }
+                latest_version = get_version_render_params(base_url, download_dir, file_path, plugin_version)
                 break
             else:
                 print(f"XML generator warning: file {file_path} not found.")
         if latest_version is None:
             print(f"XML generator warning: plugin {plugin_meta_data.id} has no available version.")
         else:
-            results.append(
-                {
-                    "id": plugin_meta_data.id,
-                    "name": plugin_meta_data.name,
-                    "description": plugin_meta_data.description,
-                    "version": latest_version,
-                }
-            )
+            results.append(get_plugin_render_params(plugin_meta_data, latest_version))
         results.sort(key=lambda i: i["name"])
 
     return results
 
 
 async def generate_update_plugins_xml(
-        base_url: str, download_dir: Path, is_flatten: bool = False
+        base_url: str,
+        download_dir: Path,
+        is_flatten: bool = False,
+        precompress: Collection[CompressFormat] = (),
 ) -> Path:
     if not is_valid_http_url(base_url):
         raise ValueError(f"Invalid http base url: {base_url}")
@@ -64,10 +86,7 @@ async def generate_update_plugins_xml(
         template = Template(await f.read(), autoescape=True, enable_async=True)
 
     render_params = await _load_plugin_render_params(base_url, download_dir, is_flatten)
-    xml_content = await template.render_async(plugins=render_params)
-
     update_plugins_path = download_dir / "updatePlugins.xml"
-    async with aiofile.async_open(update_plugins_path, "w", encoding="utf-8") as f:
-        await f.write(xml_content)
+    await write_output(update_plugins_path, template.generate_async(plugins=render_params), precompress)
 
     return update_plugins_path
@@ -0,0 +1,21 @@
+from typing import TYPE_CHECKING
+
+from dev_ext_downloader.common.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .protocol import HttpError, HttpRequest, HttpResponse
+    from .server import MirrorServer
+
+# Heavy dependencies are only imported by the commands that use them
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "HttpError": ".protocol",
+    "HttpRequest": ".protocol",
+    "HttpResponse": ".protocol",
+    "MirrorServer": ".server",
+})
+__all__ = [
+    "HttpError",
+    "HttpRequest",
+    "HttpResponse",
+    "MirrorServer",
+]
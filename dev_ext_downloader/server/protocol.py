@@ -0,0 +1,150 @@
+import asyncio
+import dataclasses
+import email.utils
+import http
+from typing import BinaryIO
+from urllib.parse import unquote, parse_qs, urlsplit
+
+_MAX_BODY_SIZE: int = 1024 * 1024
+_SERVER_NAME: str = "dev-ext-downloader"
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str | None = None) -> None:
+        super().__init__(message or http.HTTPStatus(status).phrase)
+        self.status = status
+
+
+@dataclasses.dataclass(frozen=True)
+class HttpRequest:
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    version: str
+    headers: dict[str, str]
+    body: bytes = b""
+
+    def get_query(self, key: str) -> str | None:
+        values = self.query.get(key)
+        return values[0] if values else None
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+@dataclasses.dataclass(frozen=True)
+class FileBody:
+    # Opened before the response is built, size and validators come from this file, not from its path
+    file: BinaryIO
+    offset: int
+    count: int
+
+
+@dataclasses.dataclass(frozen=True)
+class HttpResponse:
+    status: int = 200
+    headers: dict[str, str] = dataclasses.field(default_factory=dict)
+    body: bytes | FileBody = b""
+
+    @property
+    def content_length(self) -> int:
+        return self.body.count if isinstance(self.body, FileBody) else len(self.body)
+
+
+async def read_request(reader: asyncio.StreamReader) -> HttpRequest | None:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if len(e.partial) == 0:
+            return None
+        raise HttpError(400)
+    except asyncio.LimitOverrunError:
+        raise HttpError(431)
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400)
+    if not version.startswith("HTTP/1."):
+        raise HttpError(505)
+
+    headers: dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise HttpError(400)
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if "transfer-encoding" in headers:
+        raise HttpError(411)
+    content_length = headers.get("content-length")
+    if content_length:
+        if not content_length.isdigit():
+            raise HttpError(400)
+        if int(content_length) > _MAX_BODY_SIZE:
+            raise HttpError(413)
+        body = await reader.readexactly(int(content_length))
+
+    url = urlsplit(target)
+    return HttpRequest(
+        method=method.upper(),
+        path=unquote(url.path),
+        query=parse_qs(url.query),
+        version=version,
+        headers=headers,
+        body=body,
+    )
+
+
+async def write_response(
+        writer: asyncio.StreamWriter,
+        response: HttpResponse,
+        send_body: bool = True,
+        keep_alive: bool = True,
+) -> None:
+    status = http.HTTPStatus(response.status)
+    head = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    headers = {
+        "Server": _SERVER_NAME,
+        "Date": email.utils.formatdate(usegmt=True),
+        "Content-Length": str(response.content_length),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }
+    headers.update(response.headers)
+    head.extend(f"{k}: {v}" for k, v in headers.items())
+    try:
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        if send_body:
+            if isinstance(response.body, FileBody):
+                if response.body.count > 0:
+                    await writer.drain()
+                    # Zero-copy os.sendfile when the transport supports it, plain copy otherwise
+                    await asyncio.get_running_loop().sendfile(
+                        writer.transport, response.body.file, response.body.offset, response.body.count
+                    )
+            elif len(response.body) > 0:
+                writer.write(response.body)
+        await writer.drain()
+    finally:
+        close_response(response)
+
+
+def close_response(response: HttpResponse) -> None:
+    if isinstance(response.body, FileBody):
+        response.body.file.close()
+
+
+def error_response(status: int, message: str | None = None) -> HttpResponse:
+    return HttpResponse(
+        status=status,
+        headers={"Content-Type": "text/plain; charset=utf-8"},
+        body=(message or http.HTTPStatus(status).phrase).encode("utf-8"),
+    )
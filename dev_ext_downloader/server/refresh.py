@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from dev_ext_downloader.common.layout import LAYOUT_FILE_NAME
+
+
+def _get_dir_stamp(download_dir: Path) -> tuple[int, ...]:
+    # Files added, replaced or removed in the download dir change its mtime,
+    # every sync ends by replacing the index.html it generates there
+    stamp: list[int] = []
+    for path in (download_dir, download_dir / LAYOUT_FILE_NAME):
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamp.append(0)
+    return tuple(stamp)
+
+
+class DirRefresher:
+    # Reloads an index built from a download dir in the background once the dir changes
+    def __init__(self, download_dir: Path, load: Callable[[], Awaitable[None]], check_interval: float = 300.0) -> None:
+        self._download_dir = download_dir
+        self._load = load
+        self._check_interval = check_interval
+        self._stamp: tuple[int, ...] | None = None
+        self._checked_at: float = 0.0
+        self._refresh_task: asyncio.Task | None = None
+
+    async def load(self) -> None:
+        # Taken before loading, a change during the load is picked up by the next check
+        stamp = _get_dir_stamp(self._download_dir)
+        await self._load()
+        self._stamp = stamp
+        self._checked_at = time.monotonic()
+
+    def refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self._check_interval:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._checked_at = now
+        if _get_dir_stamp(self._download_dir) == self._stamp:
+            return
+        # Old index keeps serving until the new one is ready
+        self._refresh_task = asyncio.create_task(self.load())
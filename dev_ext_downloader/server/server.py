@@ -0,0 +1,72 @@
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Collection, Mapping
+
+from .protocol import HttpError, HttpRequest, HttpResponse, read_request, write_response, error_response
+from .static import StaticFileHandler
+
+RequestHandler = Callable[[HttpRequest], Awaitable[HttpResponse | None]]
+
+_HEADER_LIMIT: int = 64 * 1024
+_KEEP_ALIVE_TIMEOUT: float = 15.0
+
+
+class MirrorServer:
+    def __init__(
+            self,
+            mounts: Mapping[str, Path],
+            handlers: Collection[RequestHandler] = (),
+            keep_alive_timeout: float = _KEEP_ALIVE_TIMEOUT,
+            exclude: Collection[Path] = (),
+    ) -> None:
+        self._handlers: list[RequestHandler] = list(handlers) + [StaticFileHandler(mounts, exclude)]
+        self._keep_alive_timeout = keep_alive_timeout
+
+    async def _dispatch(self, request: HttpRequest) -> HttpResponse:
+        for handler in self._handlers:
+            response = await handler(request)
+            if response is not None:
+                return response
+        return error_response(404)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self._keep_alive_timeout)
+                except HttpError as e:
+                    await write_response(writer, error_response(e.status), keep_alive=False)
+                    return
+                except asyncio.TimeoutError:
+                    return
+                if request is None:
+                    return
+
+                try:
+                    response = await self._dispatch(request)
+                except HttpError as e:
+                    response = error_response(e.status, str(e))
+                except Exception as e:
+                    print(f"Server warning: {request.method} {request.path} failed.", e)
+                    response = error_response(500)
+
+                keep_alive = request.keep_alive
+                await write_response(writer, response, send_body=request.method != "HEAD", keep_alive=keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host: str = "0.0.0.0", port: int = 8080) -> asyncio.Server:
+        return await asyncio.start_server(self._handle_connection, host, port, limit=_HEADER_LIMIT)
+
+    async def serve_forever(self, host: str = "0.0.0.0", port: int = 8080) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,240 @@
+import dataclasses
+import email.utils
+import mimetypes
+import os
+import stat
+from pathlib import Path
+from typing import BinaryIO, Collection, Mapping
+
+from dev_ext_downloader.common.introspect import ASSETS_DIR_NAME
+from .protocol import HttpRequest, HttpResponse, FileBody, HttpError
+
+_CONTENT_TYPES: dict[str, str] = {
+    ".vsix": "application/octet-stream",
+    ".zip": "application/zip",
+    ".jar": "application/java-archive",
+    ".xml": "application/xml; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+}
+
+# Generated outputs may have precompressed variants next to them, preferred encoding first
+_PRECOMPRESSED_SUFFIXES: frozenset[str] = frozenset((".xml", ".json", ".html"))
+_PRECOMPRESSED_ENCODINGS: tuple[tuple[str, str], ...] = (("zstd", ".zst"), ("gzip", ".gz"))
+
+
+@dataclasses.dataclass(frozen=True)
+class _FileInfo:
+    path: Path
+    size: int
+    mtime: int
+    etag: str
+    last_modified: str
+    content_type: str
+
+
+def _parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    # Only a single byte range is supported, anything else is served as a full response
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start_text, sep, end_text = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise HttpError(416)
+            return max(0, size - suffix), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HttpError(416)
+    return start, min(end, size - 1)
+
+
+def _parse_accept_encoding(accept_encoding: str) -> set[str]:
+    accepted: set[str] = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _is_hidden(relative_path: str) -> bool:
+    # Temp dirs, partial downloads, the layout marker and other state files start with a dot,
+    # only the introspected icons and readmes linked by index.html are served
+    parts = [i for i in relative_path.split("/") if i]
+    return any(
+        (i.startswith(".") and not (position == 0 and i == ASSETS_DIR_NAME)) or i.endswith(".tmp")
+        for position, i in enumerate(parts)
+    )
+
+
+class StaticFileHandler:
+    def __init__(self, mounts: Mapping[str, Path], exclude: Collection[Path] = ()) -> None:
+        # Longest prefix first
+        self._mounts: list[tuple[str, Path]] = sorted(
+            ((p if p.endswith("/") else f"{p}/", d.resolve()) for p, d in mounts.items()),
+            key=lambda i: len(i[0]),
+            reverse=True,
+        )
+        self._exclude: frozenset[Path] = frozenset(i.resolve() for i in exclude)
+        # Formatted headers by path, reused while the opened file has the same size and mtime
+        self._file_infos: dict[str, _FileInfo] = {}
+
+    def resolve_path(self, url_path: str) -> Path | None:
+        for prefix, root_dir in self._mounts:
+            if url_path == prefix.rstrip("/") or url_path.startswith(prefix):
+                relative_path = url_path[len(prefix):].lstrip("/")
+                if _is_hidden(relative_path):
+                    return None
+                file_path = (root_dir / relative_path).resolve()
+                if file_path != root_dir and root_dir not in file_path.parents:
+                    return None
+                if file_path.is_dir():
+                    file_path = file_path / "index.html"
+                if file_path in self._exclude:
+                    return None
+                return file_path
+        return None
+
+    def _get_file_info(self, file_path: Path, file_stat: os.stat_result) -> _FileInfo:
+        key = str(file_path)
+        info = self._file_infos.get(key)
+        if info is not None and info.size == file_stat.st_size and info.mtime == file_stat.st_mtime_ns:
+            return info
+        info = _FileInfo(
+            path=file_path,
+            size=file_stat.st_size,
+            mtime=file_stat.st_mtime_ns,
+            etag=f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"',
+            last_modified=email.utils.formatdate(file_stat.st_mtime, usegmt=True),
+            content_type=_CONTENT_TYPES.get(file_path.suffix.lower())
+                         or mimetypes.guess_type(file_path.name)[0]
+                         or "application/octet-stream",
+        )
+        self._file_infos[key] = info
+        return info
+
+    def open_file(self, file_path: Path) -> tuple[BinaryIO, _FileInfo] | None:
+        # Stat of the opened file, a sync replacing the path meanwhile can't change what is sent
+        try:
+            f = open(file_path, "rb")
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            self._file_infos.pop(str(file_path), None)
+            return None
+        try:
+            file_stat = os.fstat(f.fileno())
+            if not stat.S_ISREG(file_stat.st_mode):
+                f.close()
+                return None
+            return f, self._get_file_info(file_path, file_stat)
+        except BaseException:
+            f.close()
+            raise
+
+    def open_precompressed(
+            self, request: HttpRequest, info: _FileInfo
+    ) -> tuple[str, BinaryIO, _FileInfo] | None:
+        accept_encoding = request.headers.get("accept-encoding")
+        if accept_encoding is None:
+            return None
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding, suffix in _PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            variant = self.open_file(info.path.with_name(f"{info.path.name}{suffix}"))
+            if variant is None:
+                continue
+            variant_file, variant_info = variant
+            # A variant is written with the mtime of its source, any other mtime means it is stale
+            if variant_info.mtime != info.mtime:
+                variant_file.close()
+                continue
+            return encoding, variant_file, dataclasses.replace(
+                variant_info,
+                etag=f'{variant_info.etag[:-1]}-{encoding}"',
+                content_type=info.content_type,
+            )
+        return None
+
+    @staticmethod
+    def _is_not_modified(request: HttpRequest, info: _FileInfo) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or info.etag in (i.strip() for i in if_none_match.split(","))
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return info.mtime // 1_000_000_000 <= since
+        return False
+
+    async def __call__(self, request: HttpRequest) -> HttpResponse | None:
+        if request.method not in ("GET", "HEAD"):
+            return None
+        file_path = self.resolve_path(request.path)
+        if file_path is None:
+            return None
+        opened = self.open_file(file_path)
+        if opened is None:
+            return None
+        f, info = opened
+        try:
+            return self._build_response(request, f, info)
+        except BaseException:
+            f.close()
+            raise
+
+    def _build_response(self, request: HttpRequest, f: BinaryIO, info: _FileInfo) -> HttpResponse:
+        # The response owns f, it is closed after the response is written
+        headers = {"Content-Type": info.content_type}
+        if info.path.suffix.lower() in _PRECOMPRESSED_SUFFIXES:
+            headers["Vary"] = "Accept-Encoding"
+            # Ranges are always served from the identity file
+            precompressed = self.open_precompressed(request, info) if "range" not in request.headers else None
+            if precompressed is not None:
+                f.close()
+                headers["Content-Encoding"], f, info = precompressed
+        headers.update({
+            "ETag": info.etag,
+            "Last-Modified": info.last_modified,
+            "Accept-Ranges": "bytes",
+        })
+        if self._is_not_modified(request, info):
+            f.close()
+            return HttpResponse(status=304, headers=headers)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header is not None and (if_range is None or if_range.strip() in (info.etag, info.last_modified)):
+            try:
+                byte_range = _parse_range(range_header, info.size)
+            except HttpError:
+                f.close()
+                return HttpResponse(status=416, headers={"Content-Range": f"bytes */{info.size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+                return HttpResponse(
+                    status=206,
+                    headers=headers,
+                    body=FileBody(file=f, offset=start, count=end - start + 1),
+                )
+
+        return HttpResponse(status=200, headers=headers, body=FileBody(file=f, offset=0, count=info.size))
@@ -1,3 +1,53 @@
-from .data import VSCodeExt, VSCodeExtFilterOptions, TargetPlatformType
-from .downloader import download_latest_extensions
-from .html import generate_index_html
+from typing import TYPE_CHECKING
+
+from dev_ext_downloader.common.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .backfill import backfill_extensions
+    from .cleaner import clean_orphan_files
+    from .crawler import crawl_extensions, load_crawled_extensions
+    from .data import VSCodeExt, VSCodeExtFilterOptions, TargetPlatformType, VSCodeSyncPlan, VSCodeCrawlQuery
+    from .downloader import download_latest_extensions, apply_sync_plan
+    from .html import generate_index_html
+    from .introspect import introspect_downloaded_files
+    from .planner import plan_latest_extensions
+    from .sharded import download_latest_extensions_sharded
+    from .verifier import verify_downloaded_files
+
+# Heavy dependencies are only imported by the commands that use them
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "backfill_extensions": ".backfill",
+    "clean_orphan_files": ".cleaner",
+    "crawl_extensions": ".crawler",
+    "load_crawled_extensions": ".crawler",
+    "VSCodeExt": ".data",
+    "VSCodeExtFilterOptions": ".data",
+    "TargetPlatformType": ".data",
+    "VSCodeSyncPlan": ".data",
+    "VSCodeCrawlQuery": ".data",
+    "download_latest_extensions": ".downloader",
+    "apply_sync_plan": ".downloader",
+    "generate_index_html": ".html",
+    "introspect_downloaded_files": ".introspect",
+    "plan_latest_extensions": ".planner",
+    "download_latest_extensions_sharded": ".sharded",
+    "verify_downloaded_files": ".verifier",
+})
+__all__ = [
+    "backfill_extensions",
+    "clean_orphan_files",
+    "crawl_extensions",
+    "load_crawled_extensions",
+    "VSCodeExt",
+    "VSCodeExtFilterOptions",
+    "TargetPlatformType",
+    "VSCodeSyncPlan",
+    "VSCodeCrawlQuery",
+    "download_latest_extensions",
+    "apply_sync_plan",
+    "generate_index_html",
+    "introspect_downloaded_files",
+    "plan_latest_extensions",
+    "download_latest_extensions_sharded",
+    "verify_downloaded_files",
+]
@@ -4,7 +4,7 @@ import httpx
 
 from dev_ext_downloader.common import iso8601
 from .data import VSCodeExtension, VSCodeExtensionVersion, VSCodeExtensionFile, VSCodeExtensionProperty, \
-    TargetPlatformType
+    TargetPlatformType, VSCodeCatalogPage, VSCodeCrawlQuery
 
 
 class VSCodeExtensionAPI:
@@ -36,6 +36,33 @@ class VSCodeExtensionAPI:
             "flags": 439
         }
 
+    @staticmethod
+    def _build_crawl_query(crawl_query: VSCodeCrawlQuery, page_number: int) -> dict:
+        # 8: Target, 12: Exclude with flags (4096 unpublished), 5: Category, 1: Tag, 10: Search text
+        criteria = [
+            {"filterType": 8, "value": "Microsoft.VisualStudio.Code"},
+            {"filterType": 12, "value": "4096"},
+        ]
+        if crawl_query.category:
+            criteria.append({"filterType": 5, "value": crawl_query.category})
+        criteria.extend({"filterType": 1, "value": tag} for tag in crawl_query.tags)
+        if crawl_query.search_text:
+            criteria.append({"filterType": 10, "value": crawl_query.search_text})
+        return {
+            "assetTypes": ["Microsoft.VisualStudio.Services.VSIXPackage"],
+            "filters": [
+                {
+                    "criteria": criteria,
+                    "pageSize": crawl_query.page_size,
+                    "pageNumber": page_number,
+                    # Install count, descending
+                    "sortBy": 4,
+                    "sortOrder": 2
+                }
+            ],
+            "flags": 439
+        }
+
     @staticmethod
     def _build_headers(api_version: str = "3.0-preview.1") -> dict:
         headers = {
@@ -81,6 +108,13 @@ class VSCodeExtensionAPI:
             ),
         )
 
+    @staticmethod
+    def _get_install_count(extension: dict) -> int:
+        return next(
+            (int(i["value"]) for i in extension.get("statistics", ()) if i["statisticName"] == "install"),
+            0
+        )
+
     async def get_extensions(self, ext_names: Collection[str]) -> dict[str, VSCodeExtension]:
         ext_names = set(ext_names)
         response = await self._client.post(
@@ -91,10 +125,42 @@ class VSCodeExtensionAPI:
         response.raise_for_status()
         data = response.json()
 
+        # Marketplace matches names case-insensitively, keep the requested spelling as key
+        requested_names = {i.lower(): i for i in ext_names}
         result = {}
         if len(data["results"]) > 0:
             for extension in data["results"][0]["extensions"]:
-                ext_name = f"{extension['publisher']['publisherName']}.{extension['extensionName']}"
-                if ext_name in ext_names:
+                ext_name = requested_names.get(
+                    f"{extension['publisher']['publisherName']}.{extension['extensionName']}".lower()
+                )
+                if ext_name is not None:
                     result[ext_name] = self._parse_extension_json(extension)
         return result
+
+    async def get_catalog_page(self, crawl_query: VSCodeCrawlQuery, page_number: int) -> VSCodeCatalogPage:
+        response = await self._client.post(
+            self._EXTENSION_QUERY_URL,
+            json=self._build_crawl_query(crawl_query, page_number),
+            headers=self._build_headers()
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        if len(data["results"]) == 0:
+            return VSCodeCatalogPage(extensions=(), install_counts=())
+        result = data["results"][0]
+        total_count = next(
+            (
+                int(item["count"])
+                for metadata in result.get("resultMetadata", ())
+                if metadata["metadataType"] == "ResultCount"
+                for item in metadata["metadataItems"]
+                if item["name"] == "TotalCount"
+            ),
+            None
+        )
+        return VSCodeCatalogPage(
+            extensions=tuple(self._parse_extension_json(i) for i in result["extensions"]),
+            install_counts=tuple(self._get_install_count(i) for i in result["extensions"]),
+            total_count=total_count,
+        )
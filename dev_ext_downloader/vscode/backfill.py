@@ -0,0 +1,89 @@
+import asyncio
+import dataclasses
+import datetime
+from contextlib import AbstractAsyncContextManager
+from pathlib import Path
+from typing import Collection
+
+import httpx
+
+from dev_ext_downloader.common.backfill import BackfillBuffer, BackfillCheckpoint
+from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.tools import open_client
+from .api import VSCodeExtensionAPI
+from .data import VSCodeExt, VSCodeExtFilterOptions, VSCodeDownloadTask, VSCodeSyncPlan, TargetPlatformType
+from .downloader import _apply_sync_plan
+from .planner import build_ext_spec_dict
+from .utils import get_download_file_name, get_download_file_dir, is_version_matched
+
+
+async def backfill_extensions(
+        query_ext: Collection[str | VSCodeExt],
+        target_dir: Path = Path("./downloads/vscode"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
+        checkpoint_path: Path | None = None,
+        max_buffered_versions: int = 256,
+        since: datetime.datetime | None = None,
+        default_download_options: DownloadOptions = DownloadOptions(),
+        default_filter_options: VSCodeExtFilterOptions = VSCodeExtFilterOptions(),
+) -> int:
+    if len(query_ext) == 0:
+        return 0
+
+    ext_spec_dict = build_ext_spec_dict(query_ext, default_download_options, default_filter_options)
+    since = since.astimezone() if since is not None and since.tzinfo is None else since
+    checkpoint = BackfillCheckpoint(checkpoint_path)
+
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    async with open_client(client) as client:
+        async def flush(tasks: list[VSCodeDownloadTask]) -> list[VSCodeDownloadTask]:
+            return await _apply_sync_plan(
+                client, VSCodeSyncPlan(to_download=tuple(tasks)), target_dir, temp_dir, limiter, concurrency
+            )
+
+        api = VSCodeExtensionAPI(client)
+        buffer: BackfillBuffer[VSCodeDownloadTask] = BackfillBuffer(flush, checkpoint, max_buffered_versions)
+        for ext_name, ext_spec in ext_spec_dict.items():
+            if buffer.dropped > 0:
+                # The download budget is closed, the rest is left to the next run
+                break
+            if checkpoint.is_completed(ext_name.lower()):
+                continue
+            # One extension at a time, only its version list and the buffered tasks stay in memory
+            extension = (await api.get_extensions([ext_name])).get(ext_name)
+            if extension is None:
+                print(f"Backfill warning: No extension found for {ext_name}")
+                continue
+
+            # Older versions are what backfill is for, retention would remove them again
+            download_options = dataclasses.replace(ext_spec.download_options, keep_only_latest=False, retention=None)
+            extension_dir = get_download_file_dir(target_dir, download_options.flatten_dir, extension)
+            task_extension = dataclasses.replace(extension, versions=())
+            for version in extension.versions:
+                if since is not None and version.last_updated < since:
+                    continue
+                if not is_version_matched(version, ext_spec.filter_options):
+                    continue
+                version_key = f"{extension.unified_name}@{version.version}@{version.target_platform or TargetPlatformType.UNIVERSAL}".lower()
+                if checkpoint.is_done(version_key):
+                    continue
+                file_path = extension_dir / get_download_file_name(extension, version)
+                await buffer.add(
+                    version_key,
+                    VSCodeDownloadTask(
+                        extension=task_extension,
+                        version=version,
+                        download_options=download_options,
+                        file_path=file_path.relative_to(target_dir).as_posix(),
+                    ),
+                )
+            await buffer.complete(ext_name.lower())
+        await buffer.flush()
+    return buffer.flushed
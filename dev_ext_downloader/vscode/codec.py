@@ -0,0 +1,74 @@
+import datetime
+from typing import Any
+
+from dev_ext_downloader.common.codec import dumps_meta_data, loads_meta_data
+from dev_ext_downloader.common.models import MetaFormat
+from .data import (
+    TargetPlatformType,
+    VSCodeExtension,
+    VSCodeExtensionFile,
+    VSCodeExtensionProperty,
+    VSCodeExtensionVersion,
+)
+
+
+# Written out per field instead of dataclasses_json reflection, the output matches its to_dict
+
+
+def _encode_version(version: VSCodeExtensionVersion) -> dict[str, Any]:
+    return {
+        "version": version.version,
+        "target_platform": str(version.target_platform or TargetPlatformType.UNIVERSAL),
+        "last_updated": version.last_updated.isoformat(),
+        "files": [{"asset_type": i.asset_type, "source": i.source} for i in version.files],
+        "properties": [{"key": i.key, "value": i.value} for i in version.properties],
+        "sha256": version.sha256,
+    }
+
+
+def _decode_version(data: dict[str, Any]) -> VSCodeExtensionVersion:
+    target_platform = data.get("target_platform")
+    return VSCodeExtensionVersion(
+        version=data["version"],
+        target_platform=TargetPlatformType(target_platform) if target_platform else TargetPlatformType.UNIVERSAL,
+        last_updated=datetime.datetime.fromisoformat(data["last_updated"]),
+        files=tuple(VSCodeExtensionFile(asset_type=i["asset_type"], source=i["source"]) for i in data["files"]),
+        properties=tuple(VSCodeExtensionProperty(key=i["key"], value=i["value"]) for i in data["properties"]),
+        sha256=data.get("sha256"),
+    )
+
+
+def encode_extension(extension: VSCodeExtension) -> dict[str, Any]:
+    return {
+        "extension_id": extension.extension_id,
+        "extension_name": extension.extension_name,
+        "display_name": extension.display_name,
+        "publisher_id": extension.publisher_id,
+        "publisher_name": extension.publisher_name,
+        "publisher_display_name": extension.publisher_display_name,
+        "short_description": extension.short_description,
+        "categories": list(extension.categories),
+        "versions": [_encode_version(i) for i in extension.versions],
+    }
+
+
+def decode_extension(data: dict[str, Any]) -> VSCodeExtension:
+    return VSCodeExtension(
+        extension_id=data["extension_id"],
+        extension_name=data["extension_name"],
+        display_name=data["display_name"],
+        publisher_id=data["publisher_id"],
+        publisher_name=data["publisher_name"],
+        publisher_display_name=data["publisher_display_name"],
+        short_description=data["short_description"],
+        categories=tuple(data["categories"]),
+        versions=tuple(_decode_version(i) for i in data["versions"]),
+    )
+
+
+def dumps_extension(extension: VSCodeExtension, meta_format: MetaFormat = MetaFormat.JSON) -> str:
+    return dumps_meta_data(encode_extension(extension), meta_format)
+
+
+def loads_extension(content: str | bytes) -> VSCodeExtension:
+    return decode_extension(loads_meta_data(content))
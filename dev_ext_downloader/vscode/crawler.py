@@ -0,0 +1,218 @@
+import asyncio
+import dataclasses
+import math
+from contextlib import AbstractAsyncContextManager
+from pathlib import Path
+from typing import Collection
+
+import httpx
+
+from dev_ext_downloader.common.checkpoint import load_json_state, save_json_state
+from dev_ext_downloader.common.events import EventSink
+from dev_ext_downloader.common.lazy import LazyJsonMixin
+from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.tools import open_client, retry_http_errors
+from .api import VSCodeExtensionAPI
+from .data import VSCodeCatalogPage, VSCodeCrawlQuery, VSCodeDownloadTask, VSCodeExtFilterOptions, VSCodeSyncPlan
+from .downloader import _apply_sync_plan
+from .planner import _plan_extension
+from .utils import get_latest_extension_versions
+
+
+@dataclasses.dataclass(frozen=True)
+class CrawlCheckpointData(LazyJsonMixin):
+    # Last finished page of each query by its JSON form, and the extensions crawled so far
+    cursors: dict[str, int] = dataclasses.field(default_factory=dict)
+    extensions: tuple[str, ...] = ()
+
+
+@dataclasses.dataclass(frozen=True)
+class CrawlManifestData(LazyJsonMixin):
+    # Extensions found by the last finished crawl
+    extensions: tuple[str, ...] = ()
+
+
+class CrawlCheckpoint:
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._cursors: dict[str, int] = {}
+        self._extensions: set[str] = set()
+        data = load_json_state(path, CrawlCheckpointData, "Crawl")
+        if data is not None:
+            self._cursors = dict(data.cursors)
+            self._extensions = set(data.extensions)
+
+    @property
+    def extensions(self) -> set[str]:
+        return self._extensions
+
+    def get_cursor(self, query_key: str) -> int:
+        return self._cursors.get(query_key, 0)
+
+    async def update(self, query_key: str, page_number: int, ext_names: Collection[str]) -> None:
+        self._cursors[query_key] = page_number
+        self._extensions.update(ext_names)
+        if self._path is None:
+            return
+        await save_json_state(
+            self._path, CrawlCheckpointData(cursors=self._cursors, extensions=tuple(sorted(self._extensions)))
+        )
+
+    async def finish(self, manifest_path: Path | None = None) -> None:
+        # The manifest is written first, the crawled extensions are never left without a record
+        if manifest_path is not None:
+            await save_json_state(manifest_path, CrawlManifestData(extensions=tuple(sorted(self._extensions))))
+        # A finished crawl starts from the first page next time, the catalog keeps changing
+        if self._path is not None:
+            self._path.unlink(missing_ok=True)
+
+
+def load_crawled_extensions(manifest_path: Path | None, checkpoint_path: Path | None = None) -> set[str]:
+    # Extensions of the last finished crawl and of an unfinished one, the cleaner keeps both
+    manifest = load_json_state(manifest_path, CrawlManifestData, "Crawl")
+    crawled = set(manifest.extensions) if manifest is not None else set()
+    return crawled | CrawlCheckpoint(checkpoint_path).extensions
+
+
+@retry_http_errors
+async def _load_page_task(
+        semaphore: asyncio.Semaphore, api: VSCodeExtensionAPI, crawl_query: VSCodeCrawlQuery, page_number: int
+) -> VSCodeCatalogPage:
+    async with semaphore:
+        return await api.get_catalog_page(crawl_query, page_number)
+
+
+def _get_last_page(crawl_query: VSCodeCrawlQuery, total_count: int | None) -> int | None:
+    pages = [
+        math.ceil(i / crawl_query.page_size)
+        for i in (total_count, crawl_query.max_extensions)
+        if i is not None
+    ]
+    return min(pages) if len(pages) > 0 else None
+
+
+async def crawl_extensions(
+        crawl_queries: Collection[VSCodeCrawlQuery],
+        target_dir: Path = Path("./downloads/vscode"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
+        checkpoint_path: Path | None = None,
+        manifest_path: Path | None = None,
+        events: EventSink | None = None,
+        default_download_options: DownloadOptions = DownloadOptions(),
+        default_filter_options: VSCodeExtFilterOptions = VSCodeExtFilterOptions(),
+) -> set[str]:
+    if len(crawl_queries) == 0:
+        return set()
+    for crawl_query in crawl_queries:
+        if crawl_query.page_size < 1:
+            raise ValueError(f"Crawl page size must be positive: {crawl_query.page_size}")
+
+    checkpoint = CrawlCheckpoint(checkpoint_path)
+
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    async with open_client(client) as client:
+        api = VSCodeExtensionAPI(client)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def apply_page(
+                crawl_query: VSCodeCrawlQuery, page_number: int, page: VSCodeCatalogPage
+        ) -> tuple[bool, list[str], int]:
+            # Returns whether the crawl of the query goes on after this page, the extensions of the page
+            # and the count of downloads dropped by a shutdown
+            to_download: list[VSCodeDownloadTask] = []
+            unchanged: list[VSCodeDownloadTask] = []
+            to_delete: list[Path] = []
+            ext_names: list[str] = []
+            is_cutoff = False
+            for i, (extension, install_count) in enumerate(zip(page.extensions, page.install_counts)):
+                rank = (page_number - 1) * crawl_query.page_size + i
+                if install_count < crawl_query.min_installs or (
+                        crawl_query.max_extensions is not None and rank >= crawl_query.max_extensions
+                ):
+                    # Sorted by install count, the rest of the catalog is below the cutoff too
+                    is_cutoff = True
+                    break
+                # An extension found by several queries is downloaded once
+                ext_name = extension.unified_name.lower()
+                if ext_name in checkpoint.extensions or ext_name in ext_names:
+                    continue
+                versions = get_latest_extension_versions(
+                    extension=extension,
+                    version_filter_options=default_filter_options,
+                )
+                if len(versions) == 0:
+                    continue
+                ext_to_download, ext_unchanged, ext_to_delete = await _plan_extension(
+                    target_dir, extension, versions, default_download_options
+                )
+                to_download.extend(ext_to_download)
+                unchanged.extend(ext_unchanged)
+                to_delete.extend(ext_to_delete)
+                ext_names.append(ext_name)
+            dropped: list[VSCodeDownloadTask] = []
+            if len(to_download) + len(unchanged) > 0:
+                dropped = await _apply_sync_plan(
+                    client,
+                    VSCodeSyncPlan(
+                        to_download=tuple(to_download),
+                        unchanged=tuple(unchanged),
+                        to_delete=tuple(i.relative_to(target_dir).as_posix() for i in to_delete),
+                    ),
+                    target_dir,
+                    temp_dir,
+                    limiter,
+                    concurrency,
+                    events=events,
+                )
+            return not is_cutoff and len(page.extensions) > 0, ext_names, len(dropped)
+
+        is_shut_down = False
+        for crawl_query in crawl_queries:
+            query_key = crawl_query.to_json()
+            page_number = checkpoint.get_cursor(query_key) + 1
+            next_page_number = page_number
+            last_page: int | None = None
+            # Pages are fetched ahead of the one being downloaded, the first one tells the page count
+            pending: dict[int, asyncio.Task] = {}
+            try:
+                while True:
+                    while len(pending) < concurrency and next_page_number <= (
+                            last_page if last_page is not None else page_number
+                    ):
+                        pending[next_page_number] = asyncio.create_task(
+                            _load_page_task(semaphore, api, crawl_query, next_page_number)
+                        )
+                        next_page_number += 1
+                    if page_number not in pending:
+                        break
+                    page = await pending.pop(page_number)
+                    if last_page is None:
+                        last_page = _get_last_page(crawl_query, page.total_count)
+                    is_continued, ext_names, dropped_count = await apply_page(crawl_query, page_number, page)
+                    if dropped_count > 0:
+                        # Shut down meanwhile, the page is crawled again by the next run
+                        is_shut_down = True
+                        break
+                    # Pages are finished in order, the cursor never passes a page not downloaded yet
+                    await checkpoint.update(query_key, page_number, ext_names)
+                    if not is_continued:
+                        break
+                    page_number += 1
+            finally:
+                for task in pending.values():
+                    task.cancel()
+                await asyncio.gather(*pending.values(), return_exceptions=True)
+            if is_shut_down:
+                break
+
+    crawled = set(checkpoint.extensions)
+    if not is_shut_down:
+        await checkpoint.finish(manifest_path)
+    return crawled
@@ -2,9 +2,7 @@ import dataclasses
 import datetime
 import enum
 
-import semantic_version
-from dataclasses_json import DataClassJsonMixin, config
-
+from dev_ext_downloader.common.lazy import LazyJsonMixin, json_config
 from dev_ext_downloader.common.models import DownloadOptions
 
 
@@ -24,34 +22,35 @@ class TargetPlatformType(enum.StrEnum):
 
 
 @dataclasses.dataclass(frozen=True)
-class VSCodeExtensionFile(DataClassJsonMixin):
+class VSCodeExtensionFile(LazyJsonMixin):
     asset_type: str
     source: str
 
 
 @dataclasses.dataclass(frozen=True)
-class VSCodeExtensionProperty(DataClassJsonMixin):
+class VSCodeExtensionProperty(LazyJsonMixin):
     key: str
     value: str
 
 
 @dataclasses.dataclass(frozen=True)
-class VSCodeExtensionVersion(DataClassJsonMixin):
+class VSCodeExtensionVersion(LazyJsonMixin):
     version: str
     target_platform: TargetPlatformType | None = dataclasses.field(
-        metadata=config(
+        metadata=json_config(
             encoder=lambda s: str(s) if s else TargetPlatformType.UNIVERSAL,
             decoder=lambda s: TargetPlatformType(s) if s else TargetPlatformType.UNIVERSAL,
         )
     )
     last_updated: datetime.datetime = dataclasses.field(
-        metadata=config(
+        metadata=json_config(
             encoder=lambda dt: dt.isoformat(),
             decoder=lambda s: datetime.datetime.fromisoformat(s),
         )
     )
     files: tuple[VSCodeExtensionFile, ...]
     properties: tuple[VSCodeExtensionProperty, ...]
+    sha256: str | None = None
 
     def get_file_source(self, asset_type: str) -> str | None:
         return next((i.source for i in self.files if i.asset_type == asset_type), None)
@@ -77,6 +76,7 @@ class VSCodeExtensionVersion(DataClassJsonMixin):
 
     @property
     def sort_key(self) -> tuple:
+        import semantic_version
         v = semantic_version.Version(version_string=self.version)
         v.prerelease = (self.prerelease,)
         v.build = str(self.target_platform)
@@ -85,7 +85,7 @@ class VSCodeExtensionVersion(DataClassJsonMixin):
 
 
 @dataclasses.dataclass(frozen=True)
-class VSCodeExtension(DataClassJsonMixin):
+class VSCodeExtension(LazyJsonMixin):
     extension_id: str
     extension_name: str
     display_name: str
@@ -102,7 +102,7 @@ class VSCodeExtension(DataClassJsonMixin):
 
 
 @dataclasses.dataclass(frozen=True)
-class VSCodeExtFilterOptions(DataClassJsonMixin):
+class VSCodeExtFilterOptions(LazyJsonMixin):
     target_platform: tuple[TargetPlatformType, ...] | None = None
     target_platform_fallback: TargetPlatformType | None = None
     vscode_version: str | None = None
@@ -110,7 +110,45 @@ class VSCodeExtFilterOptions(DataClassJsonMixin):
 
 
 @dataclasses.dataclass(frozen=True)
-class VSCodeExt(DataClassJsonMixin):
+class VSCodeExt(LazyJsonMixin):
     ext_id: str
     download_options: DownloadOptions | None = None
     filter_options: VSCodeExtFilterOptions | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class VSCodeCrawlQuery(LazyJsonMixin):
+    # Criteria are combined, extensions are crawled by install count, most installed first
+    category: str | None = None
+    tags: tuple[str, ...] = ()
+    search_text: str | None = None
+    # Cutoffs, the crawl stops at the first extension below min_installs or after max_extensions
+    min_installs: int = 0
+    max_extensions: int | None = None
+    page_size: int = 50
+
+
+@dataclasses.dataclass(frozen=True)
+class VSCodeCatalogPage:
+    extensions: tuple[VSCodeExtension, ...]
+    install_counts: tuple[int, ...]
+    total_count: int | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class VSCodeDownloadTask(LazyJsonMixin):
+    extension: VSCodeExtension
+    version: VSCodeExtensionVersion
+    download_options: DownloadOptions
+    file_path: str
+    size: int | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class VSCodeSyncPlan(LazyJsonMixin):
+    to_download: tuple[VSCodeDownloadTask, ...] = ()
+    unchanged: tuple[VSCodeDownloadTask, ...] = ()
+    to_delete: tuple[str, ...] = ()
+    download_bytes: int = 0
+    unknown_size_files: int = 0
+    estimated_seconds: float | None = None
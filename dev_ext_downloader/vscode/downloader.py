@@ -1,24 +1,41 @@
 import asyncio
+import dataclasses
+import time
+from contextlib import AbstractAsyncContextManager
 from pathlib import Path
 from typing import Collection
 
 import aiofile
 import httpx
-from tqdm.asyncio import tqdm
 
-from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.budget import BudgetClosedError
+from dev_ext_downloader.common.events import (
+    CommittedEvent,
+    DownloadedEvent,
+    EventSink,
+    FailedEvent,
+    ResolvedEvent,
+    SkippedEvent,
+    SkipReason,
+    WarningEvent,
+)
+from dev_ext_downloader.common.journal import RunJournal, get_inputs_fingerprint
+from dev_ext_downloader.common.models import DownloadOptions, DownloadOrder
 from dev_ext_downloader.common.token_locker import TokenLock
-from dev_ext_downloader.common.tools import download_file
-from .api import VSCodeExtensionAPI
+from dev_ext_downloader.common.tools import SyncBatch, open_client, download_file, file_sha256, write_file_atomic
+from dev_ext_downloader.common.worker_pool import order_by_size, run_worker_pool
+from .codec import dumps_extension, loads_extension
 from .data import (
     VSCodeExt,
     VSCodeExtension,
     VSCodeExtensionVersion,
     VSCodeExtFilterOptions,
+    VSCodeSyncPlan,
+    VSCodeDownloadTask,
 )
-from .utils import get_download_file_name, get_latest_extension_versions, get_download_file_dir
-
-_DOWNLOAD_META_TOKEN_LOCK = TokenLock()
+from .planner import build_ext_spec_dict, create_sync_plan
+from .retention import apply_plan_deletions
+from .utils import get_download_file_name, get_download_file_dir
 
 
 def _merge_versions(
@@ -33,6 +50,45 @@ def _merge_versions(
     return [new_version] + old_versions
 
 
+def _find_version_sha256(
+        new_version: VSCodeExtensionVersion,
+        old_versions: tuple[VSCodeExtensionVersion, ...]
+) -> str | None:
+    return next(
+        (
+            i.sha256
+            for i in old_versions
+            if i.version == new_version.version and i.target_platform == new_version.target_platform
+        ),
+        None
+    )
+
+
+def _journal_key(extension: VSCodeExtension, version: VSCodeExtensionVersion) -> str:
+    return f"{extension.unified_name}@{version.version}@{version.target_platform}".lower()
+
+
+def _event_fields(extension: VSCodeExtension, version: VSCodeExtensionVersion) -> dict[str, str | None]:
+    return {
+        "item_id": extension.unified_name,
+        "version": version.version,
+        "target_platform": str(version.target_platform) if version.target_platform else None,
+    }
+
+
+def _emit_resolved(events: EventSink, plan: VSCodeSyncPlan, ext_spec_dict: dict[str, VSCodeExt] | None) -> None:
+    for is_unchanged, tasks in ((False, plan.to_download), (True, plan.unchanged)):
+        for task in tasks:
+            events.emit(ResolvedEvent(
+                **_event_fields(task.extension, task.version), size=task.size, is_unchanged=is_unchanged
+            ))
+    if ext_spec_dict is not None:
+        resolved_ids = {i.extension.unified_name.lower() for i in plan.to_download + plan.unchanged}
+        for ext_id in ext_spec_dict.keys():
+            if ext_id.lower() not in resolved_ids:
+                events.emit(FailedEvent(item_id=ext_id, error="No extension or matched version found"))
+
+
 async def _run_download_task(
         client: httpx.AsyncClient,
         target_dir: Path,
@@ -40,86 +96,218 @@ async def _run_download_task(
         extension: VSCodeExtension,
         version: VSCodeExtensionVersion,
         download_options: DownloadOptions,
+        meta_lock: TokenLock,
+        journal: RunJournal,
+        sync_batch: SyncBatch,
+        events: EventSink,
 ) -> None:
     extension_dir = get_download_file_dir(target_dir, download_options.flatten_dir, extension)
     extension_dir.mkdir(parents=True, exist_ok=True)
 
-    await download_file(
-        client=client,
-        url=version.package_url,
-        target_dir=extension_dir,
-        file_name=get_download_file_name(extension, version),
-        temp_dir=temp_dir,
-        skip_if_exists=download_options.skip_if_exists,
-    )
+    journal_key = _journal_key(extension, version)
+    event_fields = _event_fields(extension, version)
+    downloaded_file = journal.get_downloaded(journal_key)
+    if downloaded_file is not None:
+        events.emit(SkippedEvent(**event_fields, reason=SkipReason.JOURNAL, path=downloaded_file.path))
+    else:
+        start_time = time.monotonic()
+        downloaded_file = await download_file(
+            client=client,
+            url=version.package_url,
+            target_dir=extension_dir,
+            file_name=get_download_file_name(extension, version),
+            temp_dir=temp_dir,
+            skip_if_exists=download_options.skip_if_exists,
+            resume=True,
+            durability=download_options.durability,
+            sync_batch=sync_batch,
+        )
+        await journal.record_downloaded(journal_key, downloaded_file)
+        if downloaded_file.sha256 is None:
+            # Only a file which is already there comes back without a digest
+            events.emit(SkippedEvent(**event_fields, reason=SkipReason.EXISTS, path=downloaded_file.path))
+        else:
+            events.emit(DownloadedEvent(
+                **event_fields,
+                path=downloaded_file.path,
+                downloaded_bytes=downloaded_file.downloaded_bytes,
+                elapsed_seconds=time.monotonic() - start_time,
+                sha256=downloaded_file.sha256,
+            ))
+    if downloaded_file.sha256 is not None:
+        version = dataclasses.replace(version, sha256=downloaded_file.sha256)
 
     meta_data_path = extension_dir / f"{extension.unified_name}.json"
     if download_options.no_metadata:
         if meta_data_path.is_file():
             meta_data_path.unlink(missing_ok=True)
     else:
-        async with _DOWNLOAD_META_TOKEN_LOCK.lock(str(meta_data_path)):
-            async with aiofile.async_open(meta_data_path, "a+", encoding="utf-8") as f:
-                has_old_meta_data = meta_data_path.is_file()
-                version_list: list[VSCodeExtensionVersion]
-                if not has_old_meta_data:
-                    version_list = [version]
-                else:
-                    exists_extension: VSCodeExtension | None = None
-
-                    try:
-                        f.seek(0)
+        async with meta_lock.lock(str(meta_data_path)):
+            exists_extension: VSCodeExtension | None = None
+            if meta_data_path.is_file():
+                try:
+                    async with aiofile.async_open(meta_data_path, "r", encoding="utf-8") as f:
                         old_meta_data_content = await f.read()
-                        if old_meta_data_content:
-                            exists_extension = VSCodeExtension.from_json(old_meta_data_content)
-                            version_list = _merge_versions(version, exists_extension.versions)
-                    except Exception as e:
-                        print(f"Downloader warning: Can't load old meta data for {extension.unified_name}.", e)
-
-                    if exists_extension is None:
-                        version_list = [version]
-
-                    if exists_extension and download_options.keep_only_latest:
-                        outdated_versions: list[VSCodeExtensionVersion] = sorted([
-                            v
-                            for v in version_list
-                            if v.target_platform == version.target_platform
-                        ], key=lambda i: i.sort_key, reverse=True)[1:]
-                        for v in outdated_versions:
-                            old_file_path = extension_dir / get_download_file_name(exists_extension, v)
-                            old_file_path.unlink(missing_ok=True)
-                            version_list.remove(v)
-
-                version_list.sort(key=lambda i: i.sort_key, reverse=True)
-                download_meta = VSCodeExtension(
-                    extension_id=extension.extension_id,
-                    extension_name=extension.extension_name,
-                    display_name=extension.display_name,
-                    publisher_id=extension.publisher_id,
-                    publisher_name=extension.publisher_name,
-                    publisher_display_name=extension.publisher_display_name,
-                    short_description=extension.short_description,
-                    categories=extension.categories,
-                    versions=tuple(version_list),
+                    if old_meta_data_content:
+                        exists_extension = loads_extension(old_meta_data_content)
+                except Exception as e:
+                    events.warn(
+                        WarningEvent(**event_fields, message=f"Can't load old meta data: {e}"),
+                        f"Downloader warning: Can't load old meta data for {extension.unified_name}.", e,
+                    )
+
+            version_list: list[VSCodeExtensionVersion]
+            if exists_extension is not None:
+                if version.sha256 is None:
+                    version = dataclasses.replace(
+                        version, sha256=_find_version_sha256(version, exists_extension.versions)
+                    )
+                version_list = _merge_versions(version, exists_extension.versions)
+            else:
+                version_list = [version]
+
+            if version.sha256 is None and version in version_list:
+                version_list[version_list.index(version)] = dataclasses.replace(
+                    version, sha256=await asyncio.to_thread(file_sha256, downloaded_file.path)
                 )
-                await f.file.truncate(0)
-                f.seek(0)
-                await f.write(download_meta.to_json(indent=2, ensure_ascii=False))
-                await f.flush(sync_metadata=True)
+            version_list.sort(key=lambda i: i.sort_key, reverse=True)
+            download_meta = VSCodeExtension(
+                extension_id=extension.extension_id,
+                extension_name=extension.extension_name,
+                display_name=extension.display_name,
+                publisher_id=extension.publisher_id,
+                publisher_name=extension.publisher_name,
+                publisher_display_name=extension.publisher_display_name,
+                short_description=extension.short_description,
+                categories=extension.categories,
+                versions=tuple(version_list),
+            )
+            # Replaced as a whole, a crash leaves the old or the new metadata, never a torn file
+            await write_file_atomic(meta_data_path, dumps_extension(download_meta, download_options.meta_format))
+    await journal.record_committed(journal_key)
+    events.emit(CommittedEvent(
+        **event_fields,
+        path=downloaded_file.path,
+        meta_data_path=None if download_options.no_metadata else meta_data_path,
+    ))
 
 
 async def _download_task(
-        semaphore: asyncio.Semaphore,
+        limiter: AbstractAsyncContextManager,
         client: httpx.AsyncClient,
         target_dir: Path,
         temp_dir: Path,
         extension: VSCodeExtension,
         version: VSCodeExtensionVersion,
         download_options: DownloadOptions,
+        meta_lock: TokenLock,
+        journal: RunJournal,
+        sync_batch: SyncBatch,
+        events: EventSink,
+) -> bool:
+    # False when the task was dropped by a closed download budget
+    try:
+        async with limiter:
+            await _run_download_task(
+                client, target_dir, temp_dir, extension, version, download_options,
+                meta_lock, journal, sync_batch, events,
+            )
+    except BudgetClosedError:
+        # Shutting down, only in-flight downloads are finished
+        return False
+    except Exception as e:
+        # Still stops the run, the event tells which item it was
+        events.emit(FailedEvent(**_event_fields(extension, version), error=str(e) or type(e).__name__, exception=e))
+        raise
+    return True
+
+
+async def _apply_sync_plan(
+        client: httpx.AsyncClient,
+        plan: VSCodeSyncPlan,
+        target_dir: Path,
+        temp_dir: Path,
+        limiter: AbstractAsyncContextManager,
+        concurrency: int = 4,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        journal: RunJournal | None = None,
+        events: EventSink | None = None,
+) -> list[VSCodeDownloadTask]:
+    # Returns the tasks dropped by a closed download budget, they are neither downloaded nor committed
+    journal = journal if journal is not None else RunJournal()
+    events = events if events is not None else EventSink()
+    # Versions of one extension share the metadata file, writes to it are serialized per plan run
+    meta_lock = TokenLock()
+    sync_batch = SyncBatch()
+    # Tasks committed by an interrupted run are skipped, retention still sees every task
+    tasks: list[VSCodeDownloadTask] = []
+    for task in plan.to_download + plan.unchanged:
+        if journal.is_committed(_journal_key(task.extension, task.version)):
+            events.emit(SkippedEvent(**_event_fields(task.extension, task.version), reason=SkipReason.JOURNAL))
+        else:
+            tasks.append(task)
+    dropped: list[VSCodeDownloadTask] = []
+
+    async def handle(task: VSCodeDownloadTask) -> None:
+        if not await _download_task(
+            limiter=limiter,
+            client=client,
+            target_dir=target_dir,
+            temp_dir=temp_dir,
+            extension=task.extension,
+            version=task.version,
+            download_options=task.download_options,
+            meta_lock=meta_lock,
+            journal=journal,
+            sync_batch=sync_batch,
+            events=events,
+        ):
+            dropped.append(task)
+
+    if len(tasks) > 0:
+        try:
+            await run_worker_pool(
+                items=order_by_size(tasks, download_order, lambda i: i.size),
+                handler=handle,
+                workers=concurrency,
+                total=len(tasks),
+                desc="Downloading",
+            )
+        finally:
+            # Downloads with batch durability are flushed to disk together
+            await sync_batch.flush()
+    if len(dropped) > 0:
+        # Shut down before the plan was done, the journal resumes it and retention waits for the whole plan
+        return dropped
+    # Old versions are removed in one batch after all downloads, exactly as planned by the retention policy
+    await apply_plan_deletions(target_dir, plan.to_download + plan.unchanged, plan.to_delete, meta_lock)
+    journal.finish()
+    return dropped
+
+
+async def apply_sync_plan(
+        plan: VSCodeSyncPlan,
+        target_dir: Path = Path("./downloads/vscode"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        journal_path: Path | None = None,
+        events: EventSink | None = None,
 ) -> None:
-    async with semaphore:
-        await _run_download_task(
-            client, target_dir, temp_dir, extension, version, download_options
+    events = events if events is not None else EventSink()
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    journal = RunJournal(journal_path)
+    journal.start(plan.to_dict(encode_json=True))
+    _emit_resolved(events, plan, None)
+    async with open_client(client) as client:
+        await _apply_sync_plan(
+            client, plan, target_dir, temp_dir, limiter, concurrency, download_order, journal, events
         )
 
 
@@ -128,71 +316,47 @@ async def download_latest_extensions(
         target_dir: Path = Path("./downloads/vscode"),
         temp_dir: Path | None = None,
         concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
         task_spec_path: Path | None = None,
+        resolve_depends: bool = False,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        journal_path: Path | None = None,
+        events: EventSink | None = None,
         default_download_options: DownloadOptions = DownloadOptions(),
         default_filter_options: VSCodeExtFilterOptions = VSCodeExtFilterOptions(),
-) -> None:
+) -> VSCodeSyncPlan:
     if len(query_ext) == 0:
-        return
-
-    ext_spec_dict: dict[str, VSCodeExt] = {}
-    for q in query_ext:
-        ext_spec_dict[q.ext_id if isinstance(q, VSCodeExt) else str(q)] = (
-            VSCodeExt(
-                ext_id=q.ext_id,
-                download_options=q.download_options or default_download_options,
-                filter_options=q.filter_options or default_filter_options,
-            )
-            if isinstance(q, VSCodeExt)
-            else VSCodeExt(
-                ext_id=q,
-                download_options=default_download_options,
-                filter_options=default_filter_options,
-            )
-        )
+        return VSCodeSyncPlan()
 
+    events = events if events is not None else EventSink()
+
+    ext_spec_dict = build_ext_spec_dict(query_ext, default_download_options, default_filter_options)
+
+    limiter = limiter if limiter is not None else asyncio.Semaphore(concurrency)
     temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
     target_dir.mkdir(parents=True, exist_ok=True)
     temp_dir.mkdir(parents=True, exist_ok=True)
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
-        api = VSCodeExtensionAPI(client)
-
-        extensions: dict[str, VSCodeExtension] = await api.get_extensions(
-            ext_spec_dict.keys()
-        )
-        missing_ext_set = set([i.lower() for i in ext_spec_dict.keys()]) - set(
-            [i.lower() for i in extensions.keys()]
-        )
-        if len(missing_ext_set) > 0:
-            print(f"Downloader warning: No extension found for {', '.join(missing_ext_set)}")
-
-        download_tasks = []
-        semaphore = asyncio.Semaphore(concurrency)
-        for ext_name, extension in extensions.items():
-            versions = get_latest_extension_versions(
-                extension=extension,
-                version_filter_options=ext_spec_dict[ext_name].filter_options,
+    journal = RunJournal(journal_path)
+    # Extension list, filters and download options as resolved, any change makes a new plan
+    fingerprint = get_inputs_fingerprint(
+        [i.to_dict(encode_json=True) for i in ext_spec_dict.values()], resolve_depends
+    )
+    async with open_client(client) as client:
+        if (journal_plan := journal.get_plan(fingerprint)) is not None:
+            # Resume the interrupted run with its resolved plan instead of querying the marketplace again
+            plan = VSCodeSyncPlan.from_dict(journal_plan)
+            _emit_resolved(events, plan, None)
+        else:
+            plan = await create_sync_plan(
+                client, target_dir, ext_spec_dict, concurrency, resolve_depends=resolve_depends, events=events
             )
-            if len(versions) > 0:
-                for version in versions:
-                    download_tasks.append(
-                        asyncio.create_task(
-                            _download_task(
-                                semaphore=semaphore,
-                                client=client,
-                                target_dir=target_dir,
-                                temp_dir=temp_dir,
-                                extension=extension,
-                                version=version,
-                                download_options=ext_spec_dict[ext_name].download_options,
-                            )
-                        )
-                    )
-            else:
-                print(f"Downloader warning: No matched version found for {extension.unified_name}")
-        if len(download_tasks) > 0:
-            await tqdm.gather(*download_tasks, desc="Downloading")
+            journal.start(plan.to_dict(encode_json=True), fingerprint)
+            _emit_resolved(events, plan, ext_spec_dict)
+        await _apply_sync_plan(
+            client, plan, target_dir, temp_dir, limiter, concurrency, download_order, journal, events
+        )
 
     if task_spec_path:
         task_spec_path.parent.mkdir(parents=True, exist_ok=True)
@@ -201,3 +365,4 @@ async def download_latest_extensions(
             await f.write(
                 schema.dumps(ext_spec_dict.values(), indent=2, ensure_ascii=False)
             )
+    return plan
@@ -0,0 +1,270 @@
+import asyncio
+import dataclasses
+import json
+import zipfile
+from pathlib import Path
+from typing import Any, Iterable
+from urllib.parse import quote
+
+from dev_ext_downloader.common.introspect import load_archive_assets, get_asset_url
+from dev_ext_downloader.server.protocol import HttpRequest, HttpResponse, HttpError, error_response
+from dev_ext_downloader.server.refresh import DirRefresher
+from .data import VSCodeExtension, TargetPlatformType
+from .introspect import read_vsix_manifest
+from .utils import iter_meta_data, get_download_file_name, get_download_file_dir
+
+_BASE_URL_TOKEN: str = "@@BASE_URL@@"
+_VSIX_ASSET_TYPE: str = "Microsoft.VisualStudio.Services.VSIXPackage"
+# Fetched by VSCode before it installs an extension from a gallery
+_MANIFEST_ASSET_TYPE: str = "Microsoft.VisualStudio.Code.Manifest"
+
+# https://github.com/microsoft/vscode/blob/main/src/vs/platform/extensionManagement/common/extensionGalleryService.ts
+_FILTER_TYPE_CATEGORY: int = 5
+_FILTER_TYPE_EXTENSION_ID: int = 4
+_FILTER_TYPE_EXTENSION_NAME: int = 7
+_FILTER_TYPE_SEARCH_TEXT: int = 10
+
+
+@dataclasses.dataclass(frozen=True)
+class _IndexedExtension:
+    name: str
+    extension_id: str
+    categories: tuple[str, ...]
+    sort_key: str
+    search_text: str
+    fragment: str
+
+
+@dataclasses.dataclass(frozen=True)
+class _AssetFile:
+    file_url_path: str
+    file_path: Path
+    sha256: str | None
+
+
+def _build_version_json(extension: VSCodeExtension, version, file_url_path: str) -> dict[str, Any]:
+    platform = version.target_platform or TargetPlatformType.UNIVERSAL
+    asset_uri = f"{_BASE_URL_TOKEN}_apis/public/gallery/assets/{quote(extension.unified_name)}/{quote(version.version)}/{platform}"
+    result: dict[str, Any] = {
+        "version": version.version,
+        "lastUpdated": version.last_updated.isoformat(),
+        "assetUri": asset_uri,
+        "fallbackAssetUri": asset_uri,
+        "files": [
+            {
+                "assetType": _VSIX_ASSET_TYPE,
+                "source": f"{_BASE_URL_TOKEN}{quote(file_url_path)}",
+            },
+            {
+                "assetType": _MANIFEST_ASSET_TYPE,
+                "source": f"{asset_uri}/{_MANIFEST_ASSET_TYPE}",
+            },
+        ],
+        "properties": [{"key": p.key, "value": p.value} for p in version.properties],
+    }
+    if platform != TargetPlatformType.UNIVERSAL:
+        result["targetPlatform"] = str(platform)
+    return result
+
+
+def _build_extension_json(extension: VSCodeExtension, versions: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "extensionId": extension.extension_id,
+        "extensionName": extension.extension_name,
+        "displayName": extension.display_name,
+        "shortDescription": extension.short_description,
+        "flags": "validated, public",
+        "publisher": {
+            "publisherId": extension.publisher_id,
+            "publisherName": extension.publisher_name,
+            "displayName": extension.publisher_display_name,
+        },
+        "categories": list(extension.categories),
+        "tags": [],
+        "statistics": [],
+        "versions": versions,
+    }
+
+
+class VSCodeGalleryIndex:
+    def __init__(self, extensions: Iterable[_IndexedExtension], asset_files: dict[tuple[str, str, str], _AssetFile]) -> None:
+        self._extensions: list[_IndexedExtension] = sorted(extensions, key=lambda i: i.sort_key)
+        self._asset_files = asset_files
+        # Lookup tables hold positions in the sorted list, so results keep a stable order
+        self._by_name: dict[str, int] = {}
+        self._by_id: dict[str, int] = {}
+        self._by_category: dict[str, list[int]] = {}
+        for position, extension in enumerate(self._extensions):
+            self._by_name[extension.name] = position
+            self._by_id[extension.extension_id] = position
+            for category in extension.categories:
+                self._by_category.setdefault(category, []).append(position)
+
+    @classmethod
+    async def load(cls, download_dir: Path, is_flatten: bool = False) -> 'VSCodeGalleryIndex':
+        extensions: list[_IndexedExtension] = []
+        asset_files: dict[tuple[str, str, str], _AssetFile] = {}
+        async for extension in iter_meta_data(download_dir, is_flatten):
+            extension_dir = get_download_file_dir(download_dir, is_flatten, extension)
+            name = extension.unified_name.lower()
+            versions: list[dict[str, Any]] = []
+            for version in extension.versions:
+                file_path = extension_dir / get_download_file_name(extension, version)
+                if not file_path.is_file():
+                    continue
+                file_url_path = file_path.relative_to(download_dir).as_posix()
+                platform = str(version.target_platform or TargetPlatformType.UNIVERSAL)
+                asset_files[(name, version.version, platform)] = _AssetFile(file_url_path, file_path, version.sha256)
+                versions.append(_build_version_json(extension, version, file_url_path))
+            if len(versions) == 0:
+                continue
+            extensions.append(
+                _IndexedExtension(
+                    name=name,
+                    extension_id=extension.extension_id.lower(),
+                    categories=tuple(i.lower() for i in extension.categories),
+                    sort_key=extension.display_name.lower(),
+                    search_text=" ".join(
+                        (extension.unified_name, extension.display_name, extension.short_description)
+                    ).lower(),
+                    fragment=json.dumps(_build_extension_json(extension, versions), ensure_ascii=False),
+                )
+            )
+        return cls(extensions, asset_files)
+
+    def __len__(self) -> int:
+        return len(self._extensions)
+
+    def get_asset_file(self, name: str, version: str, platform: str) -> _AssetFile | None:
+        return self._asset_files.get((name.lower(), version, platform))
+
+    def query(self, criteria: list[dict[str, Any]]) -> list[_IndexedExtension]:
+        selected: set[int] | None = None
+        categories: list[str] = []
+        search_texts: list[str] = []
+        for criterion in criteria:
+            filter_type = criterion.get("filterType")
+            value = str(criterion.get("value", "")).lower()
+            if filter_type == _FILTER_TYPE_EXTENSION_NAME:
+                selected = (selected or set()) | ({self._by_name[value]} if value in self._by_name else set())
+            elif filter_type == _FILTER_TYPE_EXTENSION_ID:
+                selected = (selected or set()) | ({self._by_id[value]} if value in self._by_id else set())
+            elif filter_type == _FILTER_TYPE_CATEGORY:
+                categories.append(value)
+            elif filter_type == _FILTER_TYPE_SEARCH_TEXT and value:
+                search_texts.append(value)
+
+        for category in categories:
+            positions = set(self._by_category.get(category, ()))
+            selected = positions if selected is None else selected & positions
+
+        positions = sorted(selected) if selected is not None else range(len(self._extensions))
+        results = [self._extensions[i] for i in positions]
+        for text in search_texts:
+            results = [i for i in results if text in i.search_text]
+        return results
+
+
+class VSCodeGalleryHandler:
+    def __init__(
+            self,
+            download_dir: Path,
+            is_flatten: bool = False,
+            prefix: str = "/vscode/",
+            refresh_interval: float = 300.0,
+    ) -> None:
+        self._download_dir = download_dir
+        self._is_flatten = is_flatten
+        self._prefix = prefix if prefix.endswith("/") else f"{prefix}/"
+        self._query_path = f"{self._prefix}_apis/public/gallery/extensionquery"
+        self._assets_path = f"{self._prefix}_apis/public/gallery/assets/"
+        self._index = VSCodeGalleryIndex((), {})
+        self._refresher = DirRefresher(download_dir, self._load_index, refresh_interval)
+
+    async def _load_index(self) -> None:
+        self._index = await VSCodeGalleryIndex.load(self._download_dir, self._is_flatten)
+
+    async def load(self) -> None:
+        await self._refresher.load()
+
+    def _get_base_url(self, request: HttpRequest) -> str:
+        scheme = request.headers.get("x-forwarded-proto", "http")
+        host = request.headers.get("host", "localhost")
+        return f"{scheme}://{host}{self._prefix}"
+
+    def _handle_query(self, request: HttpRequest) -> HttpResponse:
+        try:
+            query = json.loads(request.body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Invalid query json")
+        if not isinstance(query, dict) or not isinstance(query.get("filters", []), list):
+            raise HttpError(400, "Invalid query filters")
+
+        result_fragments: list[str] = []
+        for query_filter in query.get("filters", []):
+            criteria = query_filter.get("criteria", []) if isinstance(query_filter, dict) else None
+            if not isinstance(criteria, list) or not all(isinstance(i, dict) for i in criteria):
+                raise HttpError(400, "Invalid query criteria")
+            try:
+                page_size = max(1, int(query_filter.get("pageSize", 50)))
+                page_number = max(1, int(query_filter.get("pageNumber", 1)))
+            except (TypeError, ValueError, OverflowError):
+                raise HttpError(400, "Invalid query paging")
+            extensions = self._index.query(criteria)
+            page = extensions[(page_number - 1) * page_size:page_number * page_size]
+            result_fragments.append(
+                '{"extensions":[' + ",".join(i.fragment for i in page) + '],'
+                + '"pagingToken":null,'
+                + '"resultMetadata":[{"metadataType":"ResultCount","metadataItems":'
+                + f'[{{"name":"TotalCount","count":{len(extensions)}}}]}}]}}'
+            )
+        content = '{"results":[' + ",".join(result_fragments) + "]}"
+        return HttpResponse(
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            body=content.replace(_BASE_URL_TOKEN, self._get_base_url(request)).encode("utf-8"),
+        )
+
+    async def _handle_manifest(self, request: HttpRequest, asset_file: _AssetFile) -> HttpResponse:
+        # Extracted by introspection when enabled, read from the vsix otherwise
+        assets = load_archive_assets(self._download_dir, asset_file.sha256)
+        if assets is not None and assets.manifest is not None:
+            asset_url_path = get_asset_url(self._download_dir, asset_file.sha256, assets.manifest)
+            return HttpResponse(
+                status=302,
+                headers={"Location": f"{self._get_base_url(request)}{quote(asset_url_path)}"},
+            )
+        try:
+            content = await asyncio.to_thread(read_vsix_manifest, asset_file.file_path)
+        except (zipfile.BadZipFile, OSError) as e:
+            print(f"Gallery warning: manifest of {asset_file.file_path} could not be read.", e)
+            content = None
+        if content is None:
+            return error_response(404)
+        return HttpResponse(headers={"Content-Type": "application/json; charset=utf-8"}, body=content)
+
+    async def _handle_asset(self, request: HttpRequest) -> HttpResponse:
+        # assets/{publisher.name}/{version}/{platform}/{asset type}
+        parts = request.path[len(self._assets_path):].split("/")
+        if len(parts) != 4 or parts[3] not in (_VSIX_ASSET_TYPE, _MANIFEST_ASSET_TYPE):
+            return error_response(404)
+        target_platform = request.get_query("targetPlatform") or parts[2]
+        asset_file = self._index.get_asset_file(parts[0], parts[1], target_platform)
+        if asset_file is None:
+            return error_response(404)
+        if parts[3] == _MANIFEST_ASSET_TYPE:
+            return await self._handle_manifest(request, asset_file)
+        return HttpResponse(
+            status=302,
+            headers={"Location": f"{self._get_base_url(request)}{quote(asset_file.file_url_path)}"},
+        )
+
+    async def __call__(self, request: HttpRequest) -> HttpResponse | None:
+        if request.path == self._query_path:
+            if request.method != "POST":
+                return error_response(405)
+            self._refresher.refresh_if_stale()
+            return self._handle_query(request)
+        if request.path.startswith(self._assets_path) and request.method in ("GET", "HEAD"):
+            self._refresher.refresh_if_stale()
+            return await self._handle_asset(request)
+        return None
@@ -1,35 +1,25 @@
 from pathlib import Path
-from typing import Any, AsyncGenerator
+from typing import Any, Collection
 
 import aiofile
 import aioshutil
 from jinja2 import Template
 
-from dev_ext_downloader.common.tools import iter_meta_data_json
+from dev_ext_downloader.common.introspect import load_archive_assets, get_asset_url
+from dev_ext_downloader.common.models import CompressFormat
+from dev_ext_downloader.common.precompress import write_output
 from . import TargetPlatformType
-from .data import VSCodeExtension
-from .utils import get_download_file_name, get_download_file_dir
+from .utils import iter_meta_data, get_download_file_name, get_download_file_dir
 
 _TEMPLATE_INDEX_PATH: Path = Path(__file__).parent / "assets" / "index.html.j2"
 _TEMPLATE_FAVICON_PATH: Path = Path(__file__).parent / "assets" / "favicon.ico"
 
 
-async def _iter_meta_data(
-        download_dir: Path, is_flatten: bool
-) -> AsyncGenerator[VSCodeExtension, Any]:
-    for meta_path in iter_meta_data_json(download_dir, is_flatten):
-        async with aiofile.async_open(meta_path, "r", encoding="utf-8") as f:
-            try:
-                yield VSCodeExtension.from_json(await f.read())
-            except Exception as e:
-                print(f"HTML generator warning: meta file {meta_path} could not be read.", e)
-
-
 async def _load_extensions_render_params(
         download_dir: Path, is_flatten: bool
 ) -> list[dict[str, Any]]:
     results: list = []
-    async for ext_meta_data in _iter_meta_data(download_dir, is_flatten):
+    async for ext_meta_data in iter_meta_data(download_dir, is_flatten):
         versions: list[dict[str, Any]] = []
         for ext_version in ext_meta_data.versions:
             download_file_name = get_download_file_name(ext_meta_data, ext_version)
@@ -50,9 +40,20 @@ async def _load_extensions_render_params(
                 )
             else:
                 print(f"HTML generator warning: file {file_path} not found.")
+        # Icon and README of the newest introspected version
+        icon_url: str | None = None
+        readme_url: str | None = None
+        for ext_version in ext_meta_data.versions:
+            assets = load_archive_assets(download_dir, ext_version.sha256)
+            if assets is not None:
+                icon_url = get_asset_url(download_dir, ext_version.sha256, assets.icon) if assets.icon else None
+                readme_url = get_asset_url(download_dir, ext_version.sha256, assets.readme) if assets.readme else None
+                break
         results.append(
             {
                 "extension_id": ext_meta_data.unified_name,
+                "icon_url": icon_url,
+                "readme_url": readme_url,
                 "display_name": ext_meta_data.display_name,
                 "publisher_name": ext_meta_data.publisher_display_name,
                 "short_description": ext_meta_data.short_description,
@@ -64,7 +65,11 @@ async def _load_extensions_render_params(
     return results
 
 
-async def generate_index_html(download_dir: Path, is_flatten: bool = False) -> Path:
+async def generate_index_html(
+        download_dir: Path,
+        is_flatten: bool = False,
+        precompress: Collection[CompressFormat] = (),
+) -> Path:
     if not download_dir.is_dir():
         raise NotADirectoryError(download_dir)
 
@@ -72,11 +77,8 @@ async def generate_index_html(download_dir: Path, is_flatten: bool = False) -> P
         template = Template(await f.read(), autoescape=True, enable_async=True)
 
     render_params = await _load_extensions_render_params(download_dir, is_flatten)
-    html_content = await template.render_async(items=render_params)
-
     index_html_path = download_dir / "index.html"
-    async with aiofile.async_open(index_html_path, "w", encoding="utf-8") as f:
-        await f.write(html_content)
+    await write_output(index_html_path, template.generate_async(items=render_params), precompress)
 
     await aioshutil.copyfile(_TEMPLATE_FAVICON_PATH, index_html_path.with_name(_TEMPLATE_FAVICON_PATH.name))
 
@@ -0,0 +1,63 @@
+import json
+import posixpath
+import zipfile
+from pathlib import Path
+
+from dev_ext_downloader.common.introspect import ArchiveAssets, ArchiveMembers, introspect_archives, read_zip_member
+from .utils import iter_meta_data, get_download_file_name, get_download_file_dir
+
+_PACKAGE_JSON_NAME: str = "extension/package.json"
+_README_NAME: str = "extension/readme.md"
+
+
+def read_vsix_manifest(file_path: Path) -> bytes | None:
+    with zipfile.ZipFile(file_path) as archive:
+        names = {i.lower(): i for i in archive.namelist()}
+        package_name = names.get(_PACKAGE_JSON_NAME)
+        return read_zip_member(archive, package_name) if package_name is not None else None
+
+
+def read_vsix_members(file_path: Path) -> ArchiveMembers:
+    members: ArchiveMembers = {}
+    with zipfile.ZipFile(file_path) as archive:
+        # Member names in vsix are not always of the same case
+        names = {i.lower(): i for i in archive.namelist()}
+        package_name = names.get(_PACKAGE_JSON_NAME)
+        if package_name is None:
+            return members
+        package_content = read_zip_member(archive, package_name)
+        if package_content is None:
+            return members
+        members["manifest"] = ("package.json", package_content)
+
+        icon = json.loads(package_content).get("icon")
+        if isinstance(icon, str) and icon:
+            icon_name = names.get(posixpath.normpath(posixpath.join("extension", icon)).lower())
+            icon_content = read_zip_member(archive, icon_name) if icon_name else None
+            if icon_content is not None:
+                members["icon"] = (f"icon{posixpath.splitext(icon_name)[1].lower()}", icon_content)
+
+        readme_name = names.get(_README_NAME)
+        readme_content = read_zip_member(archive, readme_name) if readme_name else None
+        if readme_content is not None:
+            members["readme"] = ("README.md", readme_content)
+    return members
+
+
+async def introspect_downloaded_files(
+        download_dir: Path,
+        is_flatten: bool = False,
+        max_workers: int | None = None,
+) -> dict[str, ArchiveAssets]:
+    if not download_dir.is_dir():
+        raise NotADirectoryError(download_dir)
+
+    files: list[tuple[Path, str]] = []
+    async for extension in iter_meta_data(download_dir, is_flatten):
+        extension_dir = get_download_file_dir(download_dir, is_flatten, extension)
+        files.extend(
+            (extension_dir / get_download_file_name(extension, v), v.sha256)
+            for v in extension.versions
+            if v.sha256 is not None
+        )
+    return await introspect_archives(download_dir, files, read_vsix_members, max_workers)
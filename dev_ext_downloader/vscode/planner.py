@@ -0,0 +1,270 @@
+import asyncio
+import dataclasses
+from pathlib import Path
+from typing import Collection
+
+import httpx
+
+from dev_ext_downloader.common.events import EventSink, WarningEvent
+from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.tools import get_content_length, estimate_transfer_seconds, open_client
+from .api import VSCodeExtensionAPI
+from .codec import loads_extension
+from .data import (
+    VSCodeExt,
+    VSCodeExtension,
+    VSCodeExtensionVersion,
+    VSCodeExtFilterOptions,
+    VSCodeDownloadTask,
+    VSCodeSyncPlan,
+)
+from .retention import select_retained_extension_versions
+from .utils import get_download_file_name, get_latest_extension_versions, get_download_file_dir
+
+
+def build_ext_spec_dict(
+        query_ext: Collection[str | VSCodeExt],
+        default_download_options: DownloadOptions,
+        default_filter_options: VSCodeExtFilterOptions,
+) -> dict[str, VSCodeExt]:
+    ext_spec_dict: dict[str, VSCodeExt] = {}
+    for q in query_ext:
+        ext_spec_dict[q.ext_id if isinstance(q, VSCodeExt) else str(q)] = (
+            VSCodeExt(
+                ext_id=q.ext_id,
+                download_options=q.download_options or default_download_options,
+                filter_options=q.filter_options or default_filter_options,
+            )
+            if isinstance(q, VSCodeExt)
+            else VSCodeExt(
+                ext_id=q,
+                download_options=default_download_options,
+                filter_options=default_filter_options,
+            )
+        )
+    return ext_spec_dict
+
+
+_DEPENDS_PROPERTY_KEYS: tuple[str, ...] = (
+    "Microsoft.VisualStudio.Code.ExtensionDependencies",
+    "Microsoft.VisualStudio.Code.ExtensionPack",
+)
+_QUERY_BATCH_SIZE: int = 100
+
+
+def _get_versions_depends(versions: Collection[VSCodeExtensionVersion]) -> set[str]:
+    depends: set[str] = set()
+    for version in versions:
+        for key in _DEPENDS_PROPERTY_KEYS:
+            value = version.get_property_value(key)
+            if value:
+                depends.update(i.strip() for i in value.split(",") if i.strip())
+    return depends
+
+
+async def _query_extensions(
+        api: VSCodeExtensionAPI, ext_names: Collection[str]
+) -> dict[str, VSCodeExtension]:
+    ext_names = list(ext_names)
+    batches = await asyncio.gather(*[
+        api.get_extensions(ext_names[i:i + _QUERY_BATCH_SIZE])
+        for i in range(0, len(ext_names), _QUERY_BATCH_SIZE)
+    ])
+    return {k: v for batch in batches for k, v in batch.items()}
+
+
+async def resolve_extensions(
+        api: VSCodeExtensionAPI,
+        ext_spec_dict: dict[str, VSCodeExt],
+        resolve_depends: bool = False,
+        events: EventSink | None = None,
+) -> list[tuple[VSCodeExtension, list[VSCodeExtensionVersion], DownloadOptions]]:
+    events = events if events is not None else EventSink()
+    known_ids: set[str] = {i.lower() for i in ext_spec_dict.keys()}
+    query_names: Collection[str] = list(ext_spec_dict.keys())
+    # Specs of resolved dependencies too, the caller's dict keeps only the listed extensions
+    spec_dict: dict[str, VSCodeExt] = dict(ext_spec_dict)
+
+    results = []
+    # Dependencies and pack members found in a round are queried together in the next one,
+    # until a round finds nothing new
+    while len(query_names) > 0:
+        extensions: dict[str, VSCodeExtension] = await _query_extensions(api, query_names)
+        missing_ext_set = set([i.lower() for i in query_names]) - set(
+            [i.lower() for i in extensions.keys()]
+        )
+        for ext_id in sorted(missing_ext_set):
+            events.warn(
+                WarningEvent(item_id=ext_id, message="No extension found"),
+                f"Downloader warning: No extension found for {ext_id}",
+            )
+
+        depends_spec_dict: dict[str, VSCodeExt] = {}
+        for ext_name, extension in extensions.items():
+            ext_spec = spec_dict[ext_name]
+            versions = get_latest_extension_versions(
+                extension=extension,
+                version_filter_options=ext_spec.filter_options,
+            )
+            if len(versions) > 0:
+                results.append((extension, versions, ext_spec.download_options))
+            else:
+                events.warn(
+                    WarningEvent(item_id=extension.unified_name, message="No matched version found"),
+                    f"Downloader warning: No matched version found for {extension.unified_name}",
+                )
+                continue
+
+            if resolve_depends:
+                for depends_id in _get_versions_depends(versions):
+                    if depends_id.lower() in known_ids:
+                        continue
+                    known_ids.add(depends_id.lower())
+                    # Children are filtered and downloaded like the extension requiring them
+                    depends_spec_dict[depends_id] = VSCodeExt(
+                        ext_id=depends_id,
+                        download_options=ext_spec.download_options,
+                        filter_options=ext_spec.filter_options,
+                    )
+        spec_dict.update(depends_spec_dict)
+        query_names = list(depends_spec_dict.keys())
+    return results
+
+
+async def _load_meta_data(meta_data_path: Path) -> VSCodeExtension | None:
+    if not meta_data_path.is_file():
+        return None
+    import aiofile
+    async with aiofile.async_open(meta_data_path, "r", encoding="utf-8") as f:
+        try:
+            return loads_extension(await f.read())
+        except Exception as e:
+            print(f"Planner warning: meta file {meta_data_path} could not be read.", e)
+            return None
+
+
+async def _plan_extension(
+        target_dir: Path,
+        extension: VSCodeExtension,
+        versions: list[VSCodeExtensionVersion],
+        download_options: DownloadOptions,
+) -> tuple[list[VSCodeDownloadTask], list[VSCodeDownloadTask], list[Path]]:
+    extension_dir = get_download_file_dir(target_dir, download_options.flatten_dir, extension)
+    task_extension = dataclasses.replace(extension, versions=())
+
+    to_download: list[VSCodeDownloadTask] = []
+    unchanged: list[VSCodeDownloadTask] = []
+    to_delete: list[Path] = []
+    for version in versions:
+        file_path = extension_dir / get_download_file_name(extension, version)
+        task = VSCodeDownloadTask(
+            extension=task_extension,
+            version=version,
+            download_options=download_options,
+            file_path=file_path.relative_to(target_dir).as_posix(),
+        )
+        if download_options.skip_if_exists and file_path.is_file():
+            unchanged.append(task)
+        else:
+            to_download.append(task)
+
+    meta_data_path = extension_dir / f"{extension.unified_name}.json"
+    if download_options.no_metadata:
+        if meta_data_path.is_file():
+            to_delete.append(meta_data_path)
+    elif download_options.retention_policy is not None:
+        exists_extension = await _load_meta_data(meta_data_path)
+        if exists_extension is not None:
+            # Same merged version list as the metadata after download
+            new_keys = {(v.version, v.target_platform) for v in versions}
+            old_versions = [v for v in exists_extension.versions if (v.version, v.target_platform) not in new_keys]
+            retained = select_retained_extension_versions(
+                versions + old_versions, download_options.retention_policy, pinned_versions=versions
+            )
+            for v in old_versions:
+                old_file_path = extension_dir / get_download_file_name(exists_extension, v)
+                if v not in retained and old_file_path.is_file():
+                    to_delete.append(old_file_path)
+    return to_download, unchanged, to_delete
+
+
+async def _probe_task_size(
+        semaphore: asyncio.Semaphore,
+        client: httpx.AsyncClient,
+        task: VSCodeDownloadTask,
+) -> VSCodeDownloadTask:
+    async with semaphore:
+        try:
+            size = await get_content_length(client, task.version.package_url)
+        except httpx.HTTPError as e:
+            print(f"Planner warning: Can't get size of {task.file_path}.", e)
+            return task
+    return dataclasses.replace(task, size=size)
+
+
+async def create_sync_plan(
+        client: httpx.AsyncClient,
+        target_dir: Path,
+        ext_spec_dict: dict[str, VSCodeExt],
+        concurrency: int = 4,
+        bandwidth: float | None = None,
+        probe_sizes: bool = False,
+        resolve_depends: bool = False,
+        events: EventSink | None = None,
+) -> VSCodeSyncPlan:
+    api = VSCodeExtensionAPI(client)
+    resolved = await resolve_extensions(api, ext_spec_dict, resolve_depends, events)
+
+    to_download: list[VSCodeDownloadTask] = []
+    unchanged: list[VSCodeDownloadTask] = []
+    to_delete: list[Path] = []
+    for extension, versions, download_options in resolved:
+        ext_to_download, ext_unchanged, ext_to_delete = await _plan_extension(
+            target_dir, extension, versions, download_options
+        )
+        to_download.extend(ext_to_download)
+        unchanged.extend(ext_unchanged)
+        to_delete.extend(ext_to_delete)
+
+    if probe_sizes and len(to_download) > 0:
+        semaphore = asyncio.Semaphore(concurrency)
+        to_download = list(await asyncio.gather(*[
+            _probe_task_size(semaphore, client, task) for task in to_download
+        ]))
+
+    download_bytes = sum(i.size for i in to_download if i.size is not None)
+    return VSCodeSyncPlan(
+        to_download=tuple(to_download),
+        unchanged=tuple(unchanged),
+        to_delete=tuple(i.relative_to(target_dir).as_posix() for i in to_delete),
+        download_bytes=download_bytes,
+        unknown_size_files=sum(1 for i in to_download if i.size is None),
+        estimated_seconds=estimate_transfer_seconds(download_bytes, bandwidth),
+    )
+
+
+async def plan_latest_extensions(
+        query_ext: Collection[str | VSCodeExt],
+        target_dir: Path = Path("./downloads/vscode"),
+        concurrency: int = 4,
+        client: httpx.AsyncClient | None = None,
+        bandwidth: float | None = None,
+        probe_sizes: bool = False,
+        resolve_depends: bool = False,
+        default_download_options: DownloadOptions = DownloadOptions(),
+        default_filter_options: VSCodeExtFilterOptions = VSCodeExtFilterOptions(),
+) -> VSCodeSyncPlan:
+    if len(query_ext) == 0:
+        return VSCodeSyncPlan()
+
+    ext_spec_dict = build_ext_spec_dict(query_ext, default_download_options, default_filter_options)
+    async with open_client(client) as client:
+        return await create_sync_plan(
+            client=client,
+            target_dir=target_dir,
+            ext_spec_dict=ext_spec_dict,
+            concurrency=concurrency,
+            bandwidth=bandwidth,
+            probe_sizes=probe_sizes,
+            resolve_depends=resolve_depends,
+        )
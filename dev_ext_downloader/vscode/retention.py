@@ -0,0 +1,89 @@
+import asyncio
+import dataclasses
+import datetime
+from pathlib import Path
+from typing import Collection
+
+from dev_ext_downloader.common.models import RetentionPolicy
+from dev_ext_downloader.common.retention import select_retained_versions
+from dev_ext_downloader.common.token_locker import TokenLock
+from dev_ext_downloader.common.tools import remove_files, write_file_atomic
+from .codec import dumps_extension, loads_extension
+from .data import VSCodeExtensionVersion, VSCodeDownloadTask, TargetPlatformType
+from .utils import get_download_file_name, get_download_file_dir
+
+
+def _version_key(version: VSCodeExtensionVersion) -> tuple[str, TargetPlatformType]:
+    return version.version, version.target_platform or TargetPlatformType.UNIVERSAL
+
+
+def _is_compatible(version: VSCodeExtensionVersion, vscode_version: str) -> bool:
+    import semantic_version
+    if not version.code_engine:
+        return True
+    try:
+        return semantic_version.NpmSpec(version.code_engine).match(semantic_version.Version(vscode_version))
+    except ValueError:
+        # Unknown engine spec, keep it rather than deleting a possibly compatible version
+        return True
+
+
+def select_retained_extension_versions(
+        versions: list[VSCodeExtensionVersion],
+        policy: RetentionPolicy,
+        pinned_versions: Collection[VSCodeExtensionVersion] = (),
+        now: datetime.datetime | None = None,
+) -> list[VSCodeExtensionVersion]:
+    pinned_keys = {_version_key(i) for i in pinned_versions}
+    return select_retained_versions(
+        versions,
+        policy,
+        sort_key=lambda v: v.sort_key,
+        updated_at=lambda v: v.last_updated,
+        is_compatible=_is_compatible,
+        group_key=lambda v: v.target_platform or TargetPlatformType.UNIVERSAL,
+        pinned=[i for i, v in enumerate(versions) if _version_key(v) in pinned_keys],
+        now=now,
+    )
+
+
+async def apply_plan_deletions(
+        target_dir: Path,
+        tasks: Collection[VSCodeDownloadTask],
+        to_delete: Collection[str],
+        meta_lock: TokenLock,
+) -> list[Path]:
+    import aiofile
+    # Exactly the files the plan lists, never a file one of its tasks downloads
+    task_paths = {i.file_path for i in tasks}
+    delete_paths = {target_dir / i for i in to_delete if i not in task_paths}
+    if len(delete_paths) == 0:
+        return []
+    extension_tasks: dict[Path, VSCodeDownloadTask] = {}
+    for task in tasks:
+        if task.download_options.no_metadata:
+            continue
+        extension_dir = get_download_file_dir(target_dir, task.download_options.flatten_dir, task.extension)
+        extension_tasks.setdefault(extension_dir / f"{task.extension.unified_name}.json", task)
+
+    for meta_data_path, task in extension_tasks.items():
+        async with meta_lock.lock(str(meta_data_path)):
+            if not meta_data_path.is_file():
+                continue
+            async with aiofile.async_open(meta_data_path, "r", encoding="utf-8") as f:
+                try:
+                    exists_extension = loads_extension(await f.read())
+                except Exception as e:
+                    print(f"Retention warning: Can't load meta data {meta_data_path}.", e)
+                    continue
+            versions = tuple(
+                v for v in exists_extension.versions
+                if meta_data_path.parent / get_download_file_name(exists_extension, v) not in delete_paths
+            )
+            if len(versions) == len(exists_extension.versions):
+                continue
+            exists_extension = dataclasses.replace(exists_extension, versions=versions)
+            await write_file_atomic(meta_data_path, dumps_extension(exists_extension, task.download_options.meta_format))
+
+    # Files are only removed after all metadata no longer references them
+    return await asyncio.to_thread(remove_files, sorted(delete_paths))
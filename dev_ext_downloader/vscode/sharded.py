@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Collection, Hashable
+
+from dev_ext_downloader.common.models import DownloadOptions, DownloadOrder
+from dev_ext_downloader.common.sharding import (
+    ShardPool,
+    get_shared_limiter,
+    merge_sync_plans,
+    partition,
+    split_sync_plan,
+)
+from .data import VSCodeExt, VSCodeExtFilterOptions, VSCodeDownloadTask, VSCodeSyncPlan
+from .downloader import apply_sync_plan
+from .planner import plan_latest_extensions
+
+
+def _task_owner(task: VSCodeDownloadTask) -> str:
+    return task.extension.unified_name.lower()
+
+
+def _task_key(task: VSCodeDownloadTask) -> Hashable:
+    return _task_owner(task), task.version.version, task.version.target_platform
+
+
+async def _plan_shard(
+        query_ext: list[str | VSCodeExt],
+        target_dir: Path,
+        concurrency: int,
+        resolve_depends: bool,
+        default_download_options: DownloadOptions,
+        default_filter_options: VSCodeExtFilterOptions,
+) -> VSCodeSyncPlan:
+    return await plan_latest_extensions(
+        query_ext=query_ext,
+        target_dir=target_dir,
+        concurrency=concurrency,
+        resolve_depends=resolve_depends,
+        default_download_options=default_download_options,
+        default_filter_options=default_filter_options,
+    )
+
+
+async def _apply_shard(
+        plan: VSCodeSyncPlan,
+        target_dir: Path,
+        temp_dir: Path,
+        concurrency: int,
+        download_order: DownloadOrder,
+) -> None:
+    await apply_sync_plan(
+        plan=plan,
+        target_dir=target_dir,
+        temp_dir=temp_dir,
+        concurrency=concurrency,
+        limiter=get_shared_limiter(),
+        download_order=download_order,
+    )
+
+
+async def download_latest_extensions_sharded(
+        query_ext: Collection[str | VSCodeExt],
+        target_dir: Path = Path("./downloads/vscode"),
+        temp_dir: Path | None = None,
+        concurrency: int = 4,
+        shards: int = 2,
+        resolve_depends: bool = False,
+        download_order: DownloadOrder = DownloadOrder.PLAN,
+        default_download_options: DownloadOptions = DownloadOptions(),
+        default_filter_options: VSCodeExtFilterOptions = VSCodeExtFilterOptions(),
+) -> VSCodeSyncPlan:
+    if len(query_ext) == 0:
+        return VSCodeSyncPlan()
+
+    temp_dir = temp_dir if temp_dir is not None else (target_dir / ".temp")
+    target_dir.mkdir(parents=True, exist_ok=True)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    query_shards = [
+        i for i in partition(query_ext, shards, lambda i: i.ext_id if isinstance(i, VSCodeExt) else i)
+        if len(i) > 0
+    ]
+    async with ShardPool(shards, concurrency) as pool:
+        plans = await pool.run(_plan_shard, [
+            (i, target_dir, concurrency, resolve_depends, default_download_options, default_filter_options)
+            for i in query_shards
+        ])
+        # Plans are merged and split again by extension, so each metadata file has one writer process
+        plan = merge_sync_plans(plans, _task_key)
+        await pool.run(_apply_shard, [
+            (i, target_dir, temp_dir, concurrency, download_order)
+            for i in split_sync_plan(plan, shards, _task_owner)
+        ])
+    return plan
@@ -1,10 +1,24 @@
 from pathlib import Path
+from typing import Any, AsyncGenerator
 
-import semantic_version
-
+from dev_ext_downloader.common.layout import get_item_dir
+from dev_ext_downloader.common.tools import iter_meta_data_json
+from .codec import loads_extension
 from .data import VSCodeExtension, VSCodeExtensionVersion, VSCodeExtFilterOptions, TargetPlatformType
 
 
+async def iter_meta_data(
+        download_dir: Path, is_flatten: bool
+) -> AsyncGenerator[VSCodeExtension, Any]:
+    import aiofile
+    for meta_path in iter_meta_data_json(download_dir, is_flatten):
+        async with aiofile.async_open(meta_path, "r", encoding="utf-8") as f:
+            try:
+                yield loads_extension(await f.read())
+            except Exception as e:
+                print(f"Metadata read warning: meta file {meta_path} could not be read.", e)
+
+
 def get_download_file_name(
         extension: VSCodeExtension, version: VSCodeExtensionVersion
 ) -> str:
@@ -20,33 +34,44 @@ def get_download_file_dir(
     if is_flatten:
         return download_dir
     else:
-        return download_dir / extension.unified_name
+        return get_item_dir(download_dir, extension.unified_name)
+
+
+def is_version_matched(
+        version: VSCodeExtensionVersion, version_filter_options: VSCodeExtFilterOptions
+) -> bool:
+    import semantic_version
+    version_platform: TargetPlatformType = version.target_platform if version.target_platform else TargetPlatformType.UNIVERSAL
+    if not version_filter_options.include_prerelease and version.prerelease:
+        return False
+    if (
+            version_filter_options.target_platform
+            and len(version_filter_options.target_platform) > 0
+            and version.target_platform
+    ):
+        if version_platform not in version_filter_options.target_platform:
+            return False
+    if version_filter_options.vscode_version and version.code_engine:
+        target_vscode_version = semantic_version.Version(
+            version_filter_options.vscode_version
+        )
+        if not semantic_version.NpmSpec(version.code_engine).match(
+                target_vscode_version
+        ):
+            return False
+    return True
 
 
 def get_latest_extension_versions(
         extension: VSCodeExtension, version_filter_options: VSCodeExtFilterOptions
 ) -> list[VSCodeExtensionVersion]:
+    import semantic_version
     result: dict[str, VSCodeExtensionVersion] = {}
     fallback_version: VSCodeExtensionVersion | None = None
     for version in extension.versions:
         version_platform: TargetPlatformType = version.target_platform if version.target_platform else TargetPlatformType.UNIVERSAL
-        if not version_filter_options.include_prerelease and version.prerelease:
+        if not is_version_matched(version, version_filter_options):
             continue
-        if (
-                version_filter_options.target_platform
-                and len(version_filter_options.target_platform) > 0
-                and version.target_platform
-        ):
-            if version_platform not in version_filter_options.target_platform:
-                continue
-        if version_filter_options.vscode_version and version.code_engine:
-            target_vscode_version = semantic_version.Version(
-                version_filter_options.vscode_version
-            )
-            if not semantic_version.NpmSpec(version.code_engine).match(
-                    target_vscode_version
-            ):
-                continue
 
         new_version = semantic_version.Version(version.version)
         if version_platform in result:
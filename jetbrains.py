@@ -1,12 +1,30 @@
 import asyncio
+import datetime
 import shutil
+from contextlib import AbstractAsyncContextManager
 from pathlib import Path
 
-from dev_ext_downloader.common.models import DownloadOptions
+import httpx
+
+from dev_ext_downloader.common.models import (
+    CompressFormat,
+    DownloadOptions,
+    DownloadOrder,
+    Durability,
+    MetaFormat,
+    RetentionPolicy,
+    SyncMode,
+)
+from dev_ext_downloader.common.precompress import precompress_meta_data
+from dev_ext_downloader.common.tools import pretty_bytes
 from dev_ext_downloader.jetbrains import (
     download_latest_extensions,
     generate_update_plugins_xml,
     JetbrainsDef, generate_index_html,
+    clean_orphan_files, verify_downloaded_files,
+    plan_latest_extensions, apply_sync_plan, JetbrainsSyncPlan,
+    backfill_plugins, introspect_downloaded_files,
+    download_latest_extensions_sharded,
 )
 
 # Download dir
@@ -26,13 +44,40 @@ SKIP_IF_EXISTS: bool = True
 # Depends on metadata
 KEEP_ONLY_LATEST: bool = True
 
+# Retention policy, replaces KEEP_ONLY_LATEST when set
+# A version is kept if any rule keeps it, old versions are removed after all downloads finished
+# keep_last: Keep last N versions (per platform)
+# keep_days: Keep versions updated in the last D days
+# keep_compatible_builds: Keep the newest version compatible with each build, e.g. ("IC-243.26053.27",)
+# Depends on metadata
+RETENTION_POLICY: RetentionPolicy | None = None
+
 # Download concurrency
 DOWNLOAD_CONCURRENCY: int = 8
 
+# Download order of a sync
+# DownloadOrder.PLAN: Plan order
+# DownloadOrder.SMALLEST_FIRST: Smallest files first, many files finish early
+# DownloadOrder.LARGEST_FIRST: Largest files first, the shortest total time
+# Unknown sizes go last, VSCode sizes are only known with PLAN_PROBE_SIZES
+DOWNLOAD_ORDER: DownloadOrder = DownloadOrder.PLAN
+
+# Durability of downloaded files
+# Durability.FILE: Each file is flushed to disk before it is moved into place
+# Durability.BATCH: All files are flushed to disk once after the downloads, much less waiting on the disk
+# Durability.NONE: Left to the OS, a power loss may leave broken files
+DOWNLOAD_DURABILITY: Durability = Durability.FILE
+
 # No metadata or not
 # Generate [ext_id.json] before download
 NO_METADATA: bool = False
 
+# Metadata file format, both are read back
+# MetaFormat.JSON: Indented JSON
+# MetaFormat.COMPACT: JSON without whitespace, about 30% smaller for large version lists
+# Metadata is encoded with the "orjson" package when it is installed
+META_FORMAT: MetaFormat = MetaFormat.JSON
+
 # Flatten dir or not
 # No flatten dir:
 # [download_dir]
@@ -56,9 +101,71 @@ PLUGINS_LIST: list[str | JetbrainsDef] = [
     "7495",  # https://plugins.jetbrains.com/plugin/7495--ignore
 ]
 
+# Download required plugins of the listed plugins too (transitive "depends", platform modules excluded)
+# Dependencies use the build version and download options of the plugin requiring them
+RESOLVE_DEPENDS: bool = False
+
 # For generating updatePlugins.xml
 PLUGINS_DOWNLOAD_BASE_URL: str | None = "http://localhost:8080"
 
+# Sync mode
+# sync: Resolve and download directly
+# plan: Only save the sync plan to PLAN_PATH, nothing will be downloaded
+# apply: Download and delete exactly what the sync plan in PLAN_PATH describes
+# backfill: Download all matching older versions too, retention policy is ignored
+SYNC_MODE: SyncMode = SyncMode.SYNC
+
+# Sync plan path
+PLAN_PATH: Path = DOWNLOAD_DIR / "sync-plan.json"
+
+# Run journal path of sync and apply, an interrupted run continues from here
+# Resolved plan, finished downloads and written metadata are skipped, partial files are resumed
+JOURNAL_PATH: Path = DOWNLOAD_DIR / "sync-journal.jsonl"
+
+# Estimated download bandwidth (bytes per second) or None
+PLAN_BANDWIDTH: float | None = None
+
+# Backfill checkpoint path, an interrupted backfill continues from here
+BACKFILL_CHECKPOINT_PATH: Path = DOWNLOAD_DIR / "backfill-checkpoint.json"
+
+# Only backfill versions updated after this time, None for the whole history
+BACKFILL_SINCE: datetime.datetime | None = None
+
+# Max versions held in memory before they are downloaded
+BACKFILL_BUFFER_SIZE: int = 256
+
+# Backfill versions compatible with any of these builds, empty to use TARGET_BUILD_VERSION
+# Version history is only available for numeric plugin ids
+BACKFILL_BUILDS: tuple[str, ...] = ()
+
+# Worker processes of a sync, 1 to run everything in this process
+# The list is partitioned across processes, each with its own event loop and client
+# DOWNLOAD_CONCURRENCY stays the global limit, the task spec is not written in sharded mode
+# Not used when run by mirror.py or daemon.py, they share one budget in one process
+SHARDS: int = 1
+
+# Verify downloaded files with stored digests before download
+# Corrupted files will be removed and downloaded again if they are still the latest
+VERIFY_FILES: bool = False
+
+# Extract icons, READMEs and manifests from downloaded archives for the index page
+# Results are cached by digest under [download_dir]/.assets, each archive is read once
+# Depends on metadata
+INTROSPECT_FILES: bool = False
+
+# Precompressed variants of index.html, updatePlugins.xml and metadata, e.g. (CompressFormat.GZIP, CompressFormat.ZSTD)
+# Written as [file].gz / [file].zst, only rewritten when the content changed
+# zstd requires the "zstandard" package
+PRECOMPRESS_FORMATS: tuple[CompressFormat, ...] = (CompressFormat.GZIP,)
+
+# Clean orphan files or not
+# Remove files which are not referenced by metadata after download
+# Metadata of plugins removed from PLUGINS_LIST is removed too, backfill runs don't clean
+CLEAN_ORPHAN_FILES: bool = False
+
+# Only report reclaimable files when cleaning orphan files
+CLEAN_DRY_RUN: bool = False
+
 # For local test
 # noinspection PyBroadException
 try:
@@ -67,37 +174,153 @@ except:
     pass
 
 
-async def main() -> None:
-    await download_latest_extensions(
-        plugins_def=PLUGINS_LIST,
-        target_dir=DOWNLOAD_DIR,
-        temp_dir=TEMP_DIR,
-        concurrency=DOWNLOAD_CONCURRENCY,
-        task_spec_path=TASK_SPEC_PATH,
-        default_target_build_version=TARGET_BUILD_VERSION,
-        default_download_options=DownloadOptions(
-            skip_if_exists=SKIP_IF_EXISTS,
-            no_metadata=NO_METADATA,
-            flatten_dir=FLATTEN_DIR,
-            keep_only_latest=KEEP_ONLY_LATEST,
-        ),
+async def main(
+        client: httpx.AsyncClient | None = None,
+        limiter: AbstractAsyncContextManager | None = None,
+        incremental: bool = False,
+) -> None:
+    if SYNC_MODE == SyncMode.CRAWL:
+        raise ValueError("Crawl mode is only supported by the VSCode downloader")
+
+    download_options = DownloadOptions(
+        skip_if_exists=SKIP_IF_EXISTS,
+        no_metadata=NO_METADATA,
+        flatten_dir=FLATTEN_DIR,
+        keep_only_latest=KEEP_ONLY_LATEST,
+        retention=RETENTION_POLICY,
+        durability=DOWNLOAD_DURABILITY,
+        meta_format=META_FORMAT,
     )
+
+    if SYNC_MODE == SyncMode.PLAN:
+        plan = await plan_latest_extensions(
+            plugins_def=PLUGINS_LIST,
+            target_dir=DOWNLOAD_DIR,
+            concurrency=DOWNLOAD_CONCURRENCY,
+            client=client,
+            bandwidth=PLAN_BANDWIDTH,
+            resolve_depends=RESOLVE_DEPENDS,
+            default_target_build_version=TARGET_BUILD_VERSION,
+            default_download_options=download_options,
+        )
+        PLAN_PATH.parent.mkdir(parents=True, exist_ok=True)
+        PLAN_PATH.write_text(plan.to_json(indent=2, ensure_ascii=False), encoding="utf-8")
+        print(
+            f"Planner: {len(plan.to_download)} to download ({pretty_bytes(plan.download_bytes)}, "
+            f"{plan.unknown_size_files} unknown size), {len(plan.unchanged)} unchanged, {len(plan.to_delete)} to delete"
+            + (f", about {plan.estimated_seconds:.0f}s" if plan.estimated_seconds is not None else "")
+        )
+        return
+
+    if VERIFY_FILES and not incremental and not NO_METADATA and DOWNLOAD_DIR.is_dir():
+        verify_report = await verify_downloaded_files(
+            download_dir=DOWNLOAD_DIR,
+            is_flatten=FLATTEN_DIR,
+            remove_corrupted=True,
+        )
+        for file_path in verify_report.corrupted_files:
+            print(f"Verifier warning: file {file_path} is corrupted.")
+        print(
+            f"Verifier: {verify_report.verified_files} verified, {len(verify_report.corrupted_files)} corrupted, "
+            f"{len(verify_report.missing_files)} missing, {verify_report.unverified_files} without digest"
+        )
+
+    if SYNC_MODE == SyncMode.APPLY:
+        plan = JetbrainsSyncPlan.from_json(PLAN_PATH.read_text(encoding="utf-8"))
+        await apply_sync_plan(
+            plan=plan,
+            target_dir=DOWNLOAD_DIR,
+            temp_dir=TEMP_DIR,
+            concurrency=DOWNLOAD_CONCURRENCY,
+            client=client,
+            limiter=limiter,
+            download_order=DOWNLOAD_ORDER,
+            journal_path=JOURNAL_PATH,
+        )
+    elif SYNC_MODE == SyncMode.BACKFILL:
+        backfilled = await backfill_plugins(
+            plugins_def=PLUGINS_LIST,
+            target_dir=DOWNLOAD_DIR,
+            temp_dir=TEMP_DIR,
+            concurrency=DOWNLOAD_CONCURRENCY,
+            client=client,
+            limiter=limiter,
+            checkpoint_path=BACKFILL_CHECKPOINT_PATH,
+            max_buffered_versions=BACKFILL_BUFFER_SIZE,
+            since=BACKFILL_SINCE,
+            builds=BACKFILL_BUILDS,
+            default_target_build_version=TARGET_BUILD_VERSION,
+            default_download_options=download_options,
+        )
+        print(f"Backfill: {backfilled} versions processed")
+        plan = JetbrainsSyncPlan()
+    elif SHARDS > 1 and client is None and limiter is None:
+        plan = await download_latest_extensions_sharded(
+            plugins_def=PLUGINS_LIST,
+            target_dir=DOWNLOAD_DIR,
+            temp_dir=TEMP_DIR,
+            concurrency=DOWNLOAD_CONCURRENCY,
+            shards=SHARDS,
+            resolve_depends=RESOLVE_DEPENDS,
+            download_order=DOWNLOAD_ORDER,
+            default_target_build_version=TARGET_BUILD_VERSION,
+            default_download_options=download_options,
+        )
+    else:
+        plan = await download_latest_extensions(
+            plugins_def=PLUGINS_LIST,
+            target_dir=DOWNLOAD_DIR,
+            temp_dir=TEMP_DIR,
+            concurrency=DOWNLOAD_CONCURRENCY,
+            client=client,
+            limiter=limiter,
+            task_spec_path=TASK_SPEC_PATH,
+            resolve_depends=RESOLVE_DEPENDS,
+            download_order=DOWNLOAD_ORDER,
+            journal_path=JOURNAL_PATH,
+            default_target_build_version=TARGET_BUILD_VERSION,
+            default_download_options=download_options,
+        )
+    if incremental and len(plan.to_download) == 0:
+        # Nothing changed, keep the generated outputs
+        return
+
+    if INTROSPECT_FILES and not NO_METADATA:
+        await introspect_downloaded_files(download_dir=DOWNLOAD_DIR, is_flatten=FLATTEN_DIR)
+    if PRECOMPRESS_FORMATS and not NO_METADATA:
+        await precompress_meta_data(DOWNLOAD_DIR, FLATTEN_DIR, PRECOMPRESS_FORMATS)
     if not NO_METADATA:
         await generate_index_html(
             base_url=PLUGINS_DOWNLOAD_BASE_URL,
             download_dir=DOWNLOAD_DIR,
             is_flatten=FLATTEN_DIR,
+            precompress=PRECOMPRESS_FORMATS,
         )
     if not NO_METADATA and PLUGINS_DOWNLOAD_BASE_URL is not None:
         await generate_update_plugins_xml(
             base_url=PLUGINS_DOWNLOAD_BASE_URL,
             download_dir=DOWNLOAD_DIR,
             is_flatten=FLATTEN_DIR,
+            precompress=PRECOMPRESS_FORMATS,
+        )
+    # A backfill has no sync plan, the resolved plugins of the last sync are unknown
+    if not NO_METADATA and CLEAN_ORPHAN_FILES and SYNC_MODE != SyncMode.BACKFILL:
+        report = await clean_orphan_files(
+            download_dir=DOWNLOAD_DIR,
+            is_flatten=FLATTEN_DIR,
+            # Metadata is named by xml ids, numeric ids and required plugins are only known from the sync plan
+            keep_ids=[i.plugin_id if isinstance(i, JetbrainsDef) else i for i in PLUGINS_LIST]
+                     + [i.plugin.id for i in plan.to_download + plan.unchanged],
+            keep_files=[TASK_SPEC_PATH, PLAN_PATH, BACKFILL_CHECKPOINT_PATH, JOURNAL_PATH],
+            dry_run=CLEAN_DRY_RUN,
+        )
+        print(
+            f"Cleaner: {'found' if report.dry_run else 'removed'} {report.removed_files} files "
+            f"and {report.removed_dirs} dirs, {pretty_bytes(report.reclaimed_bytes)} reclaimable"
         )
 
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    finally:
-        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    asyncio.run(main())
+    # Partial downloads of an interrupted run are kept for resuming
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
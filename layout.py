@@ -0,0 +1,60 @@
+import asyncio
+
+import jetbrains
+import vscode
+from dev_ext_downloader.common.layout import migrate_dir_layout
+from dev_ext_downloader import jetbrains as jetbrains_generator
+from dev_ext_downloader import vscode as vscode_generator
+
+# Hash dir levels above each extension dir, 256 dirs per level
+# 0: One dir per extension at the top level of the download dir
+# 2: [00-ff]/[00-ff]/[extension id]/, for mirrors with many thousands of extensions
+SHARD_LEVELS: int = 2
+
+# Regenerate index.html and updatePlugins.xml with the new file urls after migration
+REGENERATE_OUTPUTS: bool = True
+
+# For local test
+# noinspection PyBroadException
+try:
+    from local_config.layout import *
+except:
+    pass
+
+
+async def main() -> None:
+    if vscode.FLATTEN_DIR or jetbrains.FLATTEN_DIR:
+        raise ValueError("FLATTEN_DIR has no extension dirs to shard")
+
+    for name, download_dir in (("VSCode", vscode.DOWNLOAD_DIR), ("Jetbrains", jetbrains.DOWNLOAD_DIR)):
+        # Extension dirs are renamed in place, the download dir must not be written by a sync meanwhile
+        report = await migrate_dir_layout(download_dir, SHARD_LEVELS)
+        print(
+            f"Layout: {name} {download_dir} uses {report.shard_levels} shard levels, "
+            f"{report.moved_dirs} dirs moved, {report.skipped_dirs} skipped"
+        )
+
+    if REGENERATE_OUTPUTS and not vscode.NO_METADATA:
+        await vscode_generator.generate_index_html(
+            download_dir=vscode.DOWNLOAD_DIR,
+            is_flatten=vscode.FLATTEN_DIR,
+            precompress=vscode.PRECOMPRESS_FORMATS,
+        )
+    if REGENERATE_OUTPUTS and not jetbrains.NO_METADATA:
+        await jetbrains_generator.generate_index_html(
+            base_url=jetbrains.PLUGINS_DOWNLOAD_BASE_URL,
+            download_dir=jetbrains.DOWNLOAD_DIR,
+            is_flatten=jetbrains.FLATTEN_DIR,
+            precompress=jetbrains.PRECOMPRESS_FORMATS,
+        )
+        if jetbrains.PLUGINS_DOWNLOAD_BASE_URL is not None:
+            await jetbrains_generator.generate_update_plugins_xml(
+                base_url=jetbrains.PLUGINS_DOWNLOAD_BASE_URL,
+                download_dir=jetbrains.DOWNLOAD_DIR,
+                is_flatten=jetbrains.FLATTEN_DIR,
+                precompress=jetbrains.PRECOMPRESS_FORMATS,
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
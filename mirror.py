@@ -0,0 +1,55 @@
+import asyncio
+import shutil
+import time
+from typing import Awaitable
+
+import httpx
+
+import jetbrains
+import vscode
+from dev_ext_downloader.common.budget import DownloadBudget
+
+# Download concurrency shared by all sources
+DOWNLOAD_CONCURRENCY: int = 12
+
+# Download budget weight of each source
+# Free download slots go to the waiting source which uses the least of its weighted share
+SOURCE_WEIGHTS: dict[str, float] = {
+    "vscode": 1.0,
+    "jetbrains": 1.0,
+}
+
+# For local test
+# noinspection PyBroadException
+try:
+    from local_config.mirror import *
+except:
+    pass
+
+
+async def _timed(task: Awaitable[None]) -> float:
+    start_time = time.perf_counter()
+    await task
+    return time.perf_counter() - start_time
+
+
+async def main() -> None:
+    budget = DownloadBudget(DOWNLOAD_CONCURRENCY, SOURCE_WEIGHTS)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
+        elapsed = await asyncio.gather(
+            _timed(vscode.main(client=client, limiter=budget.limiter("vscode"))),
+            _timed(jetbrains.main(client=client, limiter=budget.limiter("jetbrains"))),
+        )
+    stats = budget.stats()
+    for source, seconds in zip(("vscode", "jetbrains"), elapsed):
+        print(
+            f"Mirror: {source} finished {stats[source].completed} downloads in {seconds:.1f}s "
+            f"(weight {stats[source].weight})"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    # Partial downloads of an interrupted run are kept for resuming
+    shutil.rmtree(vscode.TEMP_DIR, ignore_errors=True)
+    shutil.rmtree(jetbrains.TEMP_DIR, ignore_errors=True)
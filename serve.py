@@ -0,0 +1,82 @@
+import asyncio
+from pathlib import Path
+
+import jetbrains
+import vscode
+from dev_ext_downloader.jetbrains.updates import UpdatePluginsHandler
+from dev_ext_downloader.server import MirrorServer
+from dev_ext_downloader.vscode.gallery import VSCodeGalleryHandler
+
+# Listen host
+HOST: str = "0.0.0.0"
+
+# Listen port
+# PLUGINS_DOWNLOAD_BASE_URL in jetbrains.py should point to this server
+PORT: int = 8080
+
+# URL path prefix to download dir
+MOUNTS: dict[str, Path] = {
+    "/": jetbrains.DOWNLOAD_DIR,
+    "/vscode/": vscode.DOWNLOAD_DIR,
+}
+
+# Files in the mounted dirs never served, dot-files and "*.tmp" files are never served either
+SERVE_EXCLUDE: list[Path] = [
+    vscode.TASK_SPEC_PATH, vscode.PLAN_PATH, vscode.BACKFILL_CHECKPOINT_PATH, vscode.CRAWL_CHECKPOINT_PATH,
+    vscode.CRAWL_MANIFEST_PATH, vscode.JOURNAL_PATH,
+    jetbrains.TASK_SPEC_PATH, jetbrains.PLAN_PATH, jetbrains.BACKFILL_CHECKPOINT_PATH, jetbrains.JOURNAL_PATH,
+]
+
+# URL path prefix of the VSCode gallery API, None to disable
+# Set "extensionsGallery.serviceUrl" in VSCode product.json to "http://<host>:<port>/vscode/_apis/public/gallery"
+VSCODE_GALLERY_PREFIX: str | None = "/vscode/"
+
+# Interval in seconds to check the download dir, the gallery index is rebuilt when it changed
+VSCODE_GALLERY_REFRESH_INTERVAL: float = 300.0
+
+# URL path of updatePlugins.xml answering "?build=" with the newest compatible versions, None to disable
+# Requests without "build" get the static file, requires PLUGINS_DOWNLOAD_BASE_URL in jetbrains.py
+JETBRAINS_UPDATE_PLUGINS_PATH: str | None = "/updatePlugins.xml"
+
+# Interval in seconds to check the download dir, the updatePlugins.xml index is rebuilt when it changed
+JETBRAINS_UPDATE_PLUGINS_REFRESH_INTERVAL: float = 300.0
+
+# For local test
+# noinspection PyBroadException
+try:
+    from local_config.serve import *
+except:
+    pass
+
+
+async def main() -> None:
+    handlers = []
+    if VSCODE_GALLERY_PREFIX is not None:
+        gallery = VSCodeGalleryHandler(
+            download_dir=vscode.DOWNLOAD_DIR,
+            is_flatten=vscode.FLATTEN_DIR,
+            prefix=VSCODE_GALLERY_PREFIX,
+            refresh_interval=VSCODE_GALLERY_REFRESH_INTERVAL,
+        )
+        await gallery.load()
+        handlers.append(gallery)
+    if JETBRAINS_UPDATE_PLUGINS_PATH is not None and jetbrains.PLUGINS_DOWNLOAD_BASE_URL is not None:
+        update_plugins = UpdatePluginsHandler(
+            base_url=jetbrains.PLUGINS_DOWNLOAD_BASE_URL,
+            download_dir=jetbrains.DOWNLOAD_DIR,
+            is_flatten=jetbrains.FLATTEN_DIR,
+            path=JETBRAINS_UPDATE_PLUGINS_PATH,
+            refresh_interval=JETBRAINS_UPDATE_PLUGINS_REFRESH_INTERVAL,
+        )
+        await update_plugins.load()
+        handlers.append(update_plugins)
+    server = MirrorServer(mounts=MOUNTS, handlers=handlers, exclude=SERVE_EXCLUDE)
+    print(f"Server: Serving on http://{HOST}:{PORT}")
+    await server.serve_forever(HOST, PORT)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+
+from dev_ext_downloader.common.budget import BudgetClosedError, DownloadBudget
+
+
+class BudgetCloseTest(unittest.IsolatedAsyncioTestCase):
+    async def _cancel_waiter_after_close(self, waiter_source: str) -> DownloadBudget:
+        budget = DownloadBudget(1)
+        await budget.acquire("a")
+        waiter = asyncio.create_task(budget.acquire(waiter_source))
+        await asyncio.sleep(0)
+        # The waiter is failed by close, then cancelled before it resumes
+        budget.close()
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        return budget
+
+    async def test_cancelled_waiter_of_other_source_releases_nothing(self) -> None:
+        budget = await self._cancel_waiter_after_close("b")
+        self.assertEqual(1, budget.stats()["a"].active)
+        self.assertEqual(0, budget.stats()["b"].active)
+
+    async def test_cancelled_waiter_of_same_source_keeps_holder_slot(self) -> None:
+        budget = await self._cancel_waiter_after_close("a")
+        self.assertEqual(1, budget.stats()["a"].active)
+        budget.release("a")
+        self.assertEqual(0, budget.stats()["a"].active)
+
+    async def test_waiter_fails_after_close(self) -> None:
+        budget = DownloadBudget(1)
+        await budget.acquire("a")
+        waiter = asyncio.create_task(budget.acquire("b"))
+        await asyncio.sleep(0)
+        budget.close()
+        with self.assertRaises(BudgetClosedError):
+            await waiter
+        self.assertEqual(1, budget.stats()["a"].active)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import datetime
+import unittest
+from unittest import mock
+
+from dev_ext_downloader.common import codec
+from dev_ext_downloader.common.models import MetaFormat
+from dev_ext_downloader.jetbrains.codec import dumps_plugin, loads_plugin
+from dev_ext_downloader.jetbrains.data import JetbrainsDownloadPlugin, JetbrainsDownloadVersion
+from dev_ext_downloader.vscode.codec import dumps_extension, loads_extension
+from dev_ext_downloader.vscode.data import (
+    TargetPlatformType,
+    VSCodeExtension,
+    VSCodeExtensionFile,
+    VSCodeExtensionProperty,
+    VSCodeExtensionVersion,
+)
+
+_EXTENSION = VSCodeExtension(
+    extension_id="f1f59ae4-9318-4f3c-a9b5-81b2eaa5f8a5",
+    extension_name="python",
+    display_name="Python é中\"quoted\"",
+    publisher_id="998b010b-e2af-44a5-a6cd-0b5fd3b9b6f8",
+    publisher_name="ms-python",
+    publisher_display_name="Microsoft",
+    short_description="Line\nbreak, tab\t and emoji \U0001F40D",
+    categories=("Programming Languages", "Debuggers"),
+    versions=(
+        VSCodeExtensionVersion(
+            version="2024.1.0",
+            target_platform=TargetPlatformType.LINUX_X64,
+            last_updated=datetime.datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+            files=(VSCodeExtensionFile(asset_type="Microsoft.VisualStudio.Services.VSIXPackage", source="https://x/y"),),
+            properties=(VSCodeExtensionProperty(key="Microsoft.VisualStudio.Code.Engine", value="^1.80.0"),),
+            sha256="a" * 64,
+        ),
+        VSCodeExtensionVersion(
+            version="2023.0.0",
+            target_platform=TargetPlatformType.UNIVERSAL,
+            last_updated=datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=8))),
+            files=(),
+            properties=(),
+        ),
+    ),
+)
+
+_PLUGIN = JetbrainsDownloadPlugin(
+    id="org.rust.lang",
+    name="Rust ü",
+    description="<p>HTML &amp; “quotes”</p>",
+    vendor="JetBrains",
+    category="Languages",
+    tags=("Languages",),
+    versions=(
+        JetbrainsDownloadVersion(
+            version="0.4.200",
+            change_notes="",
+            size=12345678,
+            updated_date=datetime.datetime(2024, 5, 6, 7, 8, 9),
+            since_build="233.11799",
+            until_build=None,
+            download_url="https://plugins.jetbrains.com/files/1/2/rust.zip",
+            download_file_name="rust-0.4.200.zip",
+            depends=("com.intellij.modules.lang", "org.toml.lang"),
+            sha256="b" * 64,
+        ),
+        JetbrainsDownloadVersion(
+            version="0.4.100",
+            change_notes="notes",
+            size=None,
+            updated_date=None,
+            since_build=None,
+            until_build="241.*",
+            download_url=None,
+            download_file_name="rust-0.4.100.zip",
+            depends=(),
+        ),
+    ),
+)
+
+
+class MetaCodecTest(unittest.TestCase):
+    def _check(self) -> None:
+        # Existing mirrors were written by dataclasses_json, the codec must write the same bytes
+        self.assertEqual(dumps_extension(_EXTENSION), _EXTENSION.to_json(indent=2, ensure_ascii=False))
+        self.assertEqual(dumps_plugin(_PLUGIN), _PLUGIN.to_json(indent=2, ensure_ascii=False))
+
+        for content in (_EXTENSION.to_json(indent=2, ensure_ascii=False), dumps_extension(_EXTENSION, MetaFormat.COMPACT)):
+            self.assertEqual(loads_extension(content), _EXTENSION)
+            self.assertEqual(loads_extension(content), VSCodeExtension.from_json(content))
+        for content in (_PLUGIN.to_json(indent=2, ensure_ascii=False), dumps_plugin(_PLUGIN, MetaFormat.COMPACT)):
+            self.assertEqual(loads_plugin(content), _PLUGIN)
+            self.assertEqual(loads_plugin(content), JetbrainsDownloadPlugin.from_json(content))
+
+    def test_stdlib_json(self) -> None:
+        with mock.patch.object(codec, "orjson", None):
+            self._check()
+
+    @unittest.skipIf(codec.orjson is None, "orjson is not installed")
+    def test_orjson(self) -> None:
+        self._check()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+
+from dev_ext_downloader.common import tools
+
+_URL = "https://example.com/file.vsix"
+_BODY = os.urandom(64 * 1024)
+_CUT_AT = 24 * 1024
+
+
+class ResumeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.target_dir = Path(temp_dir.name) / "target"
+        self.ranges: list[str | None] = []
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        range_header = request.headers.get("Range")
+        self.ranges.append(range_header)
+        if range_header is None:
+            # The connection drops after part of the body
+            async def cut_stream():
+                for i in range(0, _CUT_AT, 4096):
+                    yield _BODY[i:i + 4096]
+                raise httpx.ReadError("Connection reset", request=request)
+
+            return httpx.Response(200, headers={"Content-Length": str(len(_BODY))}, content=cut_stream())
+        offset = int(range_header.removeprefix("bytes=").removesuffix("-"))
+        return httpx.Response(
+            206,
+            headers={"Content-Range": f"bytes {offset}-{len(_BODY) - 1}/{len(_BODY)}"},
+            content=_BODY[offset:],
+        )
+
+    async def test_resume_after_cut_preallocated_download(self) -> None:
+        # Every test file is preallocated, the partial file must still end at the written bytes
+        with mock.patch.object(tools, "_PREALLOCATE_MIN_SIZE", 1), mock.patch.object(tools, "_WRITE_BUFFER_SIZE", 4096):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(self._handle)) as client:
+                # Without the retry decorator, the second call is the next attempt
+                download = tools.download_file.__wrapped__
+                with self.assertRaises(httpx.ReadError):
+                    await download(client, _URL, self.target_dir, file_name="file.vsix", resume=True)
+                result = await download(client, _URL, self.target_dir, file_name="file.vsix", resume=True)
+
+        self.assertEqual([None, f"bytes={_CUT_AT}-"], self.ranges)
+        self.assertEqual(_BODY, result.path.read_bytes())
+        self.assertEqual(hashlib.sha256(_BODY).hexdigest(), result.sha256)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import asyncio
+import contextlib
+import io
+import unittest
+
+from dev_ext_downloader.common.events import EventSink, WarningEvent
+
+_WARNING = WarningEvent(item_id="ms-python.python", message="No extension found")
+
+
+class EventSinkTest(unittest.TestCase):
+    def test_warning_is_emitted_to_consumer_only(self) -> None:
+        queue: asyncio.Queue = asyncio.Queue()
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            EventSink(queue).warn(_WARNING, "Downloader warning: No extension found for ms-python.python")
+        self.assertEqual("", stdout.getvalue())
+        self.assertIs(_WARNING, queue.get_nowait())
+
+    def test_warning_is_printed_without_consumer(self) -> None:
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            EventSink().warn(_WARNING, "Downloader warning: No extension found for", "ms-python.python")
+        self.assertEqual("Downloader warning: No extension found for ms-python.python\n", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
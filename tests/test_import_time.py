@@ -0,0 +1,62 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+_REPO_DIR = Path(__file__).resolve().parent.parent
+# Modules of the plan and verify paths, the commands that never render, parse XML or print progress
+_LIGHT_MODULES = (
+    "dev_ext_downloader",
+    "dev_ext_downloader.vscode",
+    "dev_ext_downloader.jetbrains",
+    "dev_ext_downloader.vscode.planner",
+    "dev_ext_downloader.jetbrains.planner",
+    "dev_ext_downloader.vscode.verifier",
+    "dev_ext_downloader.jetbrains.verifier",
+)
+# Loaded on first use only
+_HEAVY_PACKAGES = (
+    "aiofile", "aioshutil", "dataclasses_json", "jinja2", "lxml", "marshmallow",
+    "pytz", "semantic_version", "tenacity", "tqdm",
+)
+# Cumulative microseconds of the import, about 100 ms measured and 220 ms with the heavy packages,
+# generous for a slow or busy machine
+_BUDGET_US: int = 400_000
+
+
+def _import_times(module: str) -> dict[str, int]:
+    # Cumulative import time of each module loaded by a fresh interpreter importing module
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=_REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_heavy_packages_not_imported(self) -> None:
+        for module in _LIGHT_MODULES:
+            with self.subTest(module=module):
+                loaded = {i.split(".")[0] for i in _import_times(module)}
+                self.assertEqual(set(), loaded & set(_HEAVY_PACKAGES))
+
+    def test_import_time_budget(self) -> None:
+        for module in _LIGHT_MODULES:
+            with self.subTest(module=module):
+                # The best of a few runs, a single run may be slowed down by the machine
+                elapsed = min(_import_times(module)[module] for _ in range(3))
+                self.assertLess(elapsed, _BUDGET_US, f"{module} imports in {elapsed / 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
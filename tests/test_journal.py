@@ -0,0 +1,54 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from dev_ext_downloader.common.journal import RunJournal, get_inputs_fingerprint
+from dev_ext_downloader.common.models import DownloadedFile
+
+
+class RunJournalTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._temp_dir.name) / "sync-journal.jsonl"
+
+    async def asyncTearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    async def test_resume_same_inputs(self) -> None:
+        fingerprint = get_inputs_fingerprint([{"ext_id": "a.b"}], False)
+        journal = RunJournal(self.path)
+        journal.start({"to_download": [1, 2]}, fingerprint)
+        file_path = Path(self._temp_dir.name) / "a.vsix"
+        file_path.write_bytes(b"vsix")
+        # Concurrent records are written in groups, all of them are on disk afterwards
+        await asyncio.gather(
+            journal.record_downloaded("a", DownloadedFile(path=file_path, sha256="00")),
+            *(journal.record_committed(f"key-{i}") for i in range(100)),
+        )
+
+        resumed = RunJournal(self.path)
+        self.assertEqual(resumed.get_plan(fingerprint), {"to_download": [1, 2]})
+        self.assertTrue(all(resumed.is_committed(f"key-{i}") for i in range(100)))
+        self.assertEqual(resumed.get_downloaded("a"), DownloadedFile(path=file_path, sha256="00"))
+
+    async def test_discard_changed_inputs(self) -> None:
+        journal = RunJournal(self.path)
+        journal.start({"to_download": [1]}, get_inputs_fingerprint([{"ext_id": "a.b"}], False))
+        await journal.record_committed("key")
+
+        resumed = RunJournal(self.path)
+        self.assertIsNone(resumed.get_plan(get_inputs_fingerprint([{"ext_id": "a.b"}, {"ext_id": "c.d"}], False)))
+        self.assertFalse(resumed.is_committed("key"))
+
+    async def test_finish(self) -> None:
+        journal = RunJournal(self.path)
+        journal.start({"to_download": [1]})
+        await journal.record_committed("key")
+        journal.finish()
+        self.assertFalse(self.path.exists())
+        self.assertIsNone(RunJournal(self.path).get_plan(get_inputs_fingerprint()))
+
+
+if __name__ == "__main__":
+    unittest.main()
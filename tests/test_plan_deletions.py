@@ -0,0 +1,95 @@
+import dataclasses
+import datetime
+import tempfile
+import unittest
+from pathlib import Path
+
+from dev_ext_downloader.common.models import DownloadOptions
+from dev_ext_downloader.common.token_locker import TokenLock
+from dev_ext_downloader.vscode.codec import dumps_extension, loads_extension
+from dev_ext_downloader.vscode.data import (
+    TargetPlatformType,
+    VSCodeDownloadTask,
+    VSCodeExtension,
+    VSCodeExtensionVersion,
+)
+from dev_ext_downloader.vscode.retention import apply_plan_deletions
+from dev_ext_downloader.vscode.utils import get_download_file_dir, get_download_file_name
+
+
+def _version(version: str) -> VSCodeExtensionVersion:
+    return VSCodeExtensionVersion(
+        version=version,
+        target_platform=TargetPlatformType.UNIVERSAL,
+        last_updated=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        files=(),
+        properties=(),
+    )
+
+
+_VERSIONS = (_version("3.0.0"), _version("2.0.0"), _version("1.0.0"))
+_EXTENSION = VSCodeExtension(
+    extension_id="id",
+    extension_name="python",
+    display_name="Python",
+    publisher_id="publisher",
+    publisher_name="ms-python",
+    publisher_display_name="Microsoft",
+    short_description="",
+    categories=(),
+    versions=_VERSIONS,
+)
+
+
+class PlanDeletionsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.target_dir = Path(temp_dir.name)
+        self.extension_dir = get_download_file_dir(self.target_dir, False, _EXTENSION)
+        self.extension_dir.mkdir(parents=True)
+        self.meta_data_path = self.extension_dir / f"{_EXTENSION.unified_name}.json"
+        self.meta_data_path.write_text(dumps_extension(_EXTENSION), encoding="utf-8")
+        for version in _VERSIONS:
+            self._file_path(version).write_bytes(b"vsix")
+
+    def _file_path(self, version: VSCodeExtensionVersion) -> Path:
+        return self.extension_dir / get_download_file_name(_EXTENSION, version)
+
+    def _task(self, version: VSCodeExtensionVersion, download_options: DownloadOptions) -> VSCodeDownloadTask:
+        return VSCodeDownloadTask(
+            extension=dataclasses.replace(_EXTENSION, versions=()),
+            version=version,
+            download_options=download_options,
+            file_path=self._file_path(version).relative_to(self.target_dir).as_posix(),
+        )
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.target_dir).as_posix()
+
+    async def test_removes_exactly_planned_files(self) -> None:
+        tasks = [self._task(_VERSIONS[0], DownloadOptions()), self._task(_VERSIONS[1], DownloadOptions())]
+        # The second version is downloaded by the plan too, it is never removed
+        to_delete = [self._relative(self._file_path(_VERSIONS[1])), self._relative(self._file_path(_VERSIONS[2]))]
+
+        removed = await apply_plan_deletions(self.target_dir, tasks, to_delete, TokenLock())
+
+        self.assertEqual([self._file_path(_VERSIONS[2])], removed)
+        self.assertTrue(self._file_path(_VERSIONS[0]).is_file())
+        self.assertTrue(self._file_path(_VERSIONS[1]).is_file())
+        meta_data = loads_extension(self.meta_data_path.read_text(encoding="utf-8"))
+        self.assertEqual(_VERSIONS[:2], meta_data.versions)
+
+    async def test_removes_metadata_without_metadata(self) -> None:
+        tasks = [self._task(_VERSIONS[0], DownloadOptions(no_metadata=True))]
+
+        removed = await apply_plan_deletions(
+            self.target_dir, tasks, [self._relative(self.meta_data_path)], TokenLock()
+        )
+
+        self.assertEqual([self.meta_data_path], removed)
+        self.assertTrue(all(self._file_path(i).is_file() for i in _VERSIONS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import random
+import unittest
+
+from dev_ext_downloader.common.token_locker import TokenLock
+
+_TOKENS: int = 10_000
+
+
+class TokenLockStressTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        # Debug mode of the test loop checks every callback, too slow for this many tasks
+        asyncio.get_running_loop().set_debug(False)
+
+    async def _hold_all(self, lock: TokenLock, tokens: list[str]) -> tuple[asyncio.Event, list[asyncio.Task]]:
+        release = asyncio.Event()
+        acquired = asyncio.Semaphore(0)
+
+        async def hold(token: str) -> None:
+            async with lock.lock(token):
+                acquired.release()
+                await release.wait()
+
+        holders = [asyncio.create_task(hold(i)) for i in tokens]
+        for _ in tokens:
+            await acquired.acquire()
+        return release, holders
+
+    async def test_reentrant_exclusive(self) -> None:
+        lock = TokenLock()
+        holders: dict[str, int] = {}
+
+        async def work(token: str) -> None:
+            async with lock.lock(token):
+                holders[token] = holders.get(token, 0) + 1
+                self.assertEqual(holders[token], 1)
+                async with lock.lock(token):
+                    async with lock.lock(token, timeout=0.001):
+                        await asyncio.sleep(0)
+                holders[token] -= 1
+
+        # Two tasks per token, one of them always waits
+        await asyncio.gather(*(work(f"token-{i % _TOKENS}") for i in range(_TOKENS * 2)))
+        self.assertEqual(lock.known_token_count(), 0)
+
+    async def test_timeouts(self) -> None:
+        lock = TokenLock()
+        tokens = [f"token-{i}" for i in range(_TOKENS)]
+        release, holders = await self._hold_all(lock, tokens)
+
+        async def wait(token: str) -> None:
+            async with lock.lock(token, timeout=0.01):
+                pass
+
+        results = await asyncio.gather(*(wait(i) for i in tokens), return_exceptions=True)
+        self.assertTrue(all(isinstance(i, TimeoutError) for i in results))
+        self.assertEqual(lock.known_token_count(), _TOKENS)
+
+        release.set()
+        await asyncio.gather(*holders)
+        self.assertEqual(lock.known_token_count(), 0)
+
+    async def test_cancellation(self) -> None:
+        lock = TokenLock()
+        tokens = [f"token-{i}" for i in range(_TOKENS)]
+        release, holders = await self._hold_all(lock, tokens)
+
+        async def wait(token: str) -> None:
+            async with lock.lock(token):
+                await asyncio.sleep(0)
+
+        waiters = [asyncio.create_task(wait(i)) for i in tokens]
+        await asyncio.sleep(0)
+        for waiter in waiters[::2]:
+            waiter.cancel()
+        # Released while the cancellations are pending, a granted lock must not leak
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.gather(*holders)
+        self.assertEqual(sum(isinstance(i, asyncio.CancelledError) for i in results), _TOKENS // 2)
+        self.assertEqual(lock.known_token_count(), 0)
+        self.assertFalse(any(lock.is_locked(i) for i in tokens))
+
+    async def test_mixed(self) -> None:
+        lock = TokenLock()
+        rng = random.Random(0)
+        holders: dict[str, int] = {}
+
+        async def work(token: str, timeout: float | None) -> None:
+            async with lock.lock(token, timeout=timeout):
+                holders[token] = holders.get(token, 0) + 1
+                try:
+                    self.assertEqual(holders[token], 1)
+                    if rng.random() < 0.5:
+                        async with lock.lock(token):
+                            await asyncio.sleep(0)
+                    await asyncio.sleep(rng.random() * 0.002)
+                finally:
+                    # Cancelled holders leave too
+                    holders[token] -= 1
+
+        tasks = [
+            asyncio.create_task(work(f"token-{rng.randrange(_TOKENS // 4)}", rng.choice((None, 0.001, 0.1))))
+            for _ in range(_TOKENS * 2)
+        ]
+        await asyncio.sleep(0.001)
+        for task in rng.sample(tasks, len(tasks) // 10):
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(
+            i is None or isinstance(i, (TimeoutError, asyncio.CancelledError)) for i in results
+        ))
+        self.assertEqual(lock.known_token_count(), 0)
+
+    async def test_release_errors(self) -> None:
+        lock = TokenLock()
+        with self.assertRaises(RuntimeError):
+            await lock.release("unknown")
+        await lock.acquire("token")
+        with self.assertRaises(RuntimeError):
+            await asyncio.create_task(lock.release("token"))
+        await lock.release("token")
+        self.assertEqual(lock.known_token_count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()